@@ -3,7 +3,7 @@ PhasorToolBox Package
 ---------------------
 
 Este arquivo __init__.py é modificado para expor as classes
-principais (como Client, Pdc, PcapParser) no nível superior do pacote.
+principais (como Client, PDC, PcapParser) no nível superior do pacote.
 
 Isso permite que nosso Ingestor use:
     from phasortoolbox import Client
@@ -18,25 +18,37 @@ de importar os sub-módulos que dependem delas.
 
 # --- PASSO 1: Expor as Classes de Dependência ---
 # Estas são as "ferramentas" que os sub-módulos (client, pdc) precisam.
-from .parser.parser import Parser
+# A árvore pcap (com os enums enormes Linktype/ProtocolEnum) NÃO é importada
+# aqui: PcapParser só a carrega em from_pcap(), e Pcap é carregado sob demanda
+# por __getattr__ abaixo. Cada contêiner do Ingestor paga este import.
+from .parser.parser import Parser, PcapParser
 from .message import Message
 from .parser.cfg_2 import Cfg2
 from .parser.command import Command
 from .parser.header import Header
-from .devices import Pmu
-from .parser.pcap.pcap import Pcap
+from .synchrophasor import Synchrophasor
+from .gcpolicy import GCPolicy
 
 # --- PASSO 2: Expor as Classes Principais (que usam as ferramentas) ---
-# Agora que 'Parser', 'Message', etc., estão carregados,
+# Agora que 'Parser', 'Synchrophasor', etc., estão carregados,
 # podemos importar com segurança os módulos que dependem deles.
+# devices.py não é importado: ele troca a política do event loop (uvloop).
 from .client import Client
-from .pdc import Pdc
-from .synchrophasor import PcapParser
+from .pdc import PDC
+Pdc = PDC
+
+
+def __getattr__(name):
+    if name == 'Pcap':
+        from .parser.pcap import Pcap
+        return Pcap
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 # Define o que é "público" ao usar 'from phasortoolbox import *'
 __all__ = [
     'Client',
+    'PDC',
     'Pdc',
     'PcapParser',
     'Parser',
@@ -44,6 +56,7 @@ __all__ = [
     'Cfg2',
     'Command',
     'Header',
-    'Pmu',
+    'Synchrophasor',
+    'GCPolicy',
     'Pcap'
 ]
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""Parser benchmarks on synthetic synchrophasor streams.
+
+Run with:
+    python -m phasortoolbox.benchmarks --help
+"""
+from .synthetic import StationSpec, SyntheticStream, stations, write_pcap
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Command line entry point of the benchmarks.
+
+Example:
+    python -m phasortoolbox.benchmarks --stations 4 --phasors 12 \
+        --format mixed --output results.json
+    python -m phasortoolbox.benchmarks --baseline results.json --tolerance 0.2
+    python -m phasortoolbox.benchmarks --cases none --import-budget 150
+
+Exits with status 1 when a case or the import of the package is slower than
+the baseline by more than the tolerance, or the import exceeds the budget.
+"""
+import argparse
+import sys
+
+from . import import_bench, parser_bench
+from .synthetic import FORMATS, SyntheticStream, stations
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog='python -m phasortoolbox.benchmarks')
+    arg_parser.add_argument('--stations', type=int, default=4)
+    arg_parser.add_argument('--phasors', type=int, default=12)
+    arg_parser.add_argument('--analog', type=int, default=4)
+    arg_parser.add_argument('--digital', type=int, default=1)
+    arg_parser.add_argument('--format', default='mixed', choices=FORMATS + ('mixed',))
+    arg_parser.add_argument('--frames', type=int, default=2000)
+    arg_parser.add_argument('--data-rate', type=int, default=60)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--cases', help='Comma separated, none or default: all of ' + ', '.join(parser_bench.CASES))
+    arg_parser.add_argument('--import-budget', type=float,
+                            help='Fail if importing phasortoolbox takes longer (ms).')
+    arg_parser.add_argument('--output', help='Save the results as JSON.')
+    arg_parser.add_argument('--baseline', help='Fail on regressions against these JSON results.')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed slowdown against the baseline, default 0.2 (20%%).')
+    args = arg_parser.parse_args(argv)
+
+    specs = stations(args.stations, args.format, phasors=args.phasors,
+                     analog=args.analog, digital=args.digital)
+    stream = SyntheticStream(specs, frames=args.frames, data_rate=args.data_rate)
+    cases = args.cases.split(',') if args.cases else None
+    if cases == ['none']:
+        cases = []
+    report = parser_bench.run(stream, cases, args.repeat)
+    report['import'] = import_bench.measure(repeat=args.repeat)
+    print(parser_bench.format_report(report))
+    print(import_bench.format_result(report['import']))
+    if args.output:
+        parser_bench.save(report, args.output)
+
+    failed = False
+    baseline = parser_bench.load(args.baseline) if args.baseline else None
+    if baseline is not None:
+        for name, base, now in parser_bench.check(report, baseline, args.tolerance):
+            print('REGRESSION {}: {:.2f} us/frame, baseline {:.2f} us/frame'.format(name, now, base))
+            failed = True
+    for name, allowed, now in import_bench.check(
+            report['import'], baseline.get('import') if baseline else None,
+            args.tolerance, args.import_budget):
+        print('REGRESSION {}: {:.1f} ms, allowed {:.1f} ms'.format(name, now, allowed))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
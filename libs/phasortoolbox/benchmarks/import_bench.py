@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Import time of the package.
+
+Every run imports the module in a fresh interpreter with python -X importtime
+and reports:
+    ms                  Cumulative import time of the module (best run).
+    modules             Modules imported along with it.
+    slowest             The modules with the largest own import time, as
+                        (name, ms) pairs.
+    heavy               Modules of HEAVY found in the import path. They are
+                        expected to be loaded on demand only.
+"""
+import os
+import subprocess
+import sys
+
+import phasortoolbox
+
+HEAVY = ('pkg_resources', 'phasortoolbox.parser.pcap', 'numpy')
+
+
+def importtime(module='phasortoolbox'):
+    """Imports module in a fresh interpreter.
+
+    Returns:
+        dict: (self, cumulative) import time in microseconds by module name.
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(phasortoolbox.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=env, stderr=subprocess.PIPE, check=True).stderr.decode()
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():  # Skips the header line
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def measure(module='phasortoolbox', repeat=5, slowest=10):
+    """Imports module repeat times and returns its measurements (dict)."""
+    best = min((importtime(module) for _ in range(repeat)),
+               key=lambda times: times[module][1])
+    top = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:slowest]
+    return {
+        'module': module,
+        'ms': best[module][1] / 1000,
+        'modules': len(best),
+        'slowest': [(name, own / 1000) for name, (own, _) in top],
+        'heavy': [name for name in HEAVY
+                  if any(imported == name or imported.startswith(name + '.') for imported in best)],
+    }
+
+
+def check(result, baseline=None, tolerance=0.2, budget=None):
+    """Compares the import time with a baseline measurement and a budget.
+
+    Args:
+        result (dict): Returned by measure().
+        baseline (dict): Returned by measure(). Defaults to None, no check.
+        tolerance (float): Allowed slowdown against the baseline.
+        budget (float): Allowed import time in ms. Defaults to None, no
+                        check.
+
+    Returns:
+        list: (name, allowed ms, ms) of every exceeded limit.
+    """
+    exceeded = []
+    if baseline is not None and result['ms'] > baseline['ms'] * (1 + tolerance):
+        exceeded.append(('import ' + result['module'], baseline['ms'], result['ms']))
+    if budget is not None and result['ms'] > budget:
+        exceeded.append(('import budget ' + result['module'], budget, result['ms']))
+    return exceeded
+
+
+def format_result(result):
+    lines = ['import {}: {:.1f} ms, {} modules{}'.format(
+        result['module'], result['ms'], result['modules'],
+        ', heavy: ' + ', '.join(result['heavy']) if result['heavy'] else '')]
+    for name, ms in result['slowest']:
+        lines.append('    {:<48}{:>8.2f} ms'.format(name, ms))
+    return '\n'.join(lines)
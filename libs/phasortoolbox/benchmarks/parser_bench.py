@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Throughput of the parser entry points on synthetic streams.
+
+Every case parses the same SyntheticStream and reports:
+    frames_per_s        Data messages parsed per second (best run).
+    us_per_frame        Microseconds per data message (best run).
+    blocks_per_frame    Memory blocks still allocated per data message while
+                        the parsed messages are alive.
+    peak_bytes_per_frame
+                        Peak traced memory per data message (tracemalloc).
+    streams_per_core    frames_per_s / data rate: how many such data streams
+                        one core can parse.
+    mb_per_s            Input parsed per second in MB: the message stream,
+                        or the pcap file for the pcap cases.
+"""
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from phasortoolbox.parser.parser import Parser, PcapParser
+from phasortoolbox.parser.framer import Framer
+
+
+def _parse(stream, fast=True):
+    return Parser(fast=fast).parse(stream.raw_bytes)
+
+
+def _parse_buffer(stream, lazy=False):
+    return Parser().parse_buffer(stream.raw_bytes, lazy=lazy)
+
+
+def _frames(stream):
+    my_parser = Parser()
+    messages = []
+    for chunk in stream.chunks(1460):
+        my_parser.feed(chunk)
+        messages.extend(my_parser.frames())
+    return messages
+
+
+def _runs(stream, size):
+    # As the Client: every read is framed and its runs of complete messages
+    # are parsed in one call each
+    my_parser = Parser()
+    framer = Framer()
+    messages = []
+    for chunk in stream.chunks(size):
+        framer.feed(chunk)
+        for buf, offset, length in framer.runs():
+            messages.extend(my_parser.parse_buffer(buf, offset, length, lazy=True))
+    return messages
+
+
+def _parse_batch(stream):
+    return Parser(stream.cfg).parse_batch(stream.raw_data)
+
+
+def _from_pcap(stream):
+    return PcapParser().from_pcap(stream.pcap_file)
+
+
+def _iter_pcap(stream):
+    # Messages are dropped as they are parsed, as when a capture is streamed
+    count = 0
+    for _ in PcapParser().iter_pcap(stream.pcap_file, lazy=True):
+        count += 1
+    return count
+
+
+def _parallel_pcap(stream):
+    # Every core; the pool start-up is part of the measurement
+    count = 0
+    for batch in PcapParser().parallel_batches(stream.pcap_file):
+        count += len(batch)
+    return count
+
+
+CASES = {
+    'parse': lambda stream: _parse(stream),
+    'parse_kaitai': lambda stream: _parse(stream, fast=False),
+    'parse_buffer': lambda stream: _parse_buffer(stream),
+    'parse_buffer_lazy': lambda stream: _parse_buffer(stream, lazy=True),
+    'frames': _frames,
+    'runs': lambda stream: _runs(stream, 1460),
+    'runs_coalesced': lambda stream: _runs(stream, 1 << 16),
+    'parse_batch': _parse_batch,
+    'from_pcap': _from_pcap,
+    'iter_pcap': _iter_pcap,
+    'parallel_pcap': _parallel_pcap,
+}
+_BATCH_CASES = ('parse_batch', 'parallel_pcap')  # NumPy is required
+
+
+def _batch_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _input_bytes(name, stream):
+    if name.endswith('_pcap'):
+        return os.path.getsize(stream.pcap_file)
+    if name == 'parse_batch':
+        return len(stream.raw_data)
+    return len(stream.raw_bytes)
+
+
+def measure(case, stream, repeat=5, nbytes=0):
+    """Runs one case repeat times and returns its measurements (dict).
+    nbytes is the size of the input of the case.
+    """
+    frames = len(stream.data)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case(stream)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = case(stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+    del result
+
+    return {
+        'frames': frames,
+        'seconds': best,
+        'frames_per_s': frames / best,
+        'us_per_frame': best / frames * 1e6,
+        'blocks_per_frame': blocks / frames,
+        'peak_bytes_per_frame': peak / frames,
+        'streams_per_core': frames / best / stream.data_rate,
+        'mb_per_s': nbytes / best / 1e6,
+    }
+
+
+def run(stream, cases=None, repeat=5):
+    """Measures the cases (names of CASES, default all) on stream.
+
+    Returns:
+        dict: Machine-readable results, see save() and check().
+    """
+    cases = list(CASES) if cases is None else cases
+    if not _batch_available():
+        cases = [name for name in cases if name not in _BATCH_CASES]
+    results = {}
+    fd, stream.pcap_file = tempfile.mkstemp(suffix='.pcap')
+    os.close(fd)
+    try:
+        stream.write_pcap(stream.pcap_file)
+        for name in cases:
+            results[name] = measure(CASES[name], stream, repeat, _input_bytes(name, stream))
+    finally:
+        os.unlink(stream.pcap_file)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'stream': {
+            'stations': len(stream.specs),
+            'frames': len(stream.data),
+            'framesize': stream.framesize,
+            'data_rate': stream.data_rate,
+            'specs': [repr(spec) for spec in stream.specs],
+        },
+        'results': results,
+    }
+
+
+def save(report, file_name):
+    with open(file_name, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(file_name):
+    with open(file_name) as f:
+        return json.load(f)
+
+
+def check(report, baseline, tolerance=0.2):
+    """Compares us_per_frame of every case with a baseline report.
+
+    Returns:
+        list: (case, baseline us_per_frame, us_per_frame) of the cases more
+              than tolerance slower than the baseline.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        base = baseline['results'][name]['us_per_frame']
+        if result['us_per_frame'] > base * (1 + tolerance):
+            regressions.append((name, base, result['us_per_frame']))
+    return regressions
+
+
+def format_report(report):
+    lines = ['{} stations, {} frames of {} bytes, Python {}'.format(
+        report['stream']['stations'], report['stream']['frames'],
+        report['stream']['framesize'], report['python'])]
+    lines.append('{:<20}{:>12}{:>12}{:>12}{:>14}{:>10}{:>10}'.format(
+        'case', 'frames/s', 'us/frame', 'blocks/fr', 'peak B/fr', 'streams', 'MB/s'))
+    for name, r in report['results'].items():
+        lines.append('{:<20}{:>12.0f}{:>12.2f}{:>12.1f}{:>14.0f}{:>10.0f}{:>10.1f}'.format(
+            name, r['frames_per_s'], r['us_per_frame'], r['blocks_per_frame'],
+            r['peak_bytes_per_frame'], r['streams_per_core'], r.get('mb_per_s', 0)))
+    return '\n'.join(lines)
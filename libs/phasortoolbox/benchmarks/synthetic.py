@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Synthetic synchrophasor streams for benchmarks.
+
+Builds a CFG-2 message and data messages for any number of stations with
+configurable channel counts and formats, and writes them to pcap files as
+TCP segments, without any device or capture.
+"""
+import binascii
+import random
+import struct
+
+FORMATS = ('int-polar', 'int-rectangular', 'float-polar', 'float-rectangular')
+
+
+class StationSpec(object):
+    """Channels and data formats of one synthetic station.
+
+    Args:
+        name (str): Station name, at most 16 characters.
+        idcode (int): IDCODE of the station.
+        phasors (int): Number of phasors.
+        analog (int): Number of analog values.
+        digital (int): Number of digital status words.
+        fmt (str): Phasor format, one of FORMATS.
+        float_freq (bool): FREQ/DFREQ as floating point.
+        float_analog (bool): Analog values as floating point.
+        cfgcnt (int): CFGCNT of the station.
+    """
+
+    def __init__(self, name='STATION', idcode=1, phasors=6, analog=2,
+                 digital=1, fmt='int-polar', float_freq=False,
+                 float_analog=False, cfgcnt=1):
+        if fmt not in FORMATS:
+            raise ValueError('Unknown phasor format: {!r}'.format(fmt))
+        self.name = name
+        self.idcode = idcode
+        self.phasors = phasors
+        self.analog = analog
+        self.digital = digital
+        self.float_phasors = fmt.startswith('float')
+        self.polar = fmt.endswith('polar')
+        self.float_freq = float_freq
+        self.float_analog = float_analog
+        self.cfgcnt = cfgcnt
+
+    @property
+    def format_word(self):
+        return ((self.float_freq << 3) | (self.float_analog << 2)
+                | (self.float_phasors << 1) | self.polar)
+
+    def __repr__(self):
+        return "<StationSpec |name={!r}, phasors={}, analog={}, digital={}, format=0x{:X}>".format(
+            self.name, self.phasors, self.analog, self.digital, self.format_word)
+
+
+def stations(count=4, fmt='int-polar', **kwargs):
+    """Returns count StationSpecs. fmt 'mixed' cycles through FORMATS and the
+    integer/floating point FREQ and analog types.
+    """
+    specs = []
+    for i in range(count):
+        if fmt == 'mixed':
+            kwargs = dict(kwargs, float_freq=bool(i & 1), float_analog=bool(i & 2))
+            _fmt = FORMATS[i % len(FORMATS)]
+        else:
+            _fmt = fmt
+        specs.append(StationSpec('STATION{}'.format(i), i + 1, fmt=_fmt, **kwargs))
+    return specs
+
+
+def message(sync, idcode, soc, fracsec, body):
+    """Returns a whole message: common header, body and CHK."""
+    raw = struct.pack('>HHHII', sync, len(body) + 16, idcode, soc, fracsec) + body
+    return raw + struct.pack('>H', binascii.crc_hqx(raw, 0xFFFF))
+
+
+def cfg2(idcode, specs, time_base=1000000, data_rate=60, soc=0):
+    """Returns a CFG-2 message describing the stations specs."""
+    body = [struct.pack('>IH', time_base, len(specs))]
+    for spec in specs:
+        body.append(spec.name.ljust(16)[:16].encode())
+        body.append(struct.pack('>HHHHH', spec.idcode, spec.format_word,
+                                spec.phasors, spec.analog, spec.digital))
+        body.extend('PH{}'.format(i).ljust(16).encode() for i in range(spec.phasors))
+        body.extend('AN{}'.format(i).ljust(16).encode() for i in range(spec.analog))
+        body.extend('D{}'.format(i).ljust(16).encode() for i in range(16 * spec.digital))
+        # Voltages and currents alternate, 10^-5 V or A per bit
+        body.extend(struct.pack('>I', ((i % 2) << 24) | 100000) for i in range(spec.phasors))
+        body.extend(struct.pack('>I', 100) for _ in range(spec.analog))
+        body.extend(struct.pack('>HH', 0, 0xFFFF) for _ in range(spec.digital))
+        body.append(struct.pack('>HH', 0, spec.cfgcnt))  # 60 Hz
+    body.append(struct.pack('>h', data_rate))
+    return message(0xAA31, idcode, soc, 0, b''.join(body))
+
+
+def data(idcode, specs, soc, fracsec, rnd=None, stat=0):
+    """Returns a data message with random values for the stations specs."""
+    rnd = rnd if rnd is not None else random.Random(0)
+    body = []
+    for spec in specs:
+        body.append(struct.pack('>H', stat))
+        for _ in range(spec.phasors):
+            if spec.float_phasors and spec.polar:
+                body.append(struct.pack('>ff', rnd.uniform(0, 1e5), rnd.uniform(-3.1416, 3.1416)))
+            elif spec.float_phasors:
+                body.append(struct.pack('>ff', rnd.uniform(-1e5, 1e5), rnd.uniform(-1e5, 1e5)))
+            elif spec.polar:
+                body.append(struct.pack('>Hh', rnd.randrange(65536), rnd.randrange(-31416, 31417)))
+            else:
+                body.append(struct.pack('>hh', rnd.randrange(-32767, 32768), rnd.randrange(-32767, 32768)))
+        if spec.float_freq:
+            body.append(struct.pack('>ff', 60 + rnd.uniform(-0.1, 0.1), rnd.uniform(-1, 1)))
+        else:
+            body.append(struct.pack('>hh', rnd.randrange(-100, 101), rnd.randrange(-100, 101)))
+        for _ in range(spec.analog):
+            if spec.float_analog:
+                body.append(struct.pack('>f', rnd.uniform(-10, 10)))
+            else:
+                body.append(struct.pack('>h', rnd.randrange(-3000, 3001)))
+        body.extend(struct.pack('>H', rnd.randrange(65536)) for _ in range(spec.digital))
+    return message(0xAA01, idcode, soc, fracsec, b''.join(body))
+
+
+class SyntheticStream(object):
+    """A CFG-2 message followed by data messages at a fixed rate.
+
+    Example:
+        stream = SyntheticStream(stations(4, 'mixed'), frames=1000)
+        Parser().parse(stream.raw_bytes)
+
+    Args:
+        specs (list): StationSpecs of the data stream.
+        frames (int): Number of data messages.
+        idcode (int): IDCODE of the data stream.
+        data_rate (int): Data messages per second.
+        seed (int): Seed of the random values.
+    """
+
+    def __init__(self, specs, frames=1000, idcode=7, data_rate=60, seed=0):
+        self.specs = specs
+        self.idcode = idcode
+        self.data_rate = data_rate
+        time_base = 1000000
+        self.cfg = cfg2(idcode, specs, time_base, data_rate, soc=1500000000)
+        rnd = random.Random(seed)
+        self.data = [
+            data(idcode, specs, 1500000001 + i // data_rate,
+                 (i % data_rate) * time_base // data_rate, rnd)
+            for i in range(frames)]
+        self.framesize = len(self.data[0]) if self.data else None
+
+    @property
+    def raw_bytes(self):
+        """The configuration message followed by the data messages."""
+        return self.cfg + b''.join(self.data)
+
+    @property
+    def raw_data(self):
+        """The data messages only."""
+        return b''.join(self.data)
+
+    def chunks(self, size=1460):
+        """Splits raw_bytes like a TCP stream with segments of size bytes."""
+        raw_bytes = self.raw_bytes
+        return [raw_bytes[i:i + size] for i in range(0, len(raw_bytes), size)]
+
+    def write_pcap(self, file_name, segment_size=None):
+        """Writes the stream to a pcap file as Ethernet/IPv4/TCP packets, one
+        message per packet or segment_size bytes per packet.
+        """
+        payloads = [self.cfg] + self.data if segment_size is None else self.chunks(segment_size)
+        write_pcap(file_name, payloads)
+
+    def __repr__(self):
+        return "<SyntheticStream |stations={}, frames={}, framesize={!r}>".format(
+            len(self.specs), len(self.data), self.framesize)
+
+
+_PCAP_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD = struct.Struct('<IIII')
+
+
+def write_pcap(file_name, payloads, src=('10.0.0.1', 4712), dst=('10.0.0.2', 50000)):
+    """Writes each payload as one TCP segment of an Ethernet/IPv4 packet."""
+    src_ip = bytes(int(b) for b in src[0].split('.'))
+    dst_ip = bytes(int(b) for b in dst[0].split('.'))
+    seq = 1
+    with open(file_name, 'wb') as f:
+        f.write(_PCAP_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for i, payload in enumerate(payloads):
+            tcp = struct.pack('>HHIIBBHHH', src[1], dst[1], seq, 1, 5 << 4, 0x18,
+                              65535, 0, 0) + payload
+            ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), i & 0xFFFF, 0,
+                             64, 6, 0, src_ip, dst_ip) + tcp
+            packet = b'\x00\x00\x00\x00\x00\x02' + b'\x00\x00\x00\x00\x00\x01' + b'\x08\x00' + ip
+            f.write(_PCAP_RECORD.pack(1500000000 + i // 60, (i % 60) * 16666,
+                                      len(packet), len(packet)))
+            f.write(packet)
+            seq = (seq + len(payload)) & 0xFFFFFFFF
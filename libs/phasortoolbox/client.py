@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
-import gc
 import logging
 import time
 import asyncio
-import struct
 import socket
-from concurrent.futures import Executor, ThreadPoolExecutor
 from phasortoolbox.message import Command
 from phasortoolbox import Parser
+from phasortoolbox.parser.framer import Framer
+from phasortoolbox.gcpolicy import GCPolicy
+from phasortoolbox.offload import ParsePool
+from phasortoolbox.queues import BLOCK, COALESCE, coro_consume
+from phasortoolbox.reconnect import Outage
 LOG=logging.getLogger('phasortoolbox.client')
 
+HANDSHAKES = ('full', 'auto')
+_COMMAND_NAMES = {'off': 'data off', 'cfg2': 'send configuration2', 'on': 'data on'}
+
 
 class Client():
     """A synchrophasor protocol connection client.
@@ -50,7 +55,7 @@ Example:
     >>> pmu_client.callback = f
     >>> pmu_client.run()
     """
-    def __init__(self, idcode, remote_ip=None, remote_port=None, local_port=None, mode='TCP', callback=None, process_pool=False):
+    def __init__(self, idcode, remote_ip=None, remote_port=None, local_port=None, mode='TCP', callback=None, process_pool=False, cache=None, lazy=False, gc_policy=None, on_result=None, receive_queue=None, callback_queue=None, reconnect=None, handshake='full'):
         """docstring for __init__
         Args:
             idcode (int):  The idcode of the remote device. This argument must be provided.
@@ -59,38 +64,86 @@ Example:
             local_port (int):  The local port number. e.g. 4712. This argument is optional under "TCP", and "UDP" mode.
             mode (str): The operation mode. Options are: "TCP" for TCP-only method; "UDP" for UDP-only method; "TCP_UDP" for TCP/UDP method; "UDP_S" for Spontaneous data transmission method.
             callback (function): The function called when a data message is received. 
+            process_pool (bool or ParsePool): Decode data messages and call callback in worker processes, see offload.ParsePool. callback must then be picklable, e.g. a function defined at module level, and its return values are passed to on_result() in the event loop, in the order the messages arrived. True starts a pool of the client; pass a ParsePool to share one. Default value is False.
+            cache (ConfigCache): Preloads the configuration of the remote device from a previous run, so data messages are decoded before a new configuration message arrives.
+            lazy (bool): Pass LazyPhasorFrame objects to the callbacks instead of PhasorMessage objects. Their bodies are decoded on first access, which is faster when only some messages or fields are read, but FRACSEC is a plain integer and the KaitaiStruct tree is not built. Defaults to False.
+            gc_policy (GCPolicy): When the garbage collector runs while receiving. Default value is GCPolicy('full'), a full collection after every data message. Not used while the client is part of a PDC, which applies its own.
+            on_result (function): Called with the return value of callback when process_pool is used.
+            receive_queue (BoundedQueue): Queues the received messages for a parsing task instead of parsing them in data_received(). Reads holding other messages than data messages, such as configuration messages, are never dropped. Its policy cannot be "coalesce", since the messages are not parsed yet. Default value is None.
+            callback_queue (BoundedQueue): Queues the data messages for a task that calls callback, and awaits it if it is a coroutine function, so a slow callback does not stall receiving. Default value is None, callback is called when a message is parsed. Not used with process_pool.
+            reconnect (Reconnect): Connects again with a jittered exponential backoff when the TCP connection fails or is lost, under "TCP" and "TCP_UDP" mode, and records every outage, see reconnect.Reconnect. Default value is None, the connection is made once.
+            handshake (str): Commands sent when a connection is made. Options are: "full" for "data off", "send configuration2" and "data on"; "auto" for "data on" only when the configuration of the remote device is known, parsed before a reconnection or preloaded from cache, and no configuration change is pending, "full" otherwise. A configuration that no longer matches the data messages is fetched again. Default value is "full".
         """
+        if handshake not in HANDSHAKES:
+            raise ValueError('Unknown handshake {!r}. Options are: {}.'.format(handshake, ', '.join(HANDSHAKES)))
+        if receive_queue is not None:
+            if receive_queue.policy == COALESCE:
+                raise ValueError('receive_queue cannot coalesce: it holds reads, not parsed messages.')
+            if receive_queue.protect is None:
+                receive_queue.protect = _holds_cfg
         self.remote_ip = remote_ip  # '10.0.0.1'
         self.remote_port = remote_port  # 4712
         self.local_port = local_port  # 4712
         self.idcode = idcode  # 1
         if callback is not None:
             self.callback = callback  # lambda x: None
+        if on_result is not None:
+            self.on_result = on_result
         self.mode = mode
         self.receive_counter = 0
         self.process_pool = process_pool
-        self._parser = Parser()
+        self.lazy = lazy
+        self._pool = None  # ParsePool while running with process_pool
+        self.receive_queue = receive_queue
+        self.callback_queue = callback_queue
+        self._tasks = []  # Consumers of the queues
+        self._parser = Parser(cache=cache)
+        self._parser.on_configuration_change = self._request_cfg
         self._transport = None
         self._protocol = None
         self._pdc_callbacks = {}
+        self._lazy_pdcs = set()  # PDCs that need PhasorFrame objects
         self._garbage_collection = True
+        self.gc_policy = gc_policy if gc_policy is not None else GCPolicy()
+        self.reconnect = reconnect
+        self.handshake = handshake
+        self._closing = False
+        self._outage = None  # Outage until data flows again
+        self._last_data = None  # perf_counter of the last data message
+        self._reconnect_task = None
         self.set_loop()
 
     def callback(self, data):
         """Called when a data message is received. 
         This is an empty function. 
         Args:
-            data (PhasorMessage): This is the parsed data message
+            data (PhasorMessage): This is the parsed data message, a LazyPhasorFrame if lazy is set and a PhasorFrame in a worker process (process_pool)
+        """
+        pass
+
+    def on_result(self, result):
+        """Called in the event loop with the return value of callback() when
+        it runs in a worker process (process_pool).
+        This is an empty function.
+        """
+        pass
+
+    def on_reconnect(self, outage):
+        """Called when data flows again after the connection was lost, with
+        reconnect used.
+        This is an empty function.
+        Args:
+            outage (reconnect.Outage): attempts, down and data_off of the outage.
         """
         pass
 
-    def run(self, c=0, loop=None, executor=None):
+    def run(self, c=0, loop=None):
         """An event loop warper.
         This function creates a new event loop and schedule the coro_run() then let the event loop run_forever(). When stopped, do some clean up.
         Args:
             c (int): defines the number of data messages received before stop. The default value is 0, which means run forever.
         """
-        self.set_loop(loop, executor)
+        self.set_loop(loop)
         self.loop.create_task(self.coro_run(c))
         try:
             self.loop.run_forever()
@@ -109,12 +162,20 @@ Example:
         """
         self.receive_counter = 0
         self.c = c
+        self._closing = False
+        if self._garbage_collection:
+            self.gc_policy.start()
+        if self.process_pool:
+            self._pool = self.process_pool if isinstance(self.process_pool, ParsePool) else ParsePool()
+        if self.receive_queue is not None:
+            self._tasks.append(asyncio.ensure_future(coro_consume(self.receive_queue, self._parse_queued)))
+        if self.callback_queue is not None:
+            self._tasks.append(asyncio.ensure_future(coro_consume(self.callback_queue, self.callback)))
         if self.mode == 'TCP':
-            LOG.info('Connecting to: (\'{}\', {}) ...'.format(self.remote_ip, self.remote_port))
-            self._transport, self._protocol = await self.loop.create_connection(lambda: _TCPOnly(self.idcode, self._data_received), self.remote_ip, self.remote_port)
+            await self._coro_connect()
 
         elif self.mode == 'UDP':
-            self._transport, self._protocol = await self.loop.create_datagram_endpoint(lambda: _UDPOnly(self.idcode, self._data_received), local_addr=('0.0.0.0', self.local_port) if self.local_port else None, remote_addr=(self.remote_ip, self.remote_port))
+            self._transport, self._protocol = await self.loop.create_datagram_endpoint(lambda: _UDPOnly(self.idcode, self._received, self._commands(), self._parser.max_framesize), local_addr=('0.0.0.0', self.local_port) if self.local_port else None, remote_addr=(self.remote_ip, self.remote_port))
 
         elif self.mode == 'TCP_UDP':
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
@@ -122,11 +183,9 @@ Example:
             #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             sock.bind(('0.0.0.0', self.local_port))
-            LOG.info('Connecting to: (\'{}\', {}) ...'.format(self.remote_ip, self.remote_port))
             await self.loop.create_datagram_endpoint(
-                lambda: _UDP_Spontaneous(self.remote_ip, None, self._data_received), sock=sock)
-            self._transport, self._protocol = await self.loop.create_connection(lambda: _TCPOnly(self.idcode, self._data_received),
-                              self.remote_ip, self.remote_port)
+                lambda: _UDP_Spontaneous(self.remote_ip, None, self._received, self._parser.max_framesize), sock=sock)
+            await self._coro_connect()
 
         elif self.mode == 'UDP_S':
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
@@ -134,90 +193,263 @@ Example:
             #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             sock.bind(('0.0.0.0', self.local_port))
-            LOG.warning('Waiting for configuration packet, this may last a minute ...')
+            if self._parser.has_cfg(self.idcode):
+                LOG.info('Using cached configuration of device "idcode {}".'.format(self.idcode))
+            else:
+                LOG.warning('Waiting for configuration packet, this may last a minute ...')
             self._transport, self._protocol = await self.loop.create_datagram_endpoint(
-                lambda: _UDP_Spontaneous(self.remote_ip, self.remote_port, self._data_received), sock=sock)
+                lambda: _UDP_Spontaneous(self.remote_ip, self.remote_port, self._received, self._parser.max_framesize), sock=sock)
+
+    async def _coro_connect(self, outage=None):
+        # Makes the TCP connection, retrying with backoff if reconnect is used
+        reconnect = self.reconnect
+        attempt = outage.attempts if outage is not None else 0
+        while True:
+            if reconnect is not None and attempt:
+                delay = reconnect.delay(attempt)
+                LOG.warning('Connecting to: (\'{}\', {}) again in {:.3f} s (attempt {}).'.format(self.remote_ip, self.remote_port, delay, attempt + 1))
+                await asyncio.sleep(delay)
+            attempt += 1
+            if outage is not None:
+                outage.attempts = attempt
+            commands = self._commands()
+            LOG.info('Connecting to: (\'{}\', {}) ...'.format(self.remote_ip, self.remote_port))
+            connect = self.loop.create_connection(
+                lambda: _TCPOnly(self.idcode, self._received, commands, self._connection_lost,
+                                 self._parser.max_framesize, self._connection_made),
+                self.remote_ip, self.remote_port)
+            try:
+                if reconnect is not None and reconnect.connect_timeout:
+                    connect = asyncio.wait_for(connect, reconnect.connect_timeout)
+                await connect
+            except (OSError, asyncio.TimeoutError) as exc:
+                if reconnect is None or reconnect.gave_up(attempt):
+                    raise
+                LOG.warning('Connection to: (\'{}\', {}) failed: {}.'.format(self.remote_ip, self.remote_port, str(exc) or 'timed out'))
+                continue
+            if outage is not None:
+                outage.connected('fast' if len(commands) == 1 else 'full')
+            if reconnect is not None and reconnect.data_timeout and self._reconnect_task is None:
+                self._tasks.append(asyncio.ensure_future(self._coro_watch(reconnect.data_timeout)))
+            return
+
+    def _commands(self):
+        # Commands of the handshake: data on only if the configuration is known
+        if self.handshake == 'auto' and self._parser.has_cfg(self.idcode) and not self._parser.change_pending(self.idcode):
+            LOG.info('Using known configuration of device "idcode {}".'.format(self.idcode))
+            return ('on',)
+        return ('off', 'cfg2', 'on')
+
+    def _connection_made(self, transport, protocol):
+        # Called by _TCPOnly before any data is received
+        self._transport, self._protocol = transport, protocol
+
+    def _connection_lost(self, exc):
+        # Called by _TCPOnly; the connection is made again unless closing
+        if self._closing or self.reconnect is None or self._reconnect_task is not None:
+            return
+        if self._outage is None:
+            self._outage = Outage(None if exc is None else str(exc), self._last_data)
+        self._reconnect_task = asyncio.ensure_future(self._coro_reconnect(self._outage))
+
+    async def _coro_reconnect(self, outage):
+        try:
+            await self._coro_connect(outage)
+            while self._transport.is_closing():  # Lost again while connecting
+                await self._coro_connect(outage)
+        except (OSError, asyncio.TimeoutError) as exc:
+            LOG.error('Gave up connecting to: (\'{}\', {}) after {} attempts: {}.'.format(self.remote_ip, self.remote_port, outage.attempts, str(exc) or 'timed out'))
+            self._outage = None
+            return
+        finally:
+            self._reconnect_task = None
+        self.reconnect.reconnects += 1
+
+    async def _coro_watch(self, data_timeout):
+        # Drops a connection that delivers no data for data_timeout seconds
+        self._last_data = time.perf_counter()
+        while True:
+            await asyncio.sleep(data_timeout / 2)
+            transport = self._transport
+            if (self._reconnect_task is None and transport is not None and not transport.is_closing()
+                    and time.perf_counter() - max(self._last_data, self._protocol.connected_at) > data_timeout):
+                LOG.warning('No data from: (\'{}\', {}) for {} s, dropping the connection.'.format(self.remote_ip, self.remote_port, data_timeout))
+                if self._outage is None:
+                    self._outage = Outage('no data for {} s'.format(data_timeout), self._last_data)
+                transport.abort()
+
+    def _resumed(self, perf_counter):
+        # The first data message after an outage
+        outage, self._outage = self._outage, None
+        outage.resumed(perf_counter)
+        self.reconnect.outages.append(outage)
+        LOG.warning('Data from device "idcode {}" resumed after {:.3f} s off ({} attempts, {} handshake).'.format(self.idcode, outage.data_off, outage.attempts, outage.handshake))
+        self.on_reconnect(outage)
+
+    def _received(self, data, perf_counter, arr_time, addr=None, offset=0, length=None):
+        # Called by the protocols; TCP data has no addr
+        if self.receive_queue is None:
+            self._data_received(data, perf_counter, arr_time, addr, offset, length)
+        else:
+            self._put(self.receive_queue, (data, perf_counter, arr_time, addr, offset, length), addr)
 
-    def _data_received(self, data, perf_counter, arr_time, addr=None):
-        if self.process_pool:
-            future = self.executor.submit(self._parser.parse, data)
-            if future.exception():
-                raise future.exception()
-            msgs = future.result()
+    def _put(self, queue, item, addr):
+        # A full 'block' queue pauses the TCP connection; datagrams are dropped
+        if queue.put(item, addr is None) and queue.full and queue.policy == BLOCK:
+            if self._pause_reading(queue):
+                queue.paused += 1
+
+    def _parse_queued(self, item):
+        self._data_received(*item)
+
+    def _data_received(self, data, perf_counter, arr_time, addr=None, offset=0, length=None):
+        # data[offset:offset + length] is a run of complete messages
+        if self.lazy or self._pool is not None or self._lazy_pdcs:
+            msgs = self._parser.parse_buffer(data, offset, length, lazy=True)  # Bodies are decoded on access, or in the pool
         else:
-            msgs = self._parser.parse(data)
+            end = len(data) if length is None else offset + length
+            msgs = self._parser.parse(memoryview(data)[offset:end] if offset or end < len(data) else data)
+        offloaded = []  # Decoded in the ParsePool
         if len(msgs)>0:
             parse_time = (time.perf_counter() - perf_counter)/len(msgs)
+        if self.reconnect is not None and msgs:
+            if self._outage is not None and any(msg.sync.frame_type.name == 'data' for msg in msgs):
+                self._resumed(perf_counter)
+            self._last_data = perf_counter
         for msg in msgs:
             if msg.sync.frame_type.name == 'data':
                 msg.perf_counter = perf_counter
                 msg.arr_time = arr_time
                 msg.parse_time = parse_time
                 self.receive_counter += 1
-                #if self.process_pool:
-                #    future = self.executor.submit(self.callback, msg)
-                #    if future.exception():
-                #        raise future.exception()
-                #else:
-                self.callback(msg)
+                if self._pool is not None:
+                    offloaded.append(msg)
+                elif self.callback_queue is None:
+                    self.callback(msg)
+                else:
+                    self._put(self.callback_queue, msg, addr)
                 for pdc_id in self._pdc_callbacks:
                     self._pdc_callbacks[pdc_id](msg)
     
                 if self._garbage_collection:
-                    gc.collect()
+                    self.gc_policy.tick()
     
-                if self.c == 0:
-                    return
-                elif self.c > 1:
+                if self.c > 1:
                     self.c -= 1
-                    return
                 elif self.c == 1:
                     self.loop.stop()
+                    break
             else:
                 LOG.warning('"{}" message received from: {}.'.format(msg.sync.frame_type.name, self._transport.get_extra_info('peername') if addr is None else addr))
+        if offloaded:
+            self._offload(offloaded, addr)
+
+    def _offload(self, msgs, addr):
+        # A full pool pauses the TCP connection until results are delivered;
+        # datagrams cannot be held back and are dropped
+        pool = self._pool
+        if pool.full and addr is not None:
+            pool.dropped += len(msgs)
+            return
+        pool.decode(self.callback, msgs, self.on_result, self.loop)
+        if pool.full:
+            self._pause_reading(pool)
+
+    def _pause_reading(self, pool):
+        # Stops reading the TCP connection until pool (a ParsePool or a
+        # BoundedQueue) is no longer full. Returns True if it was reading.
+        transport = self._transport
+        if isinstance(transport, asyncio.ReadTransport) and transport.is_reading():
+            transport.pause_reading()
+            pool.when_ready(transport.resume_reading)
+            return True
+        return False
+
+    def _request_cfg(self, idcode):
+        # Prefetch the configuration announced by STAT, or fetch it when the change took effect
+        if self._protocol is not None and hasattr(self._protocol, 'send_command'):
+            self._protocol.send_command('cfg2')
+            LOG.info('Configuration change of "idcode {}", command "send configuration2" sent.'.format(idcode))
 
     def checkreceive_counter(self):
         """Print the number of data messages received in the last run
         """
         LOG.warning('{} data messages received from device "idcode {}".'.format(self.receive_counter, self.idcode))
+        for name in ('receive_queue', 'callback_queue', 'reconnect'):
+            if getattr(self, name) is not None:
+                LOG.warning('{} of device "idcode {}": {!r}.'.format(name, self.idcode, getattr(self, name)))
 
     async def coro_close(self):
         """Close the connection.
         This is a coroutine. Before a connection is closed, send command messages to stop transmission if necessary according to the running mode.
         """
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        self._outage = None
         if self._transport:
             if not self._transport.is_closing():
                 if self.mode != 'UDP_S':
                     self._protocol.close()
                     self._transport.close()
-
-
-    def set_loop(self, loop=None, executor=None):
-        """Assign an event loop and and executor to the instance.
-        Call this function if you want the instance to run on external event loop and executor. 
+        for queue in (self.receive_queue, self.callback_queue):
+            if queue is not None:
+                await queue.coro_join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._pool is not None:
+            await self._pool.coro_drain()
+            if self._pool is not self.process_pool:
+                self._pool.close()
+            self._pool = None
+        self.gc_policy.stop()
+
+
+    def set_loop(self, loop=None):
+        """Assign an event loop to the instance.
+        Call this function if you want the instance to run on external event loop. 
         Args:
             loop (asyncio.AbstractEventLoop): Default value is asyncio.new_event_loop()
-            executor (concurrent.futures.Executor): Default value is ThreadPoolExecutor()
         """
         self.loop = loop if loop is not None else asyncio.new_event_loop()
-        self.executor = executor if executor is not None else ThreadPoolExecutor()
 
-    def _add_pdc(self, _pdc_id, _pdc_callback, loop, executor):
+    def _add_pdc(self, _pdc_id, _pdc_callback, loop, lazy=False):
+        # lazy: the PDC decodes the messages in a ParsePool, which takes PhasorFrame objects
         self._pdc_callbacks[_pdc_id] = _pdc_callback
+        if lazy:
+            self._lazy_pdcs.add(_pdc_id)
         self._garbage_collection = False
-        self.set_loop(loop, executor)
+        self.set_loop(loop)
 
     def _remove_pdc(self, _pdc_id):
         del(self._pdc_callbacks[_pdc_id])
+        self._lazy_pdcs.discard(_pdc_id)
         if self._pdc_callbacks == {}:
             self._garbage_collection = True
-        self.set_loop()
+
+
+def _holds_cfg(item):
+    # True if a read queued by Client._received holds other messages than
+    # data messages, e.g. a configuration message
+    data, offset, length = item[0], item[4], item[5]
+    end = len(data) if length is None else offset + length
+    while offset + 4 <= end:
+        if data[offset + 1] & 0x70:  # Frame type
+            return True
+        offset += max((data[offset + 2] << 8) | data[offset + 3], 4)  # FRAMESIZE
+    return False
 
 
 class _TCPOnly(asyncio.Protocol):
-    def __init__(self, idcode, callback=lambda data: None):
+    def __init__(self, idcode, callback=lambda data: None, commands=('off', 'cfg2', 'on'), on_lost=None, bound=None, on_made=None):
         self.idcode = idcode
-        self.buf = _stream_buffer(callback)
+        self.buf = _stream_buffer(callback, bound)
+        self.commands = commands
+        self.on_lost = on_lost
+        self.on_made = on_made
+        self.connected_at = None
 
     def data_received(self, data):
         perf_counter = time.perf_counter()
@@ -227,13 +459,16 @@ class _TCPOnly(asyncio.Protocol):
     def connection_made(self, transport):
         self.transport = transport
         self.peername = transport.get_extra_info('peername')
+        self.connected_at = time.perf_counter()
         LOG.warning('Connected to: {}.'.format(str(self.peername)))
-        self.transport.write(Command(self.idcode, 'off'))
-        LOG.info('Command "data off" sent to: {}.'.format(str(self.peername)))
-        self.transport.write(Command(self.idcode, 'cfg2'))
-        LOG.info('Command "send configuration2" sent to: {}.'.format(str(self.peername)))
-        self.transport.write(Command(self.idcode, 'on'))
-        LOG.info('Command "data on" sent to: {}.'.format(str(self.peername)))
+        if self.on_made is not None:
+            self.on_made(transport, self)
+        for cmd in self.commands:
+            self.transport.write(Command(self.idcode, cmd))
+            LOG.info('Command "{}" sent to: {}.'.format(_COMMAND_NAMES[cmd], str(self.peername)))
+
+    def send_command(self, cmd):
+        self.transport.write(Command(self.idcode, cmd))
 
     def close(self):
         self.transport.write(Command(self.idcode, 'off'))
@@ -241,12 +476,15 @@ class _TCPOnly(asyncio.Protocol):
 
     def connection_lost(self, exc):
         LOG.warning('Connection {} closed.'.format(str(self.peername)))
+        if self.on_lost is not None:
+            self.on_lost(exc)
 
 
 class _UDPOnly(asyncio.DatagramProtocol):
-    def __init__(self, idcode, callback=lambda data: None):
+    def __init__(self, idcode, callback=lambda data: None, commands=('off', 'cfg2', 'on'), bound=None):
         self.idcode = idcode
-        self.buf = _stream_buffer(callback)
+        self.buf = _stream_buffer(callback, bound)
+        self.commands = commands
 
     def datagram_received(self, data, addr):
         perf_counter = time.perf_counter()
@@ -257,12 +495,12 @@ class _UDPOnly(asyncio.DatagramProtocol):
         self.transport = transport
         self.peername = transport.get_extra_info('peername')
         LOG.warning('Connected to: {}.'.format(str(self.peername)))
-        self.transport.sendto(Command(self.idcode, 'off'))
-        LOG.info('Command "data off" sent to: {}.'.format(str(self.peername)))
-        self.transport.sendto(Command(self.idcode, 'cfg2'))
-        LOG.info('Command "send configuration2" sent to: {}.'.format(str(self.peername)))
-        self.transport.sendto(Command(self.idcode, 'on'))
-        LOG.info('Command "data on" sent to: {}.'.format(str(self.peername)))
+        for cmd in self.commands:
+            self.transport.sendto(Command(self.idcode, cmd))
+            LOG.info('Command "{}" sent to: {}.'.format(_COMMAND_NAMES[cmd], str(self.peername)))
+
+    def send_command(self, cmd):
+        self.transport.sendto(Command(self.idcode, cmd))
 
     def close(self):
         self.transport.sendto(Command(self.idcode, 'off'))
@@ -274,11 +512,11 @@ class _UDPOnly(asyncio.DatagramProtocol):
 
 class _UDP_Spontaneous(asyncio.DatagramProtocol):
     def __init__(self, remote_ip=None, remote_port=None,
-                 callback=lambda data, addr: None):
+                 callback=lambda data, addr: None, bound=None):
         self.remote_ip = remote_ip
         self.remote_port = remote_port
         self._pass_score = (self.remote_ip is not None) + (self.remote_port is not None)
-        self.buf = _stream_buffer(callback)
+        self.buf = _stream_buffer(callback, bound)
 
     def datagram_received(self, data, addr):
         perf_counter = time.perf_counter()
@@ -288,35 +526,13 @@ class _UDP_Spontaneous(asyncio.DatagramProtocol):
             self.buf.add_bytes(data, perf_counter, arr_time, addr)
 
 class _stream_buffer():
-    def __init__(self, callback):
-        self.data = b''
-        self.l = 1 # 1 means waiting for header, larger than 1 means waiting to process l bytes
+    def __init__(self, callback, bound=None):
+        # bound: Parser.max_framesize, see Framer
+        self._framer = Framer(bound=bound)
         self.callback = callback
 
     def add_bytes(self, bytes_, perf_counter, arr_time, addr=None):
-        self.data += bytes_
-        while len(self.data) >= self.l:
-            if self.l == 1:
-                self.find_header()
-            if self.l == 4 and len(self.data)>=4:
-                self.l = struct.unpack('>H',self.data[2:4])[0]
-            if self.l > 4 and self.l <= len(self.data):
-                self.callback(self.data[:self.l], perf_counter, arr_time, addr)
-                self.data=self.data[self.l:]
-                self.l = 1
-
-    def find_header(self):
-        i = 0
-        for b in self.data:
-            if b == 170:
-                self.l = 4 # waiting for length info
-                break
-            i += 1
-        self.data = self.data[i:]
-
-
-
-
-
-
-
+        # A read holding many messages is parsed in one call per run
+        self._framer.feed(bytes_)
+        for buf, offset, length in self._framer.runs():
+            self.callback(buf, perf_counter, arr_time, addr, offset, length)
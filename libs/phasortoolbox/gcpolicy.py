@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Garbage collection policies of the receive path.
+
+A Client or PDC calls GCPolicy.tick() once per data message or aligned set
+of synchrophasors. What happens then depends on the mode:
+
+    'full'      gc.collect() on every tick: the behaviour of previous
+                versions. A full collection costs milliseconds once many
+                objects are alive, at 60-120 messages per second.
+    'periodic'  Automatic collection is disabled and a full collection runs
+                every interval ticks.
+    'gen0'      Automatic collection is disabled and the youngest generation
+                is collected every interval ticks, which only walks the
+                objects allocated since.
+    'freeze'    The objects alive at start (modules, parsers, decoders) are
+                collected once and moved to the permanent generation with
+                gc.freeze(), and automatic collection goes on with the given
+                thresholds. Ticks do nothing.
+    'off'       Automatic collection is disabled. Reference cycles are never
+                freed: meant for short runs and measurements.
+
+Every collection run while the policy is started is timed through
+gc.callbacks, including automatic ones, so the modes can be compared from the
+pause times they cause. gc settings are process wide: start one policy at a
+time. stop() restores the settings found by start().
+"""
+import gc
+import time
+from collections import deque
+
+FULL = 'full'
+PERIODIC = 'periodic'
+GEN0 = 'gen0'
+FREEZE = 'freeze'
+OFF = 'off'
+MODES = (FULL, PERIODIC, GEN0, FREEZE, OFF)
+
+FREEZE_THRESHOLDS = (10000, 50, 100)  # Young collections every 10000 allocations
+
+
+class GCPolicy(object):
+    """When the garbage collector runs, and the pauses it causes.
+
+    Example:
+        policy = GCPolicy('gen0', interval=60)
+        pmu_client = Client(idcode=1, remote_ip='10.0.0.1', remote_port=4712,
+                            gc_policy=policy)
+        pmu_client.run(3600)
+        print(policy.collections, policy.pause_total, policy.pause_max)
+
+    Args:
+        mode (str): One of MODES. Defaults to 'full'.
+        interval (int): Ticks between collections in 'periodic' and 'gen0'
+                        modes. Defaults to 1000 and 1.
+        thresholds (tuple): gc.set_threshold() arguments while the policy is
+                            started. Defaults to FREEZE_THRESHOLDS in
+                            'freeze' mode, unchanged otherwise.
+        maxlen (int): Number of pause times kept in pauses.
+
+    Attributes:
+        collections (list): Number of collections of generations 0, 1 and 2.
+        pause_total (float): Seconds spent in collections.
+        pause_max (float): Longest collection, in seconds.
+        pauses (collections.deque): (generation, seconds) of the last maxlen
+                                    collections, oldest first.
+    """
+
+    def __init__(self, mode=FULL, interval=None, thresholds=None, maxlen=1000):
+        if mode not in MODES:
+            raise ValueError('Unknown GC policy {!r}. Options are: {}.'.format(mode, ', '.join(MODES)))
+        self.mode = mode
+        if interval is None:
+            interval = 1 if mode == GEN0 else 1000
+        self.interval = max(int(interval), 1)
+        if thresholds is None and mode == FREEZE:
+            thresholds = FREEZE_THRESHOLDS
+        self.thresholds = thresholds
+        self.pauses = deque(maxlen=maxlen)
+        self.reset()
+        self._ticks = 0
+        self._started = False
+        self._saved = None  # (enabled, thresholds) found by start()
+        self._collection_start = None
+
+    def start(self):
+        """Applies the policy and starts timing collections. Call it once
+        the long-lived objects are created, e.g. when the connection is made.
+        """
+        if self._started:
+            return
+        self._started = True
+        self._ticks = 0
+        self._saved = (gc.isenabled(), gc.get_threshold())
+        gc.callbacks.append(self._on_gc)
+        if self.mode == FREEZE:
+            gc.collect()
+            if hasattr(gc, 'freeze'):  # Python 3.7+
+                gc.freeze()
+        if self.thresholds is not None:
+            gc.set_threshold(*self.thresholds)
+        if self.mode in (PERIODIC, GEN0, OFF):
+            gc.disable()
+
+    def stop(self):
+        """Restores the gc settings found by start() and stops timing."""
+        if not self._started:
+            return
+        self._started = False
+        enabled, thresholds = self._saved
+        if self.mode == FREEZE and hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+        gc.set_threshold(*thresholds)
+        if enabled:
+            gc.enable()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def tick(self):
+        """Called once per message: runs the collection due, if any."""
+        mode = self.mode
+        if mode == FULL:
+            gc.collect()
+        elif mode == PERIODIC or mode == GEN0:
+            self._ticks += 1
+            if self._ticks >= self.interval:
+                self._ticks = 0
+                gc.collect(0 if mode == GEN0 else 2)
+
+    def reset(self):
+        """Clears the pause times and counters."""
+        self.collections = [0, 0, 0]
+        self.pause_total = 0.0
+        self.pause_max = 0.0
+        self.pauses.clear()
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._collection_start = time.perf_counter()
+        elif self._collection_start is not None:
+            pause = time.perf_counter() - self._collection_start
+            self._collection_start = None
+            generation = info['generation']
+            self.collections[generation] += 1
+            self.pause_total += pause
+            if pause > self.pause_max:
+                self.pause_max = pause
+            self.pauses.append((generation, pause))
+
+    def __repr__(self):
+        return "<GCPolicy |mode={!r}, collections={}, pause_total={:.6f}, pause_max={:.6f}>".format(
+            self.mode, self.collections, self.pause_total, self.pause_max)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Decoding of data messages and user callbacks in worker processes.
+
+The event loop keeps framing the stream and parsing message headers, which
+is cheap, and follows the configuration of every data stream as before.
+Data messages are sent to a ProcessPoolExecutor as raw bytes together with
+the raw configuration message they were parsed with. Every worker keeps a
+replica of the configuration of each data stream, compiled on first use and
+again when it changes, decodes the messages in full and calls the user
+function on them. Only the return values of that function come back.
+
+The loop never waits on a worker: results are collected by future
+callbacks and delivered in the order the messages arrived, per IDCODE. The
+number of tasks in flight is bounded; see ParsePool.full.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+
+from .parser.frame import PhasorFrame
+from .parser.parser import Parser
+from .synchrophasor import Synchrophasor
+
+LOG = logging.getLogger('phasortoolbox.offload')
+
+
+class ParsePool(object):
+    """Worker processes that decode data messages and run callbacks on them.
+
+    Example:
+        def to_record(msg):  # Runs in a worker; must be picklable
+            return msg.time, [pmu.freq for pmu in msg.data.pmu_data]
+
+        pool = ParsePool(workers=4)
+        pmu_client = Client(idcode=1, remote_ip='10.0.0.1', remote_port=4712,
+                            callback=to_record, on_result=print,
+                            process_pool=pool)
+
+    One pool can be shared by several clients and a PDC.
+
+    Args:
+        workers (int): Worker processes. Defaults to os.cpu_count().
+        max_in_flight (int): Tasks submitted and not delivered yet above
+                             which the pool is full. Defaults to 4 per
+                             worker.
+        executor (concurrent.futures.Executor): Runs the tasks instead of a
+                                                ProcessPoolExecutor of the
+                                                pool. It is not shut down by
+                                                close().
+
+    Attributes:
+        in_flight (int): Tasks submitted and not delivered yet.
+        submitted (int): Tasks submitted.
+        completed (int): Tasks whose results were delivered.
+        errors (int): Tasks that raised. The exception is logged.
+        dropped (int): Data messages, or aligned sets of a PDC, not submitted
+                       because the pool was full.
+    """
+
+    def __init__(self, workers=None, max_in_flight=None, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 4 * self.workers
+        self._executor = executor
+        self._own_executor = executor is None
+        self._queues = {}  # key: deque of (future, on_result), in submission order
+        self._ready = []  # Called once when the pool is no longer full
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0
+
+    @property
+    def full(self):
+        """True while max_in_flight tasks are in flight. Callers pause their
+        input (see when_ready()) or drop messages and count them in dropped.
+        """
+        return self.in_flight >= self.max_in_flight
+
+    def when_ready(self, callback):
+        """Calls callback() once, when the tasks in flight fall to half of
+        max_in_flight.
+        """
+        self._ready.append(callback)
+
+    def decode(self, func, msgs, on_result, loop=None):
+        """Decodes data messages in a worker and calls func(msg) there on
+        each of them, in order. on_result(result) is called in the loop with
+        every return value, in the order of msgs for every IDCODE.
+
+        Args:
+            func (function): A picklable function, e.g. defined at module
+                             level, taking a PhasorFrame.
+            msgs (list): Data messages (PhasorFrame objects) parsed by a
+                         Parser of the loop. perf_counter, arr_time and
+                         parse_time are passed on.
+            on_result (function): Called in the loop with each result.
+            loop (asyncio.AbstractEventLoop): Defaults to the running loop.
+        """
+        group = []
+        key = None
+        for msg in msgs:
+            if group and (msg.idcode, msg._mini_cfg) != key:
+                self._submit(key[0], loop, on_result, _decode, func, *_pack(group))
+                group = []
+            key = (msg.idcode, msg._mini_cfg)
+            group.append(msg)
+        if group:
+            self._submit(key[0], loop, on_result, _decode, func, *_pack(group))
+
+    def align(self, func, batch, on_result, loop=None):
+        """Calls func(synchrophasors) in a worker for every list of
+        Synchrophasor objects in batch, with their data messages decoded
+        there, and on_result(result) in the loop with the return values, in
+        submission order.
+        """
+        args = []
+        for synchrophasors in batch:
+            sets = []
+            for synchrophasor in synchrophasors:
+                frames = []
+                for msg in synchrophasor:
+                    if msg is None:
+                        frames.append(None)
+                    else:
+                        config, raw_bytes, stamps = _pack([msg])
+                        frames.append((config, raw_bytes, stamps[0]))
+                sets.append((frames, synchrophasor.time, synchrophasor.arr_time, synchrophasor.perf_counter))
+            args.append(sets)
+        self._submit(None, loop, on_result, _align, func, args)
+
+    def _submit(self, key, loop, on_result, fn, *args):
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor  # Keeps multiprocessing out of the import
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        loop = loop if loop is not None else asyncio.get_event_loop()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append((future, on_result))
+        self.in_flight += 1
+        self.submitted += 1
+        future.add_done_callback(lambda _: self._deliver(key))
+
+    def _deliver(self, key):
+        # Delivers the results of the tasks of key completed in order
+        queue = self._queues.get(key)
+        while queue and queue[0][0].done():
+            future, on_result = queue.popleft()
+            self.in_flight -= 1
+            if future.cancelled():
+                continue
+            exc = future.exception()
+            if exc is not None:
+                self.errors += 1
+                LOG.error('Offloaded task of "idcode {}" failed.'.format(key), exc_info=exc)
+                continue
+            self.completed += 1
+            for result in future.result():
+                on_result(result)
+        if queue is not None and not queue:
+            del self._queues[key]
+        if self._ready and self.in_flight <= self.max_in_flight // 2:
+            ready, self._ready = self._ready, []
+            for callback in ready:
+                callback()
+
+    async def coro_drain(self):
+        """Waits until the results of every task submitted are delivered."""
+        while self._queues:
+            futures = [future for queue in self._queues.values() for future, _ in queue]
+            await asyncio.wait(futures)
+            await asyncio.sleep(0)  # Let the done callbacks run
+
+    def close(self):
+        """Shuts the worker processes down. Tasks in flight are cancelled."""
+        for queue in self._queues.values():
+            for future, _ in queue:
+                future.cancel()
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __repr__(self):
+        return "<ParsePool |workers={}, in_flight={}, submitted={}, completed={}, errors={}, dropped={}>".format(
+            self.workers, self.in_flight, self.submitted, self.completed, self.errors, self.dropped)
+
+
+def _pack(msgs):
+    # The arguments describing msgs to a worker: the configuration they were
+    # parsed with, their bytes back to back and their time stamps
+    mini_cfg = msgs[0]._mini_cfg
+    if mini_cfg is None or mini_cfg.raw_pkt is None:
+        raise ValueError('No configuration message to decode "idcode {}" with.'.format(msgs[0].idcode))
+    config = (msgs[0].idcode, mini_cfg.raw_pkt, mini_cfg.decoder.projection)
+    raw_bytes = b''.join(msg.raw_pkt for msg in msgs)
+    stamps = [(msg.perf_counter, msg.arr_time, msg.parse_time) for msg in msgs]
+    return config, raw_bytes, stamps
+
+
+# In the worker processes
+
+_replicas = {}  # idcode: _Replica
+
+
+class _Replica(object):
+    # The configuration of one data stream as installed in the loop, where
+    # configuration changes are followed; data messages are decoded with it
+    # as they are
+    changes = {}
+
+    def __init__(self, idcode, raw_cfg, projection):
+        parser = Parser()
+        parser.set_projection(idcode, projection)
+        parser.parse_buffer(raw_cfg)
+        self.mini_cfg = parser._mini_cfgs.mini_cfg
+        self.raw_cfg = raw_cfg
+        self.projection = None if projection is None else vars(projection)
+
+    def matches(self, raw_cfg, projection):
+        return (self.raw_cfg == raw_cfg
+                and self.projection == (None if projection is None else vars(projection)))
+
+    def data_frame(self, idcode, framesize, buf, offset):
+        return self.mini_cfg[idcode]
+
+
+def _frames(config, raw_bytes, stamps):
+    idcode, raw_cfg, projection = config
+    replica = _replicas.get(idcode)
+    if replica is None or not replica.matches(raw_cfg, projection):
+        replica = _replicas[idcode] = _Replica(idcode, raw_cfg, projection)
+    view = memoryview(raw_bytes)
+    offset = 0
+    msgs = []
+    for perf_counter, arr_time, parse_time in stamps:
+        msg = PhasorFrame(view, offset, replica)
+        msg.perf_counter = perf_counter
+        msg.arr_time = arr_time
+        msg.parse_time = parse_time
+        offset += msg.framesize
+        msgs.append(msg)
+    return msgs
+
+
+def _decode(func, config, raw_bytes, stamps):
+    return [func(msg) for msg in _frames(config, raw_bytes, stamps)]
+
+
+def _align(func, args):
+    results = []
+    for sets in args:
+        synchrophasors = []
+        for frames, time_tag, arr_time, perf_counter in sets:
+            msgs = [None if frame is None else _frames(frame[0], frame[1], [frame[2]])[0]
+                    for frame in frames]
+            synchrophasors.append(Synchrophasor(msgs, time_tag, arr_time, perf_counter))
+        results.append(func(synchrophasors))
+    return results
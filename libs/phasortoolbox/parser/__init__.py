@@ -2,3 +2,4 @@
 
 from .parser import Parser
 from .parser import PcapParser
+from .cfgcache import ConfigCache
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Batch decoding of data frames into NumPy arrays.
+
+NumPy is only needed by this module; it is imported when a batch is parsed.
+"""
+import numpy as np
+from .timetag import time_ns
+from . import phasors
+
+
+class DataBatch(object):
+    """N data frames of one data stream (IDCODE) decoded into columns.
+
+    Example:
+        my_parser = Parser(raw_cfg_pkt)
+        batch = my_parser.parse_batch(raw_data_frames)
+        batch.soc                   # (N,) SOC
+        batch.stations[0].phasors   # (N, phnmr) complex phasors
+        batch.stations[0].angle_deg # (N, phnmr) phasor angles in degrees
+        batch.stations[0].freq      # (N,) frequency in Hz
+
+    Attributes:
+        idcode (int): IDCODE of the data stream.
+        soc (numpy.ndarray): (N,) SOC.
+        fracsec (numpy.ndarray): (N,) FRACSEC without the time flags.
+        time_flags (numpy.ndarray): (N,) time flags (the most significant
+                                    byte of FRACSEC).
+        time_quality (numpy.ndarray): (N,) message time quality code (bits
+                                      3-0 of the time flags).
+        time_base (int): TIME_BASE of the configuration.
+        chk (numpy.ndarray): (N,) CHK.
+        stations (list): One StationBatch per station.
+
+    Args:
+        frames (numpy.ndarray): Structured array with the frame_descr dtype
+                                of the DataDecoder.
+        mini_cfg (MiniCfg): The configuration used to decode the frames.
+    """
+
+    def __init__(self, frames, mini_cfg):
+        self._frames = frames
+        self._mini_cfg = mini_cfg
+        self.idcode = int(frames['idcode'][0]) if len(frames) else None
+        self.soc = frames['soc'].astype(np.uint32)
+        _fracsec = frames['fracsec'].astype(np.uint32)
+        self.fracsec = _fracsec & 0x00FFFFFF
+        self.time_flags = (_fracsec >> 24).astype(np.uint8)
+        self.time_quality = self.time_flags & 0x0F
+        self.time_base = mini_cfg.time_base.time_base
+        self.chk = frames['chk'].astype(np.uint16)
+        self.stations = [
+            StationBatch(frames, 's{}_'.format(k), station)
+            for k, station in enumerate(mini_cfg.decoder.stations)]
+
+    def __len__(self):
+        return len(self.soc)
+
+    def __getstate__(self):
+        # The configuration holds compiled structs; the columns are enough
+        state = dict(self.__dict__)
+        state['_frames'] = state['_mini_cfg'] = None
+        return state
+
+    @property
+    def time(self):
+        """(N,) time tags as float epoch seconds."""
+        return self.soc + self.fracsec / float(self.time_base)
+
+    @property
+    def time_ns(self):
+        """(N,) exact time tags as int64 nanoseconds since the epoch."""
+        return time_ns(self.soc.astype(np.int64), self.fracsec.astype(np.int64), self.time_base)
+
+    @property
+    def leap_second_pending(self):
+        """(N,) bool, a leap second is pending."""
+        return (self.time_flags & 0x10).astype(bool)
+
+    @property
+    def leap_second_occurred(self):
+        """(N,) bool, a leap second occurred."""
+        return (self.time_flags & 0x20).astype(bool)
+
+    @property
+    def leap_second_direction(self):
+        """(N,) leap second direction, 0 to add and 1 to delete."""
+        return (self.time_flags >> 6) & 0x01
+
+    def __repr__(self):
+        return "<DataBatch |idcode={!r}, frames={}, stations={}>".format(
+            self.idcode, len(self), len(self.stations))
+
+
+class StationBatch(object):
+    """Scaled columns of one station. Channels left out by the projection of
+    the decoder are missing, and stat, freq or dfreq are None when left out.
+
+    Phasors are kept in the coordinate system of the data stream; the other
+    one, degrees and complex values are computed as whole arrays on first
+    access (see phasors.py).
+
+    Attributes:
+        stn (str): Station name.
+        phasor_names (list): Phasor channel names.
+        analog_names (list): Analog channel names.
+        polar (bool): The data stream sends polar phasors.
+        stat (numpy.ndarray): (N,) STAT words.
+        freq (numpy.ndarray): (N,) frequency in Hz.
+        dfreq (numpy.ndarray): (N,) ROCOF in Hz/s.
+        analog (numpy.ndarray): (N, annmr) analog values.
+        digital (numpy.ndarray): (N, dgnmr) digital status words.
+    """
+
+    def __init__(self, frames, prefix, decoder):
+        self._decoder = decoder
+        self.stn = decoder.stn
+        self.phasor_names = decoder.phasor_names
+        self.analog_names = decoder.analog_names
+        self.polar = decoder.polar
+        self.stat = None
+        if decoder._stat is not None:
+            self.stat = frames[prefix + 'stat'].astype(np.uint16)
+
+        raw_ph = frames[prefix + 'phasors'][:, decoder.ph_index]
+        raw_a = raw_ph[..., 0]
+        raw_b = raw_ph[..., 1]
+        if decoder.polar:
+            if decoder.int_phasors:
+                raw_a = raw_a.view('>u2')
+            raw_b = raw_b * decoder.angle_scale
+        self._a, self._b = phasors.scale_phasors(
+            raw_a, raw_b, decoder.polar, decoder.ph_scale, decoder.ph_offset)
+        self._m_other = None
+        self._m_phasors = None
+
+        self.freq = None
+        if decoder._freq is not None:
+            self.freq = frames[prefix + 'freq'] * decoder.freq_scale + decoder.freq_offset
+        self.dfreq = None
+        if decoder._dfreq is not None:
+            self.dfreq = frames[prefix + 'dfreq'] * decoder.dfreq_scale
+        self.analog = frames[prefix + 'analog'][:, decoder.an_index] * np.asarray(decoder.an_scale, dtype=np.float64)
+        if decoder._an_offset:
+            self.analog += np.asarray(decoder.an_offset, dtype=np.float64)
+        self.digital = frames[prefix + 'digital'][:, decoder.dg_index].astype(np.uint16)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_decoder'] = None
+        return state
+
+    def _other(self):
+        if self._m_other is None:
+            if self.polar:
+                self._m_other = phasors.polar_to_rect(self._a, self._b)
+            else:
+                self._m_other = phasors.rect_to_polar(self._a, self._b)
+        return self._m_other
+
+    @property
+    def phasors(self):
+        """(N, phnmr) complex phasors."""
+        if self._m_phasors is None:
+            self._m_phasors = phasors.to_complex(self._a, self._b, self.polar)
+        return self._m_phasors
+
+    @property
+    def real(self):
+        """(N, phnmr) real parts."""
+        return self._other()[0] if self.polar else self._a
+
+    @property
+    def imaginary(self):
+        """(N, phnmr) imaginary parts."""
+        return self._other()[1] if self.polar else self._b
+
+    @property
+    def magnitude(self):
+        """(N, phnmr) magnitudes."""
+        return self._a if self.polar else self._other()[0]
+
+    @property
+    def angle(self):
+        """(N, phnmr) angles in radians."""
+        return self._b if self.polar else self._other()[1]
+
+    @property
+    def angle_deg(self):
+        """(N, phnmr) angles in degrees."""
+        return phasors.degrees(self.angle)
+
+    def __repr__(self):
+        return "<StationBatch |stn={!r}, phasors{}, analog{}, digital{}>".format(
+            self.stn, self._a.shape, self.analog.shape, self.digital.shape)
+
+
+def parse_batch(raw_bytes, mini_cfg, crc=None):
+    """Decodes concatenated data frames of one data stream into a DataBatch.
+
+    Args:
+        raw_bytes (bytes-like): N concatenated data frames, all following
+                                mini_cfg.
+        mini_cfg (MiniCfg): The configuration of the data stream.
+        crc (CrcChecker): Drops frames with a wrong CHK according to its
+                          policy. Defaults to None, no verification.
+
+    Raises:
+        ValueError: The buffer does not hold whole data frames of the
+                    configured size and IDCODE.
+    """
+    dtype = np.dtype(mini_cfg.decoder.frame_descr)
+    if len(raw_bytes) % dtype.itemsize:
+        raise ValueError(
+            'Buffer of {} bytes does not hold whole data frames of {} bytes.'.format(
+                len(raw_bytes), dtype.itemsize))
+    frames = np.frombuffer(raw_bytes, dtype=dtype)
+    if crc is not None and len(frames):
+        ok = crc.check_batch(frames.view(np.uint8).reshape(len(frames), dtype.itemsize))
+        if not ok.all():
+            frames = frames[ok]
+    if len(frames):
+        if np.any(frames['sync'] & 0xFF70 != 0xAA00):
+            raise ValueError('Buffer holds frames that are not data frames.')
+        if np.any(frames['framesize'] != dtype.itemsize):
+            raise ValueError('Buffer holds frames of a different configuration.')
+        if np.any(frames['idcode'] != frames['idcode'][0]):
+            raise ValueError('Buffer holds frames of more than one IDCODE.')
+    return DataBatch(frames, mini_cfg)
@@ -4,12 +4,11 @@ import array
 import struct
 import zlib
 from enum import Enum
-from pkg_resources import parse_version
 
 from kaitaistruct import __version__ as ks_version, KaitaiStruct, KaitaiStream, BytesIO
 
 
-if parse_version(ks_version) < parse_version('0.7'):
+if tuple(map(int, ks_version.split('.')[:2])) < (0, 7):
     raise Exception("Incompatible Kaitai Struct Python API: 0.7 or later is required, but you have %s" % (ks_version))
 
 class Cfg3(KaitaiStruct):
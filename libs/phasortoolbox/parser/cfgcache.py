@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Persistent cache of configuration messages.
+
+A ConfigCache keeps the last raw CFG-2/CFG-3 message of every data stream
+(all its frames if a CFG-3 message was sent in continuation frames),
+keyed by IDCODE and CFGCNT, in a local file and/or Redis. A Parser created
+with a cache preloads the stored configurations, so data messages are decoded
+from the first one received after a restart instead of after the next
+configuration message.
+"""
+import logging
+import os
+import struct
+import tempfile
+LOG = logging.getLogger('phasortoolbox.parser')
+
+_FRAMESIZE = struct.Struct('>H')
+
+
+class ConfigCache(object):
+    """Stores raw configuration messages by IDCODE.
+
+    An entry is replaced when a configuration message with a different CFGCNT
+    arrives, and removed when a data message announces a configuration change
+    (STAT bit 10), so it is never preloaded after it went stale.
+
+    Example:
+        cache = ConfigCache('/var/lib/phasortoolbox/cfg.bin')
+        my_parser = Parser(cache=cache)  # Preloads the cached configurations
+
+        # Shared by several receivers through Redis:
+        cache = ConfigCache(redis=redis.Redis())
+
+    Args:
+        path (str): File holding the cached messages back to back. Created on
+                    the first store. Defaults to None, no local file.
+        redis: A redis.Redis-like client (hset, hdel and hgetall are used)
+               that returns bytes. A client created with
+               decode_responses=True cannot return the binary messages and
+               is rejected. Defaults to None, no Redis.
+        key (str): Redis hash holding the messages, one field per IDCODE.
+
+    Raises:
+        ValueError: redis decodes responses to str.
+    """
+
+    def __init__(self, path=None, redis=None, key='phasortoolbox:cfg'):
+        if redis is not None and _decodes_responses(redis):
+            raise ValueError('ConfigCache needs a Redis client that returns bytes, '
+                             'created with decode_responses=False.')
+        self.path = path
+        self.redis = redis
+        self.key = key
+        self.configs = {}  # idcode: (cfgcnt, raw_pkt)
+        self._load()
+
+    def __contains__(self, idcode):
+        return idcode in self.configs
+
+    def __len__(self):
+        return len(self.configs)
+
+    def raw_pkts(self):
+        """Returns the cached configuration messages (bytes)."""
+        return [raw_pkt for _, raw_pkt in self.configs.values()]
+
+    def store(self, idcode, cfgcnt, raw_pkt):
+        """Caches the configuration message raw_pkt of data stream idcode.
+
+        Args:
+            idcode (int): IDCODE of the data stream.
+            cfgcnt (tuple): CFGCNT of every station in the message.
+            raw_pkt (bytes-like): The whole configuration message, all its
+                                  frames back to back.
+        """
+        raw_pkt = bytes(raw_pkt)
+        cached = self.configs.get(idcode)
+        self.configs[idcode] = (cfgcnt, raw_pkt)
+        if cached is not None and cached[1] == raw_pkt:
+            return
+        LOG.debug('Configuration of IDCODE {} (CFGCNT {}) cached.'.format(idcode, cfgcnt))
+        if self.redis is not None:
+            self.redis.hset(self.key, str(idcode), raw_pkt)
+        self._save()
+
+    def invalidate(self, idcode):
+        """Removes the configuration of data stream idcode."""
+        if self.configs.pop(idcode, None) is None:
+            return
+        LOG.debug('Cached configuration of IDCODE {} invalidated.'.format(idcode))
+        if self.redis is not None:
+            self.redis.hdel(self.key, str(idcode))
+        self._save()
+
+    def _load(self):
+        raw_pkts = []
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                for raw_pkt in _split(f.read()):
+                    if raw_pkts and raw_pkts[-1][4:6] == raw_pkt[4:6]:
+                        raw_pkts[-1] += raw_pkt  # CFG-3 continuation frame
+                    else:
+                        raw_pkts.append(raw_pkt)
+        if self.redis is not None:
+            raw_pkts.extend(self.redis.hgetall(self.key).values())
+        for raw_pkt in raw_pkts:  # Redis entries override the local file
+            idcode = _FRAMESIZE.unpack_from(raw_pkt, 4)[0]
+            self.configs[idcode] = (None, bytes(raw_pkt))  # cfgcnt is read on preload
+
+    def _save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.cfgcache')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for raw_pkt in self.raw_pkts():
+                    f.write(raw_pkt)
+            os.replace(tmp, self.path)  # Readers never see a partial file
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def __repr__(self):
+        return "<ConfigCache |path={!r}, idcodes={}>".format(
+            self.path, sorted(self.configs))
+
+
+def _decodes_responses(redis):
+    # redis.Redis keeps its connection options in its connection pool
+    pool = getattr(redis, 'connection_pool', None)
+    return bool(getattr(pool, 'connection_kwargs', {}).get('decode_responses'))
+
+
+def _split(raw_bytes):
+    offset = 0
+    while offset + 4 <= len(raw_bytes):
+        framesize = _FRAMESIZE.unpack_from(raw_bytes, offset + 2)[0]
+        if framesize < 16 or offset + framesize > len(raw_bytes):
+            LOG.warning('Truncated configuration cache, ignoring the rest.')
+            break
+        yield raw_bytes[offset:offset + framesize]
+        offset += framesize
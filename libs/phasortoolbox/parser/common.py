@@ -3,11 +3,10 @@ import array
 import struct
 import zlib
 from enum import Enum
-from pkg_resources import parse_version
 
 from kaitaistruct import __version__ as ks_version, KaitaiStruct, KaitaiStream, BytesIO
 
-if parse_version(ks_version) < parse_version('0.7'):
+if tuple(map(int, ks_version.split('.')[:2])) < (0, 7):
     raise Exception(
         "Incompatible Kaitai Struct Python API: 0.7 or later is required, but you have %s" % (ks_version))
 
@@ -16,6 +15,7 @@ from .header import Header
 from .data import Data
 from .cfg_3 import Cfg3
 from .command import Command
+from .timetag import time_ns
 
 
 def _kaitai_repr(self):
@@ -85,10 +85,11 @@ class PhasorMessage(KaitaiStruct):
         _kaitai_show(self, parent_path)
 
 
-    def __init__(self, _io, _parent=None, _root=None, _mini_cfgs=None):
+    def __init__(self, _io, _parent=None, _root=None, _mini_cfgs=None, _fast=False):
         self._io = _io
         self._parent = _parent
         self._root = _root if _root else self
+        self._fast = _fast
         self._pkt_pos = self._io.pos()
         self.sync = self._root.SyncWord(self._io, self, self._root)
         self.framesize = self._io.read_u2be()
@@ -100,23 +101,40 @@ class PhasorMessage(KaitaiStruct):
         _on = self.sync.frame_type.value
         if _on == 0:
             if self._mini_cfg:
-                self.data = Data(self._io, _mini_cfg=self._mini_cfg)
+                _raw_data = self._io.read_bytes((self.framesize - 16))
+                self._mini_cfg = _mini_cfgs.data_frame(self.idcode, self.framesize, _raw_data, 0)
+                if not self._mini_cfg or len(_raw_data) != self._mini_cfg.decoder.size:
+                    self.data = _raw_data  # Frame does not match the stored configuration
+                elif _fast:
+                    self.data = self._mini_cfg.decoder.decode(_raw_data)
+                else:
+                    self.data = Data(KaitaiStream(BytesIO(_raw_data)), _mini_cfg=self._mini_cfg)
             else:
                 self.data = self._io.read_bytes((self.framesize - 16))
         elif _on == 3:
             self._raw_data = self._io.read_bytes((self.framesize - 16))
             io = KaitaiStream(BytesIO(self._raw_data))
             self.data = Cfg2(io)
-            _mini_cfgs.add_cfg(self.idcode, self.data)
+            _io_pos = self._io.pos()
+            self._io.seek(self._pkt_pos)
+            _mini_cfgs.add_cfg(self.idcode, self.data, self._io.read_bytes(self.framesize))
+            self._io.seek(_io_pos)
         elif _on == 4:
             self._raw_data = self._io.read_bytes((self.framesize - 16))
             io = KaitaiStream(BytesIO(self._raw_data))
             self.data = Command(io)
         elif _on == 5:
-            _mini_cfgs.add_cfg(self.raw_pkt)
             self._raw_data = self._io.read_bytes((self.framesize - 16))
-            io = KaitaiStream(BytesIO(self._raw_data))
-            self.data = Cfg3(io)
+            _io_pos = self._io.pos()
+            self._io.seek(self._pkt_pos)
+            _cfg3 = _mini_cfgs.cfg3_frame(self.idcode, self._raw_data, self._io.read_bytes(self.framesize))
+            self._io.seek(_io_pos)
+            if _cfg3 is None:
+                self.data = self._raw_data  # Continuation frame, more to come
+            else:
+                io = KaitaiStream(BytesIO(_cfg3[0]))
+                self.data = Cfg3(io)
+                _mini_cfgs.add_cfg(self.idcode, self.data, _cfg3[1])
         elif _on == 2:
             self._raw_data = self._io.read_bytes((self.framesize - 16))
             io = KaitaiStream(BytesIO(self._raw_data))
@@ -214,6 +232,22 @@ class PhasorMessage(KaitaiStruct):
 
             return self._m_fraction_of_second if hasattr(self, '_m_fraction_of_second') else None
 
+    def _bind(self, mini_cfg):
+        # Decodes a data message held during a configuration change with the
+        # configuration that arrived; see MiniCfgs.hold()
+        if mini_cfg is None or len(self.data) != mini_cfg.decoder.size:
+            return False
+        self._mini_cfg = mini_cfg
+        if self._fast:
+            self.data = mini_cfg.decoder.decode(self.data)
+        else:
+            self.data = Data(KaitaiStream(BytesIO(self.data)), _mini_cfg=mini_cfg)
+        self.fracsec._time_base = mini_cfg.time_base.time_base
+        for cached in (self.fracsec, self):
+            cached.__dict__.pop('_m_fraction_of_second', None)
+            cached.__dict__.pop('_m_time', None)
+        return True
+
     @property
     def time(self):
         if hasattr(self, '_m_time'):
@@ -222,6 +256,13 @@ class PhasorMessage(KaitaiStruct):
         self._m_time = self.soc + self.fracsec.fraction_of_second
         return self._m_time if hasattr(self, '_m_time') else None
 
+    @property
+    def time_ns(self):
+        """The exact time tag in integer nanoseconds since the epoch."""
+        if not self.fracsec._time_base:
+            return None
+        return time_ns(self.soc, self.fracsec.raw_fraction_of_second, self.fracsec._time_base)
+
     @property
     def chk_body(self):
         if hasattr(self, '_m_chk_body'):
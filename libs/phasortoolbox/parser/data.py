@@ -3,16 +3,16 @@
 import array
 import struct
 import zlib
-from enum import Enum
-from collections import UserList
 
 import cmath
-from pkg_resources import parse_version
 
 from kaitaistruct import __version__ as ks_version, KaitaiStruct, KaitaiStream, BytesIO
+from .status import (StatWord, DigitalWord, PmuTimeQualityEnum, TriggerReasonEnum,
+                     PmuTriggerDetectedEnum, ConfigurationChangeEnum, DataModifiedEnum,
+                     PmuSyncEnum, DataSortingEnum, DataErrorEnum, UnlockedTimeEnum)
 
 
-if parse_version(ks_version) < parse_version('0.7'):
+if tuple(map(int, ks_version.split('.')[:2])) < (0, 7):
     raise Exception(
         "Incompatible Kaitai Struct Python API:\
          0.7 or later is required, but you have %s" % (ks_version))
@@ -36,7 +36,7 @@ class Data(KaitaiStruct):
         def __init__(self, _io, _station=None):
             self._station = _station
             self._io = _io
-            self.stat = self.Stat(self._io)
+            self.stat = StatWord(self._io.read_u2be())
             self.phasors = [self.Phasors(
                     self._io, self._station.format, self._station.phunit[i]) for i in range(self._station.phnmr)]
 
@@ -47,24 +47,9 @@ class Data(KaitaiStruct):
             self.analog = [self.Analog(
                     self._io, self._station.format.analogs_data_type, self._station.anunit[i]) for i in range(self._station.annmr)]
 
-            self.digital = [None] * (self._station.dgnmr)
-            for i in range(self._station.dgnmr):
-                _d = "{0:016b}".format(self._io.read_bits_int(16))
-                self.digital[i] = [None] * 16
-                for j in range(16):
-                    self.digital[i][j] = self.Flag(
-                        self._station.digunit[i][j].name,
-                        self._station.digunit[i][j].normal_status,
-                        self._station.digunit[i][j].current_valid_input,
-                        _d[j]
-                        )
-
-        class Flag():
-            def __init__(self, name, normal_status, current_valid_inputs, value):
-                self.name = name
-                self.normal_status = normal_status
-                self.current_valid_inputs = current_valid_inputs
-                self.value = value
+            self.digital = [
+                DigitalWord(self._io.read_u2be(), self._station.digital_labels[i])
+                for i in range(self._station.dgnmr)]
 
         class Freq(KaitaiStruct):
             def __init__(self, _io, freq_data_type, fundamental_frequency=None):
@@ -105,65 +90,15 @@ class Data(KaitaiStruct):
 
         class Stat(KaitaiStruct):
 
-            class PmuTimeQualityEnum(Enum):
-                not_used = 0
-                estimated_maximum_time_error_less_than_100_nanosecond = 1
-                estimated_maximum_time_error_less_than_1_microsecond = 2
-                estimated_maximum_time_error_less_than_10_microsecond = 3
-                estimated_maximum_time_error_less_than_100_microsecond = 4
-                estimated_maximum_time_error_less_than_1_ms = 5
-                estimated_maximum_time_error_less_than_10_ms = 6
-                estimated_maximum_time_error_larger_than_10_ms_or_time_error_unknown = 7
-
-            class TriggerReasonEnum(Enum):
-                manual = 0
-                magnitude_low = 1
-                magnitude_high = 2
-                phase_angle_diff = 3
-                frequency_high_or_low = 4
-                df_or_dt_high = 5
-                reserved = 6
-                digital = 7
-                user_def_8 = 8
-                user_def_9 = 9
-                user_def_10 = 10
-                user_def_11 = 11
-                user_def_12 = 12
-                user_def_13 = 13
-                user_def_14 = 14
-                user_def_15 = 15
-
-            class PmuTriggerDetectedEnum(Enum):
-                no_trigger = 0
-                trigger_detected = 1
-
-            class ConfigurationChangeEnum(Enum):
-                change_effected = 0
-                will_change_in_one_min = 1
-
-            class DataModifiedEnum(Enum):
-                not_modified = 0
-                data_modified_by_post_processing = 1
-
-            class PmuSyncEnum(Enum):
-                in_sync_with_a_utc_traceable_time_source = 0
-                not_in_sync_with_a_utc_traceable_time_source = 1
-
-            class DataSortingEnum(Enum):
-                by_time_stamp = 0
-                by_arrival = 1
-
-            class DataErrorEnum(Enum):
-                good_measurement_data_no_errors = 0
-                pmu_error_no_information_about_data_do_not_use = 1
-                pmu_in_test_mode_or_absent_data_tags_have_been_insereted_do_not_use = 2
-                pmu_error_do_not_use = 3
-
-            class UnlockedTimeEnum(Enum):
-                sync_locked_or_unlocked_less_than_10_s_best_quality = 0
-                unlocked_time_less_than_100_s_larger_than_10_s = 1
-                unlocked_time_less_than_1000_s_larger_than_100_s = 2
-                unlocked_time_larger_than_1000_s = 3
+            PmuTimeQualityEnum = PmuTimeQualityEnum
+            TriggerReasonEnum = TriggerReasonEnum
+            PmuTriggerDetectedEnum = PmuTriggerDetectedEnum
+            ConfigurationChangeEnum = ConfigurationChangeEnum
+            DataModifiedEnum = DataModifiedEnum
+            PmuSyncEnum = PmuSyncEnum
+            DataSortingEnum = DataSortingEnum
+            DataErrorEnum = DataErrorEnum
+            UnlockedTimeEnum = UnlockedTimeEnum
 
             def __init__(self, _io):
                 self._io = _io
@@ -237,10 +172,14 @@ class Data(KaitaiStruct):
 
             @property
             def real(self):
+                if self._angle_offset:
+                    return cmath.rect(self.magnitude, self.angle).real
                 return self.phasors.phasors.real
 
             @property
             def imaginary(self):
+                if self._angle_offset:
+                    return cmath.rect(self.magnitude, self.angle).imag
                 return self.phasors.phasors.imaginary
 
             @property
@@ -249,10 +188,13 @@ class Data(KaitaiStruct):
 
             @property
             def angle(self):
-                return self.phasors.phasors.angle
+                if self._angle_offset and self._format.rectangular_or_polar == 'rectangular':
+                    return cmath.phase(cmath.rect(self.magnitude, self.phasors.phasors.angle + self._angle_offset))
+                return self.phasors.phasors.angle + self._angle_offset
 
             def __init__(self, _io, _format, _phunit=None):
                 self._phunit = _phunit
+                self._angle_offset = self._phunit.angle_offset  # CFG-3 PHSCALE
                 self._format = _format
                 self._io = _io
                 self.name = self._phunit.name
@@ -322,7 +264,7 @@ class Data(KaitaiStruct):
                         self._conversion_factor = _conversion_factor
                         self._io = _io
                         self.raw_magnitude = self._io.read_u2be()
-                        self.angle = self._io.read_s2be()
+                        self.raw_angle = self._io.read_s2be()
 
                     @property
                     def real(self):
@@ -350,6 +292,14 @@ class Data(KaitaiStruct):
                         self._m_magnitude = self.raw_magnitude * self._conversion_factor
                         return self._m_magnitude if hasattr(self, '_m_magnitude') else None
 
+                    @property
+                    def angle(self):
+                        if hasattr(self, '_m_angle'):
+                            return self._m_angle if hasattr(self, '_m_angle') else None
+
+                        self._m_angle = self.raw_angle / 10000.0  # Radians * 10^4
+                        return self._m_angle if hasattr(self, '_m_angle') else None
+
             class Float(KaitaiStruct):
                 def __init__(self, _io, rectangular_or_polar):
                     self._io = _io
@@ -429,7 +379,7 @@ class Data(KaitaiStruct):
                 _on = analogs_data_type
                 if _on == 'int':
                     self.analog = self.Int(
-                        self._io, _anunit.conversion_factor)
+                        self._io, _anunit.conversion_factor, _anunit.offset)
                 elif _on == 'float':
                     self.analog = self.Float(
                         self._io)
@@ -440,17 +390,18 @@ class Data(KaitaiStruct):
             
 
             class Int(KaitaiStruct):
-                def __init__(self, _io, _conversion_factor=None):
+                def __init__(self, _io, _conversion_factor=None, _offset=0.0):
                     self._conversion_factor = _conversion_factor
+                    self._offset = _offset
                     self._io = _io
-                    self.raw_analog = self._io.read_bits_int(16)
+                    self.raw_analog = self._io.read_s2be()
 
                 @property
                 def analog(self):
                     if hasattr(self, '_m_analog'):
                         return self._m_analog if hasattr(self, '_m_analog') else None
 
-                    self._m_analog = self.raw_analog * self._conversion_factor
+                    self._m_analog = self.raw_analog * self._conversion_factor + self._offset
                     return self._m_analog if hasattr(self, '_m_analog') else None
 
             class Float(KaitaiStruct):
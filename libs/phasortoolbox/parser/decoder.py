@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""Compiled decoder for data frames.
+
+A DataDecoder is compiled once from a MiniCfg when the configuration
+message is stored. It holds a single struct.Struct that covers the whole
+data frame body (from the first STAT word to the last DIGITAL word) and
+the scaling vectors of every station, so a data frame is decoded with one
+unpack_from() call instead of a tree of KaitaiStruct objects.
+
+The KaitaiStruct classes in data.py remain the reference implementation.
+"""
+import cmath
+import math
+import struct
+from .status import StatWord, DigitalWord
+
+
+class DataDecoder(object):
+    """Decodes the body of data frames that follow one configuration.
+
+    Example:
+        decoder = DataDecoder(my_mini_cfg)
+        values = decoder.unpack(raw_body)  # Flat tuple of raw values
+        data = decoder.decode(raw_body)    # DecodedData, scaled values
+
+    Args:
+        mini_cfg (MiniCfg): The configuration used to compile the decoder.
+        projection (Projection): Channels to decode. Defaults to all.
+    """
+
+    def __init__(self, mini_cfg, projection=None):
+        self._mini_cfg = mini_cfg
+        self.projection = projection
+        self.stations = []
+        self.stat_offsets = []  # Byte offset of every STAT word in the body
+        fmt = ['>']
+        start = 0
+        for _station in mini_cfg.station:
+            station = StationDecoder(_station, start, projection)
+            self.stat_offsets.append(struct.calcsize(''.join(fmt)))
+            fmt.append(station.fmt)
+            start += station.count
+            self.stations.append(station)
+        self._struct = struct.Struct(''.join(fmt))
+        self.size = self._struct.size  # Bytes between FRACSEC and CHK
+        self.framesize = self.size + 16
+
+    @property
+    def frame_descr(self):
+        """The layout of a whole data frame as a NumPy dtype description, e.g.
+        numpy.dtype(decoder.frame_descr). Fields of station k are prefixed
+        with 's<k>_'.
+        """
+        descr = [
+            ('sync', '>u2'),
+            ('framesize', '>u2'),
+            ('idcode', '>u2'),
+            ('soc', '>u4'),
+            ('fracsec', '>u4')]
+        for k, station in enumerate(self.stations):
+            descr.extend(station.descr('s{}_'.format(k)))
+        descr.append(('chk', '>u2'))
+        return descr
+
+    def unpack(self, buf, offset=0):
+        """Returns the raw (not scaled) values of a data frame body as a flat
+        tuple.
+
+        Args:
+            buf (bytes-like): Buffer holding the data frame body.
+            offset (int): Position of the first STAT word in buf.
+        """
+        return self._struct.unpack_from(buf, offset)
+
+    def configuration_change(self, buf, offset=0):
+        """Returns True if the STAT word of any station announces a
+        configuration change (bit 10). Only the STAT bytes are read.
+
+        Args:
+            buf (bytes-like): Buffer holding the data frame body.
+            offset (int): Position of the first STAT word in buf.
+        """
+        for stat_offset in self.stat_offsets:
+            if buf[offset + stat_offset] & 0x04:
+                return True
+        return False
+
+    def decode(self, buf, offset=0):
+        """Returns the scaled values of a data frame body as DecodedData.
+
+        Args:
+            buf (bytes-like): Buffer holding the data frame body.
+            offset (int): Position of the first STAT word in buf.
+        """
+        values = self._struct.unpack_from(buf, offset)
+        return DecodedData(
+            [station.decode(values) for station in self.stations])
+
+
+class StationDecoder(object):
+    """Layout and scaling vectors of one station (PMU) in a data frame.
+
+    Channels left out by a Projection are compiled as pad bytes, so they are
+    skipped by unpack_from() and never scaled.
+
+    Args:
+        _station (MiniCfg.Station): The station configuration.
+        start (int): Index of the first value of this station in the flat
+                     tuple returned by DataDecoder.unpack().
+        projection (Projection): Channels to decode. Defaults to all.
+    """
+
+    def __init__(self, _station, start=0, projection=None):
+        self._station = _station
+        self.start = start
+        self.stn = _station.stn
+        self.phnmr = _station.phnmr
+        self.annmr = _station.annmr
+        self.dgnmr = _station.dgnmr
+        _format = _station.format
+        self.polar = _format.rectangular_or_polar == 'polar'
+        projection = projection if projection is not None else Projection()
+        self.ph_index = projection.select(
+            projection.phasors, [_phunit.name for _phunit in _station.phunit])
+        self.an_index = projection.select(
+            projection.analog, [_anunit.name for _anunit in _station.anunit])
+        self.dg_index = projection.select(projection.digital, [None] * self.dgnmr)
+        self.phasor_names = [_station.phunit[i].name for i in self.ph_index]
+        self.analog_names = [_station.anunit[i].name for i in self.an_index]
+        self.digital_labels = [_station.digital_labels[i] for i in self.dg_index]
+
+        self.int_phasors = _format.phasors_data_type == 'int'
+        self.int_freq = _format.freq_data_type == 'int'
+        self.int_analogs = _format.analogs_data_type == 'int'
+        if self.int_phasors:
+            ph_fmt = 'Hh' if self.polar else 'hh'
+            self.ph_scale = [_station.phunit[i].conversion_factor for i in self.ph_index]
+            self.angle_scale = 1e-4  # Radians * 10^4
+        else:
+            ph_fmt = 'ff'
+            self.ph_scale = [1.0] * len(self.ph_index)
+            self.angle_scale = 1.0
+        # CFG-3 PHSCALE angle offsets, added to polar angles or applied as
+        # rotations to rectangular phasors
+        self.ph_offset = [_station.phunit[i].angle_offset for i in self.ph_index]
+        self._rotation = None
+        if any(self.ph_offset):
+            self._rotation = [(math.cos(o), math.sin(o)) for o in self.ph_offset]
+
+        if self.int_freq:
+            freq_fmt = 'h'
+            self.freq_scale = 1e-3  # Deviation from nominal in mHz
+            self.freq_offset = _station.fnom.fundamental_frequency
+            self.dfreq_scale = 1e-2  # ROCOF * 100
+        else:
+            freq_fmt = 'f'
+            self.freq_scale = 1.0
+            self.freq_offset = 0
+            self.dfreq_scale = 1.0
+
+        if self.int_analogs:
+            an_fmt = 'h'
+            self.an_scale = [_station.anunit[i].conversion_factor for i in self.an_index]
+            self.an_offset = [_station.anunit[i].offset for i in self.an_index]  # CFG-3 ANSCALE
+        else:
+            an_fmt = 'f'
+            self.an_scale = [1.0] * len(self.an_index)
+            self.an_offset = [0.0] * len(self.an_index)
+        self._an_offset = any(self.an_offset)
+
+        fmt = []
+        i = start
+
+        def field(_fmt, selected):
+            if selected:
+                fmt.append(_fmt)
+                return len(_fmt)
+            fmt.append('{}x'.format(struct.calcsize('>' + _fmt)))
+            return 0
+
+        self._stat = i if projection.stat else None
+        i += field('H', projection.stat)
+        _ph_start = i
+        for k in range(self.phnmr):
+            i += field(ph_fmt, k in self.ph_index)
+        self._ph = slice(_ph_start, i)
+        self._freq = i if projection.freq else None
+        i += field(freq_fmt, projection.freq)
+        self._dfreq = i if projection.dfreq else None
+        i += field(freq_fmt, projection.dfreq)
+        _an_start = i
+        for k in range(self.annmr):
+            i += field(an_fmt, k in self.an_index)
+        self._an = slice(_an_start, i)
+        _dg_start = i
+        for k in range(self.dgnmr):
+            i += field('H', k in self.dg_index)
+        self._dg = slice(_dg_start, i)
+        self.fmt = ''.join(fmt)
+        self.count = i - start
+
+    def descr(self, prefix=''):
+        """Returns the layout of this station as a NumPy dtype description.
+
+        Phasors are one (phnmr, 2) field holding both components. For integer
+        polar phasors the magnitude column is unsigned and must be viewed as
+        '>u2'.
+        """
+        ph_type = '>i2' if self.int_phasors else '>f4'
+        freq_type = '>i2' if self.int_freq else '>f4'
+        an_type = '>i2' if self.int_analogs else '>f4'
+        return [
+            (prefix + 'stat', '>u2'),
+            (prefix + 'phasors', ph_type, (self.phnmr, 2)),
+            (prefix + 'freq', freq_type),
+            (prefix + 'dfreq', freq_type),
+            (prefix + 'analog', an_type, (self.annmr,)),
+            (prefix + 'digital', '>u2', (self.dgnmr,))]
+
+    def decode(self, values):
+        """Returns DecodedPmuData for this station. Values left out by the
+        projection are None (stat, freq, dfreq) or missing from the lists.
+
+        Args:
+            values (tuple): The flat tuple returned by DataDecoder.unpack().
+        """
+        raw_ph = values[self._ph]
+        a = [v * s for v, s in zip(raw_ph[0::2], self.ph_scale)]
+        if self.polar:
+            b = [v * self.angle_scale for v in raw_ph[1::2]]
+            if self._rotation is not None:
+                b = [v + o for v, o in zip(b, self.ph_offset)]
+        else:
+            b = [v * s for v, s in zip(raw_ph[1::2], self.ph_scale)]
+            if self._rotation is not None:
+                a, b = ([x * c - y * s for x, y, (c, s) in zip(a, b, self._rotation)],
+                        [x * s + y * c for x, y, (c, s) in zip(a, b, self._rotation)])
+        analog_values = [v * s for v, s in zip(values[self._an], self.an_scale)]
+        if self._an_offset:
+            analog_values = [v + o for v, o in zip(analog_values, self.an_offset)]
+        return DecodedPmuData(
+            self,
+            StatWord(values[self._stat]) if self._stat is not None else None,
+            a,
+            b,
+            values[self._freq] * self.freq_scale + self.freq_offset if self._freq is not None else None,
+            values[self._dfreq] * self.dfreq_scale if self._dfreq is not None else None,
+            analog_values,
+            list(values[self._dg]))
+
+
+class Projection(object):
+    """Channels of a data stream to decode. Everything else is skipped.
+
+    Example:
+        # Only phasors VA, VB, VC and the frequency of data stream 7
+        my_parser.set_projection(7, Projection(
+            phasors=['VA', 'VB', 'VC'], analog=[], digital=[],
+            stat=False, dfreq=False))
+
+    Args:
+        phasors (list): Names or indexes of the phasors to decode. Defaults to
+                        None, which means all phasors.
+        analog (list): Names or indexes of the analogs to decode. Defaults to
+                       None, which means all analogs.
+        digital (list): Indexes of the digital words to decode. Defaults to
+                        None, which means all digital words.
+        stat (bool): Decode STAT. Defaults to True.
+        freq (bool): Decode FREQ. Defaults to True.
+        dfreq (bool): Decode DFREQ. Defaults to True.
+    """
+
+    def __init__(self, phasors=None, analog=None, digital=None, stat=True,
+                 freq=True, dfreq=True):
+        self.phasors = phasors
+        self.analog = analog
+        self.digital = digital
+        self.stat = stat
+        self.freq = freq
+        self.dfreq = dfreq
+
+    @staticmethod
+    def select(wanted, names):
+        """Returns the indexes of names selected by wanted, in frame order.
+        Names are compared without their padding.
+        """
+        if wanted is None:
+            return list(range(len(names)))
+        wanted = set(w.strip() if isinstance(w, str) else w for w in wanted)
+        return [i for i, name in enumerate(names)
+                if i in wanted or (name is not None and name.strip() in wanted)]
+
+
+class DecodedData(object):
+    """Decoded body of a data frame.
+
+    Attributes:
+        pmu_data (list): One DecodedPmuData per station, in the order of the
+                         configuration message.
+    """
+    __slots__ = ('pmu_data',)
+
+    def __init__(self, pmu_data):
+        self.pmu_data = pmu_data
+
+    def __repr__(self):
+        return "<DecodedData |pmu_data>"
+
+    def show(self, parent_path='    '):
+        for i, pmu_data in enumerate(self.pmu_data):
+            pmu_data.show('{}.pmu_data[{}]'.format(parent_path, i))
+
+
+class DecodedPmuData(object):
+    """Decoded values of one station in a data frame.
+
+    Phasors and analogs are stored as plain lists of scaled values;
+    DecodedPhasor and DecodedAnalog objects are only built when the phasors
+    or analog attributes are accessed.
+
+    Attributes:
+        stat (StatWord): STAT word.
+        freq (float): Frequency in Hz.
+        dfreq (float): ROCOF in Hz/s.
+        digital_values (list): Digital status words (int).
+    """
+    __slots__ = ('_decoder', 'stat', '_a', '_b', 'freq', 'dfreq',
+                 'analog_values', 'digital_values', '_m_phasors', '_m_analog')
+
+    def __init__(self, _decoder, stat, a, b, freq, dfreq, analog_values,
+                 digital_values):
+        self._decoder = _decoder
+        self.stat = stat
+        self._a = a
+        self._b = b
+        self.freq = freq
+        self.dfreq = dfreq
+        self.analog_values = analog_values
+        self.digital_values = digital_values
+        self._m_phasors = None
+        self._m_analog = None
+
+    @property
+    def stn(self):
+        return self._decoder.stn
+
+    @property
+    def phasors(self):
+        if self._m_phasors is None:
+            polar = self._decoder.polar
+            self._m_phasors = [
+                DecodedPhasor(name, a, b, polar) for name, a, b in zip(
+                    self._decoder.phasor_names, self._a, self._b)]
+        return self._m_phasors
+
+    @property
+    def analog(self):
+        if self._m_analog is None:
+            self._m_analog = [
+                DecodedAnalog(name, value) for name, value in zip(
+                    self._decoder.analog_names, self.analog_values)]
+        return self._m_analog
+
+    @property
+    def digital(self):
+        """Digital status words as DigitalWord views."""
+        return [DigitalWord(value, labels) for value, labels in zip(
+            self.digital_values, self._decoder.digital_labels)]
+
+    def __repr__(self):
+        return "<DecodedPmuData |stat={!r}, phasors, freq={!r}, dfreq={!r}, analog, digital>".format(
+            self.stat, self.freq, self.dfreq)
+
+    def show(self, parent_path='    '):
+        for i, analog in enumerate(self.analog):
+            analog.show('{}.analog[{}]'.format(parent_path, i))
+        print(parent_path + '.dfreq == ' + repr(self.dfreq))
+        for i, digital in enumerate(self.digital):
+            digital.show('{}.digital[{}]'.format(parent_path, i))
+        print(parent_path + '.freq == ' + repr(self.freq))
+        for i, phasor in enumerate(self.phasors):
+            phasor.show('{}.phasors[{}]'.format(parent_path, i))
+        if self.stat is not None:
+            self.stat.show(parent_path + '.stat')
+
+
+class DecodedPhasor(object):
+    """A scaled phasor. The other coordinate system is computed on first
+    access.
+    """
+    __slots__ = ('name', '_a', '_b', '_polar', '_m_other')
+
+    def __init__(self, name, a, b, polar):
+        self.name = name
+        self._a = a
+        self._b = b
+        self._polar = polar
+        self._m_other = None
+
+    def _other(self):
+        if self._m_other is None:
+            if self._polar:
+                z = cmath.rect(self._a, self._b)
+                self._m_other = (z.real, z.imag)
+            else:
+                self._m_other = cmath.polar(complex(self._a, self._b))
+        return self._m_other
+
+    @property
+    def real(self):
+        return self._other()[0] if self._polar else self._a
+
+    @property
+    def imaginary(self):
+        return self._other()[1] if self._polar else self._b
+
+    @property
+    def magnitude(self):
+        return self._a if self._polar else self._other()[0]
+
+    @property
+    def angle(self):
+        return self._b if self._polar else self._other()[1]
+
+    def __repr__(self):
+        _repr_list = []
+        for item in ["name", "real", "imaginary", "magnitude", "angle"]:
+            _repr_list.append("=".join((item, getattr(self, item).__repr__())))
+        return "<Phasors |" + ", ".join(_repr_list) + ">"
+
+    def show(self, parent_path):
+        for item in ["name", "real", "imaginary", "magnitude", "angle"]:
+            print(parent_path + '.' + item + " == " + getattr(self, item).__repr__())
+
+
+class DecodedAnalog(object):
+    """A scaled analog value."""
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __repr__(self):
+        return "<Analog |name={!r}, value={!r}>".format(self.name, self.value)
+
+    def show(self, parent_path):
+        print(parent_path + '.name == ' + repr(self.name))
+        print(parent_path + '.value == ' + repr(self.value))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Flow-aware reassembly of captured TCP and UDP payloads.
+
+Each direction of a connection, keyed by its 5-tuple, is its own byte
+stream with its own Framer, so messages of several PMUs or PDC links in one
+capture never interleave. TCP payloads are put back in sequence order:
+retransmitted bytes are dropped, out-of-order segments are kept until the
+gap before them is filled, and a gap that is never filled (a segment missing
+from the capture) is skipped once too much data waits behind it.
+"""
+from .framer import Framer
+from .pcapreader import PROTO_TCP, TCP_SYN
+
+_SEQ_MOD = 1 << 32
+
+
+def _seq_delta(seq, expected):
+    # Signed distance between two sequence numbers, modulo 2^32
+    delta = (seq - expected) % _SEQ_MOD
+    return delta - _SEQ_MOD if delta >= _SEQ_MOD // 2 else delta
+
+
+class FlowTable(object):
+    """The flows of a capture, by 5-tuple.
+
+    Example:
+        flows = FlowTable()
+        for segment in reader.segments():
+            flow = flows.add(segment)
+            for msg in my_parser.frames(framer=flow.framer):
+                ...
+
+    Args:
+        max_pending (int): Bytes of out-of-order TCP segments kept per flow
+                           before the missing data is given up. Defaults to
+                           1 MiB.
+        bound (function): Framer.bound of the framers, e.g.
+                          Parser.max_framesize. Defaults to None.
+    """
+
+    def __init__(self, max_pending=1 << 20, bound=None):
+        self.max_pending = max_pending
+        self.bound = bound
+        self.flows = {}
+
+    def add(self, segment):
+        """Appends the payload of a pcapreader.Segment to its flow, in
+        order, and returns the Flow.
+        """
+        key = segment.key
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = Flow(key, self.max_pending, self.bound)
+        flow.add(segment)
+        return flow
+
+    def flush(self):
+        """Feeds the out-of-order data still waiting behind gaps, at the end
+        of the capture. Returns the flows that got data.
+        """
+        return [flow for flow in self.flows.values() if flow.flush()]
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __iter__(self):
+        return iter(self.flows.values())
+
+    def __repr__(self):
+        return "<FlowTable |flows={}>".format(len(self.flows))
+
+
+class Flow(object):
+    """One direction of a TCP connection or a UDP flow.
+
+    Attributes:
+        key (tuple): (src, sport, dst, dport, proto).
+        framer (Framer): Cuts the reassembled bytes into messages.
+        segments (int): Segments received.
+        bytes (int): Payload bytes fed to the framer.
+        duplicates (int): Retransmitted segments dropped, in whole or in part.
+        gaps (int): Missing TCP data skipped.
+        next_seq (int): Sequence number of the next byte expected.
+    """
+    __slots__ = ('key', 'framer', 'segments', 'bytes', 'duplicates', 'gaps',
+                 'next_seq', '_tcp', '_pending', '_pending_bytes', '_max_pending', '_bound')
+
+    def __init__(self, key, max_pending=1 << 20, bound=None):
+        self.key = key
+        self.framer = Framer(bound=bound)
+        self.segments = 0
+        self.bytes = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.next_seq = None
+        self._tcp = key[4] == PROTO_TCP
+        self._pending = {}  # seq: payload of out-of-order segments
+        self._pending_bytes = 0
+        self._max_pending = max_pending
+        self._bound = bound
+
+    def add(self, segment):
+        """Feeds the payload of segment to the framer once the bytes before
+        it were fed.
+        """
+        self.segments += 1
+        if not self._tcp:
+            self._feed(segment.payload)
+            return
+        if segment.flags & TCP_SYN:
+            # A new connection on the same 5-tuple starts a new stream
+            if self.next_seq is not None:
+                self.framer = Framer(bound=self._bound)
+                self._pending.clear()
+                self._pending_bytes = 0
+            self.next_seq = (segment.seq + 1) % _SEQ_MOD
+        payload = segment.payload
+        if not payload:
+            return
+        if self.next_seq is None:  # The capture started mid-connection
+            self.next_seq = segment.seq
+        delta = _seq_delta(segment.seq, self.next_seq)
+        if delta > 0:
+            if segment.seq not in self._pending:
+                self._pending[segment.seq] = bytes(payload)
+                self._pending_bytes += len(payload)
+            if self._pending_bytes > self._max_pending:
+                self._skip_gap()
+            return
+        self._accept(payload, delta)
+        self._drain()
+
+    def flush(self):
+        """Skips the gaps before the out-of-order data and feeds it. Returns
+        True if there was any.
+        """
+        if not self._pending:
+            return False
+        while self._pending:
+            self._skip_gap()
+        return True
+
+    def _accept(self, payload, delta):
+        # delta <= 0: the first -delta bytes were already fed
+        if len(payload) + delta <= 0:
+            self.duplicates += 1
+            return
+        if delta:
+            self.duplicates += 1
+            payload = payload[-delta:]
+        self._feed(payload)
+        self.next_seq = (self.next_seq + len(payload)) % _SEQ_MOD
+
+    def _drain(self):
+        while self._pending:
+            ready = [seq for seq in self._pending if _seq_delta(seq, self.next_seq) <= 0]
+            if not ready:
+                return
+            for seq in ready:
+                payload = self._pending.pop(seq)
+                self._pending_bytes -= len(payload)
+                self._accept(payload, _seq_delta(seq, self.next_seq))
+
+    def _skip_gap(self):
+        self.gaps += 1
+        self.next_seq = min(self._pending, key=lambda seq: _seq_delta(seq, self.next_seq))
+        self.framer.discard()  # The message cut by the gap
+        self._drain()
+
+    def _feed(self, payload):
+        self.bytes += len(payload)
+        self.framer.feed(payload)
+
+    def __repr__(self):
+        return "<Flow |key={!r}, segments={}, bytes={}, duplicates={}, gaps={}>".format(
+            self.key, self.segments, self.bytes, self.duplicates, self.gaps)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""In-place decoding of synchrophasor messages held in a buffer.
+
+PhasorFrame decodes the common header with struct and data frames with the
+DataDecoder compiled from the stored configuration, directly from the
+caller's buffer. The raw message is exposed as a memoryview slice of that
+buffer, so no bytes are copied for data frames.
+"""
+import struct
+from kaitaistruct import KaitaiStream, BytesIO
+from .common import PhasorMessage
+from .cfg_2 import Cfg2
+from .cfg_3 import Cfg3
+from .command import Command
+from .header import Header
+from .timetag import time_ns
+
+_HEADER = struct.Struct('>BBHHII')  # SYNC, FRAMESIZE, IDCODE, SOC, FRACSEC
+_CHK = struct.Struct('>H')
+
+
+class SyncWord(object):
+    """Decoded second byte of SYNC. One shared instance exists per valid byte
+    value, see SYNC_WORDS.
+    """
+    __slots__ = ('reserved', 'frame_type', 'version_number')
+
+    def __init__(self, byte):
+        self.reserved = bool(byte & 0x80)
+        self.frame_type = PhasorMessage.SyncWord.FrameTypeEnum((byte >> 4) & 0x07)
+        self.version_number = PhasorMessage.SyncWord.VersionNumberEnum(byte & 0x0F)
+
+    def __repr__(self):
+        return "<SyncWord |frame_type={!r}, version_number={!r}>".format(
+            self.frame_type, self.version_number)
+
+    def show(self, parent_path):
+        self.frame_type.show(parent_path + '.frame_type')
+        self.version_number.show(parent_path + '.version_number')
+
+
+def _sync_words():
+    _sync_words = {}
+    for byte in range(256):
+        try:
+            _sync_words[byte] = SyncWord(byte)
+        except ValueError:  # Unknown frame type or version number
+            pass
+    return _sync_words
+
+
+SYNC_WORDS = _sync_words()
+
+
+class TimeFlags(object):
+    """Decoded time flags, the most significant byte of FRACSEC. Named like
+    PhasorMessage.Fracsec. One shared instance exists per valid byte value,
+    see TIME_FLAGS.
+    """
+    __slots__ = ('reserved', 'leap_second_direction', 'leap_second_occurred',
+                 'leap_second_pending', 'time_quality')
+
+    def __init__(self, byte):
+        self.reserved = bool(byte & 0x80)
+        self.leap_second_direction = PhasorMessage.Fracsec.LeapSecondDirectionEnum((byte >> 6) & 0x01)
+        self.leap_second_occurred = bool(byte & 0x20)
+        self.leap_second_pending = bool(byte & 0x10)
+        self.time_quality = PhasorMessage.Fracsec.MsgTqEnum(byte & 0x0F)
+
+    def __repr__(self):
+        return "<TimeFlags |time_quality={!r}, leap_second_pending={!r}, leap_second_occurred={!r}>".format(
+            self.time_quality, self.leap_second_pending, self.leap_second_occurred)
+
+    def show(self, parent_path):
+        self.leap_second_direction.show(parent_path + '.leap_second_direction')
+        for item in ('leap_second_occurred', 'leap_second_pending', 'reserved'):
+            print(parent_path + '.' + item + ' == ' + repr(getattr(self, item)))
+        self.time_quality.show(parent_path + '.time_quality')
+
+
+def _time_flags():
+    _time_flags = {}
+    for byte in range(256):
+        try:
+            _time_flags[byte] = TimeFlags(byte)
+        except ValueError:  # Undefined time quality code
+            pass
+    return _time_flags
+
+
+TIME_FLAGS = _time_flags()
+
+
+class PhasorFrame(object):
+    """A synchrophasor message decoded in place from a buffer.
+
+    Data frames are decoded with the DataDecoder of the stored configuration
+    and other frames with the KaitaiStruct classes. A data frame without a
+    matching configuration keeps its body as a memoryview in data.
+
+    Note:
+        raw_pkt and the body of undecoded data frames are memoryview slices of
+        the parsed buffer. The buffer must not be modified while they are in
+        use, and a bytearray cannot be resized while any of them is alive.
+
+    Args:
+        view (memoryview): Buffer holding the message.
+        offset (int): Position of the message in view.
+        _mini_cfgs (MiniCfgs): Stored configurations.
+    """
+    __slots__ = ('sync', 'framesize', 'idcode', 'soc', 'fracsec', 'chk',
+                 'raw_pkt', '_mini_cfg', '_decoder', '_m_data', '_m_time',
+                 'perf_counter', 'arr_time', 'parse_time')
+    _lazy = False
+
+    def __init__(self, view, offset, _mini_cfgs):
+        magic, sync, self.framesize, self.idcode, self.soc, self.fracsec = \
+            _HEADER.unpack_from(view, offset)
+        if magic != 0xAA:
+            raise ValueError('SYNC byte 0xAA not found at offset {}.'.format(offset))
+        if self.framesize < 16 or offset + self.framesize > len(view):
+            raise ValueError('Invalid FRAMESIZE {} at offset {}.'.format(self.framesize, offset))
+        try:
+            self.sync = SYNC_WORDS[sync]
+        except KeyError:
+            raise ValueError('Unknown SYNC word 0xAA{:02X} at offset {}.'.format(sync, offset))
+        self._mini_cfg = _mini_cfgs.mini_cfg[self.idcode]
+        self._decoder = None
+        self._m_data = None
+        self._m_time = None
+        self.raw_pkt = view[offset:offset + self.framesize]
+        self.chk = _CHK.unpack_from(view, offset + self.framesize - 2)[0]
+
+        _on = self.sync.frame_type.value
+        if _on == 0:
+            if self._mini_cfg:
+                if self._bind(_mini_cfgs.data_frame(self.idcode, self.framesize, view, offset + 14)):
+                    if not self._lazy:
+                        self._decode()
+                elif self.idcode in _mini_cfgs.changes:
+                    _mini_cfgs.hold(self)
+        elif _on == 5:
+            _cfg3 = _mini_cfgs.cfg3_frame(self.idcode, self.raw_pkt[14:-2], self.raw_pkt)
+            if _cfg3 is None:
+                self._m_data = self.raw_pkt[14:-2]  # Continuation frame, more to come
+            else:
+                self._m_data = Cfg3(KaitaiStream(BytesIO(_cfg3[0])))
+                _mini_cfgs.add_cfg(self.idcode, self._m_data, _cfg3[1])
+                self._mini_cfg = _mini_cfgs.mini_cfg[self.idcode]
+        else:
+            io = KaitaiStream(BytesIO(self.raw_pkt[14:-2].tobytes()))
+            if _on == 3:
+                self._m_data = Cfg2(io)
+                _mini_cfgs.add_cfg(self.idcode, self._m_data, self.raw_pkt)
+                self._mini_cfg = _mini_cfgs.mini_cfg[self.idcode]
+            elif _on == 4:
+                self._m_data = Command(io)
+            elif _on == 2:
+                self._m_data = Cfg2(io)
+            elif _on == 1:
+                self._m_data = Header(io)
+
+    def _bind(self, mini_cfg):
+        # Keep the decoder in effect when the frame arrived
+        self._mini_cfg = mini_cfg
+        if mini_cfg is not None and mini_cfg.decoder.framesize == self.framesize:
+            self._decoder = mini_cfg.decoder
+            return True
+        return False
+
+    def _decode(self):
+        if self._decoder:
+            self._m_data = self._decoder.decode(self.raw_pkt, 14)
+        else:
+            self._m_data = self.raw_pkt[14:-2]
+
+    @property
+    def data(self):
+        if self._m_data is None:
+            self._decode()
+        return self._m_data
+
+    @property
+    def decodable(self):
+        """False for data frames without a matching configuration and for
+        CFG-3 continuation frames that do not complete a message.
+        """
+        _on = self.sync.frame_type.value
+        if _on == 0:
+            return self._decoder is not None
+        return _on != 5 or not isinstance(self._m_data, memoryview)
+
+    @property
+    def body(self):
+        """The message body (between FRACSEC and CHK) as a memoryview."""
+        return self.raw_pkt[14:-2]
+
+    @property
+    def fraction_of_second(self):
+        if self._mini_cfg:
+            return (self.fracsec & 0x00FFFFFF) / self._mini_cfg.time_base.time_base
+        return None
+
+    @property
+    def time(self):
+        if self._m_time is None:
+            self._m_time = self.soc + self.fraction_of_second
+        return self._m_time
+
+    @property
+    def time_ns(self):
+        """The exact time tag in integer nanoseconds since the epoch."""
+        if self._mini_cfg:
+            return time_ns(self.soc, self.fracsec & 0x00FFFFFF, self._mini_cfg.time_base.time_base)
+        return None
+
+    @property
+    def time_flags(self):
+        """Leap second flags and time quality of FRACSEC as TimeFlags, or None
+        if the time quality code is undefined.
+        """
+        return TIME_FLAGS.get(self.fracsec >> 24)
+
+    def __repr__(self):
+        _repr_list = ["time=" + str(self.time)] if self._mini_cfg else []
+        for item in ('framesize', 'idcode', 'soc', 'fracsec', 'chk'):
+            _repr_list.append("=".join((item, getattr(self, item).__repr__())))
+        return "<" + self.__class__.__name__ + " |sync, " + ", ".join(_repr_list) + ", data>"
+
+    def show(self, parent_path='    '):
+        if self._mini_cfg:
+            print(parent_path + '.time == ' + str(self.time))
+        print(parent_path + '.chk == ' + repr(self.chk))
+        if isinstance(self.data, memoryview):
+            print(parent_path + '.data == ' + repr(self.data.tobytes()))
+        else:
+            self.data.show(parent_path + '.data')
+        for item in ('fracsec', 'framesize', 'idcode', 'soc'):
+            print(parent_path + '.' + item + ' == ' + repr(getattr(self, item)))
+        self.sync.show(parent_path + '.sync')
+
+
+class LazyPhasorFrame(PhasorFrame):
+    """A PhasorFrame that only decodes the common header up front.
+
+    The body of a data frame is decoded on first access to data, using the
+    configuration that was in effect when the frame was parsed. Routing by
+    idcode and time, e.g. in the PDC, does not decode the body at all.
+    """
+    __slots__ = ()
+    _lazy = True
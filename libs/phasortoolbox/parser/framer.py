@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Incremental framing of a synchrophasor byte stream.
+
+A Framer collects bytes fed in arbitrary chunks (TCP reads, UDP datagrams,
+pcap payloads) and cuts them into messages using SYNC and FRAMESIZE. Partial
+messages are kept until the rest arrives. Bytes that cannot start a message
+are skipped up to the next 0xAA found with bytes.find, and counted.
+
+A bytes chunk fed while no partial message is pending is framed in place,
+without a copy. Otherwise it is appended to a bytearray whose consumed head
+is dropped (an O(1) operation in CPython), so framing stays linear in the
+bytes received whatever the size of the reads. runs() returns consecutive
+complete messages as one buffer, to be parsed in one call.
+
+A corrupt FRAMESIZE larger than the message would make the framer wait for
+bytes that belong to the following messages. So before waiting for a
+message larger than its IDCODE is known to send (see bound), the bytes
+already buffered are searched for a complete message with a valid CHK at a
+later SYNC byte. If one is found, the message is skipped. A message that is
+really incomplete cannot be followed by a complete one, so the check never
+skips a good message; bound only keeps it off the common path.
+"""
+import struct
+from .crc import crc_ok
+from .frame import SYNC_WORDS
+
+_FRAMESIZE = struct.Struct('>H')
+_IDCODE = struct.Struct('>H')
+_MIN_FRAMESIZE = 16  # Common header and CHK
+
+
+class Framer(object):
+    """Cuts a byte stream into synchrophasor messages.
+
+    Example:
+        framer = Framer()
+        for chunk in chunks:
+            framer.feed(chunk)
+            for raw_pkt in framer.frames():
+                ...
+
+        # Runs of messages parsed in one call
+        for buf, offset, length in framer.runs():
+            msgs = my_parser.parse_buffer(buf, offset, length)
+
+        # Messages larger than their IDCODE is known to send are checked
+        # before waiting for them
+        framer = Framer(bound=my_parser.max_framesize)
+
+    Args:
+        max_framesize (int): Largest FRAMESIZE accepted. A header announcing
+                             a larger message is skipped instead of waiting
+                             for its bytes. Defaults to 65535.
+        bound (function): Returns the largest FRAMESIZE expected from an
+                          IDCODE, or None if it is not known. An incomplete
+                          message above it is skipped if a complete message
+                          with a valid CHK starts at a later SYNC byte.
+                          Defaults to None: every incomplete message is
+                          checked.
+
+    Attributes:
+        skipped (int): Number of bytes skipped to resynchronise.
+    """
+
+    def __init__(self, max_framesize=0xFFFF, bound=None):
+        self._buffer = bytearray()  # Or the bytes fed last, framed in place
+        self._pos = 0  # Start of the next message in _buffer
+        self._last = None  # Start of the last message returned
+        self.max_framesize = max_framesize
+        self.bound = bound
+        self.skipped = 0
+
+    def __len__(self):
+        """Number of buffered bytes not returned as a message yet."""
+        return len(self._buffer) - self._pos
+
+    def feed(self, data):
+        """Appends data (bytes-like) to the stream."""
+        if self._pos == len(self._buffer) and type(data) is bytes:
+            self._buffer = data
+            self._pos = 0
+            self._last = None
+            return
+        self._compact()
+        if type(self._buffer) is bytes:
+            self._buffer = bytearray(self._buffer)
+        self._buffer += data
+
+    def frames(self):
+        """Yields every complete message buffered so far as a bytes-like
+        copy.
+
+        Feeding more data while iterating is allowed; the generator returns
+        when the buffer holds no complete message.
+        """
+        while True:
+            buf = self._buffer
+            pos = self._pos
+            framesize = self._framesize(buf, pos)
+            if framesize < 0:
+                self._skip_to_sync(pos + 1)
+                continue
+            if not framesize:
+                break
+            if len(buf) - pos < framesize:
+                if self._skip_ahead(buf, pos, framesize):
+                    continue
+                break
+            self._last = pos
+            self._pos = pos + framesize
+            yield buf[pos:pos + framesize]
+        self._compact()
+
+    def runs(self):
+        """Yields runs of consecutive complete messages buffered so far as
+        (buffer, offset, length), e.g. for Parser.parse_buffer().
+
+        buffer is a bytes object that is never modified, so messages parsed
+        in place from it stay valid. A run ends at the last complete message
+        or at bytes that cannot start a message, which are skipped. A
+        message rejected by the parser does not resynchronise the framer:
+        the parser skips it within the run.
+        """
+        while True:
+            buf = self._buffer
+            start = pos = self._pos
+            end = len(buf)
+            framesize = self._framesize(buf, pos)
+            while framesize > 0 and end - pos >= framesize:
+                pos += framesize
+                framesize = self._framesize(buf, pos)
+            if pos > start:
+                self._pos = pos
+                self._last = None
+                if type(buf) is bytes:
+                    yield buf, start, pos - start
+                else:
+                    yield bytes(memoryview(buf)[start:pos]), 0, pos - start
+            elif framesize < 0:
+                self._skip_to_sync(pos + 1)
+            elif not framesize or not self._skip_ahead(buf, pos, framesize):
+                break
+        self._compact()
+
+    def _framesize(self, buf, pos):
+        # FRAMESIZE of the message at pos, 0 if its header is not buffered
+        # yet, -1 if no message can start at pos
+        if len(buf) - pos < 4:
+            return 0
+        if buf[pos] != 0xAA or buf[pos + 1] not in SYNC_WORDS:
+            return -1
+        framesize = _FRAMESIZE.unpack_from(buf, pos + 2)[0]
+        if framesize < _MIN_FRAMESIZE or framesize > self.max_framesize:
+            return -1
+        return framesize
+
+    def _skip_ahead(self, buf, pos, framesize):
+        # Skips the incomplete message at pos if a complete message with a
+        # valid CHK starts at a later SYNC byte. Returns True if skipped.
+        end = len(buf)
+        if self.bound is not None and end - pos >= 6:
+            bound = self.bound(_IDCODE.unpack_from(buf, pos + 4)[0])
+            if bound is not None and framesize <= bound:
+                return False
+        i = buf.find(b'\xaa', pos + 1)
+        while i >= 0:
+            size = self._framesize(buf, i)
+            if size == 0:
+                break
+            if size > 0 and end - i >= size and crc_ok(buf[i:i + size]):
+                self.skipped += i - pos
+                self._pos = i
+                self._last = None
+                return True
+            i = buf.find(b'\xaa', i + 1)
+        return False
+
+    def missing(self):
+        """Number of bytes missing to complete the buffered partial message,
+        0 if there is none. Until its FRAMESIZE is buffered, the bytes
+        missing to read it. Call it after frames() returned.
+        """
+        available = len(self._buffer) - self._pos
+        if available == 0:
+            return 0
+        if available < 4:
+            return 4 - available
+        return max(_FRAMESIZE.unpack_from(self._buffer, self._pos + 2)[0] - available, 0)
+
+    def resync(self):
+        """Rejects the last message returned by frames().
+
+        The stream is searched again for a SYNC byte from the second byte of
+        that message on, so a message hidden behind a corrupt FRAMESIZE is
+        not lost. The rejected bytes are counted in skipped.
+        """
+        if self._last is not None:
+            self._pos = self._last
+            self._last = None
+            self._skip_to_sync(self._pos + 1)
+
+    def discard(self):
+        """Drops the buffered bytes not returned as a message yet, e.g. a
+        message cut by a gap in the stream. They are counted in skipped.
+        """
+        self.skipped += len(self._buffer) - self._pos
+        self._buffer = bytearray()
+        self._pos = 0
+        self._last = None
+
+    def _skip_to_sync(self, start):
+        i = self._buffer.find(b'\xaa', start)
+        if i < 0:
+            i = len(self._buffer)
+        self.skipped += i - self._pos
+        self._pos = i
+
+    def _compact(self):
+        if self._pos:
+            if type(self._buffer) is bytes:
+                self._buffer = bytearray(memoryview(self._buffer)[self._pos:])
+            else:
+                del self._buffer[:self._pos]
+            if self._last is not None:
+                self._last -= self._pos
+                if self._last < 0:
+                    self._last = None
+            self._pos = 0
@@ -1,29 +1,235 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict, UserList
+from collections import defaultdict, deque, UserList
 from kaitaistruct import __version__ as ks_version, KaitaiStruct, KaitaiStream, BytesIO
 from .common import PhasorMessage
+from .decoder import DataDecoder
 
 
 class MiniCfgs(object):
-    def __init__(self):
+    """Configurations of the parsed data streams, by IDCODE.
+
+    A configuration change announced by STAT bit 10 is followed per data
+    stream: the current decoder is kept while the bit is set, a configuration
+    message received meanwhile with a new CFGCNT is staged, and the staged
+    decoder is swapped in at the first data message without the bit. If no
+    new configuration was staged by then, data messages are held (at most
+    max_gap of them) until one arrives, and released decoded with it. Data
+    messages whose size no longer matches the configuration start an
+    unannounced change that has already taken effect.
+
+    Attributes:
+        on_change (function): Called with the IDCODE when a change is
+                              announced and when it takes effect without a
+                              staged configuration, e.g. to request CFG-2.
+        gap_dropped (int): Held messages dropped because max_gap was reached.
+        fragments_dropped (int): CFG-3 continuation frames dropped because
+                                 the frames before them were missing.
+    """
+    max_gap = 600
+
+    def __init__(self, cache=None):
         self.mini_cfg = defaultdict(lambda: None)
+        self.projection = {}
+        self.cache = cache  # cfgcache.ConfigCache
+        self.changes = {}  # idcode: ConfigChange
+        self.released = []  # Held messages decodable again
+        self.on_change = None
+        self.gap_dropped = 0
+        self.fragments = {}  # idcode: Cfg3Fragments
+        self.fragments_dropped = 0
+
+    def add_cfg(self, _cfg_pkt_idcode, _cfg_pkt_data, raw_pkt=None):
+        mini_cfg = MiniCfg(_cfg_pkt_data)
+        change = self.changes.get(_cfg_pkt_idcode)
+        if change is not None and not change.effected:
+            current = self.mini_cfg[_cfg_pkt_idcode]
+            if current is None or mini_cfg.cfgcnt != current.cfgcnt:
+                # Swapped in when the change takes effect
+                change.staged = mini_cfg
+                change.staged_raw_pkt = raw_pkt
+            return
+        self._install(_cfg_pkt_idcode, mini_cfg, raw_pkt)
+        if change is not None:
+            self._release(_cfg_pkt_idcode)
+
+    def cfg3_frame(self, idcode, body, raw_pkt):
+        """Collects the frames of a CFG-3 message sent in continuation frames
+        (CONT_IDX 1, 2, ... and 0xFFFF for the last one).
+
+        Args:
+            idcode (int): IDCODE of the message.
+            body (bytes-like): The message body, from CONT_IDX to CHK.
+            raw_pkt (bytes-like): The whole message.
+
+        Returns:
+            tuple: (body, raw_pkts) of the whole CFG-3 message once its last
+                   frame arrived, with CONT_IDX 0, and its frames back to
+                   back. None while frames are missing.
+        """
+        cont_idx = (body[0] << 8) | body[1]
+        if cont_idx == 0:
+            return bytes(body), bytes(raw_pkt)
+        fragments = self.fragments.get(idcode)
+        if cont_idx == 1:
+            if fragments is not None:
+                self.fragments_dropped += len(fragments.raw_pkts)
+            fragments = self.fragments[idcode] = Cfg3Fragments()
+        elif fragments is None or cont_idx not in (fragments.next_idx, 0xFFFF):
+            self.fragments_dropped += 1
+            if fragments is not None:
+                self.fragments_dropped += len(fragments.raw_pkts)
+                del self.fragments[idcode]
+            return None
+        fragments.bodies.append(bytes(body[2:]))
+        fragments.raw_pkts.append(bytes(raw_pkt))
+        fragments.next_idx = cont_idx + 1
+        if cont_idx != 0xFFFF:
+            return None
+        del self.fragments[idcode]
+        return b'\x00\x00' + b''.join(fragments.bodies), b''.join(fragments.raw_pkts)
+
+    def _install(self, idcode, mini_cfg, raw_pkt):
+        # Compiled once per configuration
+        mini_cfg.decoder = DataDecoder(mini_cfg, self.projection.get(idcode))
+        mini_cfg.raw_pkt = None if raw_pkt is None else bytes(raw_pkt)
+        self.mini_cfg[idcode] = mini_cfg
+        if self.cache is not None and raw_pkt is not None:
+            self.cache.store(idcode, mini_cfg.cfgcnt, mini_cfg.raw_pkt)
+
+    def data_frame(self, idcode, framesize, buf, offset):
+        """Returns the MiniCfg to decode a data message with, or None if there
+        is none or the message must be held until the new configuration
+        arrives (see hold()).
+
+        Args:
+            idcode (int): IDCODE of the message.
+            framesize (int): FRAMESIZE of the message.
+            buf (bytes-like): Buffer holding the message body.
+            offset (int): Position of the first STAT word in buf.
+        """
+        mini_cfg = self.mini_cfg[idcode]
+        if mini_cfg is None:
+            return None
+        decoder = mini_cfg.decoder
+        change = self.changes.get(idcode)
+        if decoder.framesize == framesize:
+            announced = decoder.configuration_change(buf, offset)
+            if change is None:
+                if announced:
+                    self.configuration_change(idcode)
+                return mini_cfg
+            if announced and not change.effected:
+                return mini_cfg
+        elif change is None:
+            # The layout changed without an announcement
+            change = self._start_change(idcode)
+        # The change took effect with this message
+        if change.staged is not None:
+            del self.changes[idcode]
+            self._install(idcode, change.staged, change.staged_raw_pkt)
+            return self.mini_cfg[idcode]
+        if not change.effected:
+            change.effected = True
+            if self.on_change is not None:
+                self.on_change(idcode)
+        return None
+
+    def hold(self, message):
+        """Keeps a data message that arrived after a configuration change took
+        effect until the new configuration arrives.
+        """
+        change = self.changes.get(message.idcode)
+        if change is None:
+            return
+        if len(change.held) == self.max_gap:
+            change.held.popleft()
+            self.gap_dropped += 1
+        change.held.append(message)
+
+    def _release(self, idcode):
+        change = self.changes.pop(idcode)
+        mini_cfg = self.mini_cfg[idcode]
+        for message in change.held:
+            if message._bind(mini_cfg):
+                self.released.append(message)
+            else:
+                self.gap_dropped += 1
 
-    def add_cfg(self, _cfg_pkt_idcode, _cfg_pkt_data):
-        self.mini_cfg[_cfg_pkt_idcode] = MiniCfg(_cfg_pkt_data)
+    def pop_released(self):
+        """Returns and forgets the held messages released so far."""
+        released, self.released = self.released, []
+        return released
+
+    def configuration_change(self, idcode):
+        """Called when a data message of data stream idcode announces a
+        configuration change. The cached configuration is no longer preloaded.
+        """
+        if idcode in self.changes:
+            return
+        self._start_change(idcode)
+        if self.on_change is not None:
+            self.on_change(idcode)
+
+    def _start_change(self, idcode):
+        change = self.changes[idcode] = ConfigChange()
+        if self.cache is not None:
+            self.cache.invalidate(idcode)
+        return change
+
+    def set_projection(self, idcode, projection):
+        """Decode only the channels selected by projection for data stream
+        idcode. Use None to decode all channels again.
+        """
+        if projection is None:
+            self.projection.pop(idcode, None)
+        else:
+            self.projection[idcode] = projection
+        mini_cfg = self.mini_cfg[idcode]
+        if mini_cfg is not None:
+            mini_cfg.decoder = DataDecoder(mini_cfg, projection)
+
+
+class ConfigChange(object):
+    """State of a pending configuration change of one data stream."""
+    __slots__ = ('effected', 'staged', 'staged_raw_pkt', 'held')
+
+    def __init__(self):
+        self.effected = False  # Data messages no longer follow the current configuration
+        self.staged = None  # New MiniCfg, not compiled yet
+        self.staged_raw_pkt = None
+        self.held = deque()
+
+
+class Cfg3Fragments(object):
+    """Continuation frames of a CFG-3 message received so far."""
+    __slots__ = ('next_idx', 'bodies', 'raw_pkts')
+
+    def __init__(self):
+        self.next_idx = 1
+        self.bodies = []  # Without CONT_IDX
+        self.raw_pkts = []
 
 
 class MiniCfg(object):
+    """The parts of a CFG-2 or CFG-3 message needed to decode data messages.
+    CFG-3 PHSCALE and ANSCALE are read into the same Phunit and Anunit
+    attributes as CFG-2 PHUNIT and ANUNIT.
+    """
+
     def __init__(self, _cfg_pkt_data):
         #io = KaitaiStream(BytesIO(cfg_pkt))
         #self._cfg_pkt = Common(io)
         #self._type = self._cfg_pkt.sync.frame_type.name
         #self._cfg = self._cfg_pkt.data
         self.num_pmu = _cfg_pkt_data.num_pmu
+        self.decoder = None
+        self.raw_pkt = None  # The configuration message(s), set when installed
         self.time_base = self.TimeBase(_cfg_pkt_data.time_base)
         self.station = [None] * (self.num_pmu)
         for i in range(self.num_pmu):
             self.station[i] = self.Station(_cfg_pkt_data.station[i])
+        self.cfgcnt = tuple(_station.cfgcnt for _station in _cfg_pkt_data.station)
 
     class TimeBase(object):
         def __init__(self, _time_base):
@@ -37,15 +243,22 @@ class MiniCfg(object):
             self.phnmr = self._station.phnmr
             self.annmr = self._station.annmr
             self.dgnmr = self._station.dgnmr
+            _cfg3 = hasattr(self._station, 'phscale')
+            _phunit = self._station.phscale if _cfg3 else self._station.phunit
+            _anunit = self._station.anscale if _cfg3 else self._station.anunit
             self.phunit = [None] * self.phnmr
             for i in range(self.phnmr):
-                self.phunit[i] = self.Phunit(self._station.phunit[i], self._station.chnam.phasor_names[i].name)
+                self.phunit[i] = self.Phunit(_phunit[i], self._station.chnam.phasor_names[i].name)
             self.anunit = [None] * self.annmr
             for i in range(self.annmr):
-                self.anunit[i] = self.Anunit(self._station.anunit[i], self._station.chnam.analog_names[i].name)
+                self.anunit[i] = self.Anunit(_anunit[i], self._station.chnam.analog_names[i].name)
             self.digunit = [None] * self.dgnmr
             for i in range(self.dgnmr):
                 self.digunit[i] = self.Digunit(self._station.digunit[i], self._station.chnam.digital_status_labels[i*16: (i+1)*16])
+            # Shared by the DigitalWord views of every data frame
+            self.digital_labels = [
+                tuple((flag.name, flag.normal_status, flag.current_valid_input) for flag in digunit)
+                for digunit in self.digunit]
             self.fnom = self._station.fnom
 
         class Format(object):
@@ -58,12 +271,22 @@ class MiniCfg(object):
 
         class Phunit(object):
             def __init__(self, _phunit, name):
-                self.conversion_factor = _phunit.conversion_factor
+                if hasattr(_phunit, 'scale_factor'):  # CFG-3 PHSCALE
+                    self.conversion_factor = _phunit.scale_factor
+                    self.angle_offset = _phunit.phasor_angle_adjustment  # Radians
+                else:
+                    self.conversion_factor = _phunit.conversion_factor
+                    self.angle_offset = 0.0
                 self.name = name
 
         class Anunit(object):
             def __init__(self, _anunit, name):
-                self.conversion_factor = _anunit.conversion_factor
+                if hasattr(_anunit, 'magnitude_scaling'):  # CFG-3 ANSCALE
+                    self.conversion_factor = _anunit.magnitude_scaling
+                    self.offset = _anunit.offset
+                else:
+                    self.conversion_factor = _anunit.conversion_factor
+                    self.offset = 0.0
                 self.name = name
 
         class Digunit(UserList):
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Parallel decoding of pcap captures into DataBatch objects.
+
+The packet records of a capture are split into chunks that are decoded by
+the processes of a ProcessPoolExecutor, each chunk with its own Parser:
+
+- The chunks start at record boundaries found from the record headers
+  around every chunk_size bytes, without walking the file.
+- A first pass, also run by the workers, finds the configuration messages
+  of every chunk with a regular expression and verifies their CHK; only
+  the packets of a message split across several are decoded. The Parser of
+  a chunk is seeded with the last configuration of each data stream found
+  before the chunk. Configuration messages inside the chunk are then
+  applied in stream order, as by PcapParser.iter_pcap().
+- Every flow of a chunk is reassembled and framed on its own. The end of a
+  message begun in the previous chunk is skipped (the framer resynchronises
+  up to the first message with a valid CHK), and a message cut by the end of
+  the chunk is completed from the records that follow, so every message is
+  decoded once. Messages reordered across a chunk boundary can be lost.
+- Data messages are decoded per data stream with parse_batch() into
+  DataBatch objects, which are picklable. Chunks are returned in capture
+  order, and the batches of a chunk are sorted by their first time tag.
+"""
+import bisect
+import os
+import re
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from .batch import parse_batch
+from .crc import crc_ok
+from .flows import FlowTable
+from .framer import Framer
+from .parser import Parser
+from .pcapreader import PcapReader
+
+_CFG_SYNC = re.compile(b'\xaa[\x21\x31\x51]')  # CFG-1, CFG-2, CFG-3
+_HEADER = struct.Struct('>HHH')  # SYNC, FRAMESIZE, IDCODE
+_CONT_IDX = struct.Struct('>H')
+
+
+def iter_chunks(file_name, workers=None, size=1000, chunk_size=32 << 20,
+                ports=None, hosts=None, seed=b'', **kwargs):
+    """Decodes the data messages of a pcap file in worker processes, chunk
+    by chunk. See PcapParser.parallel_batches().
+
+    Args:
+        file_name (str): The pcap file.
+        workers (int): Worker processes. Defaults to os.cpu_count(). With 1,
+                       the chunks are decoded in this process.
+        size (int): Maximum number of messages per batch.
+        chunk_size (int): Bytes of packet records per chunk. Smaller chunks
+                          are used to give every worker several of them.
+        ports (list): See PcapReader.
+        hosts (list): See PcapReader.
+        seed (bytes): Configuration messages known beforehand, e.g. from a
+                      ConfigCache. They precede the ones found in the file.
+        **kwargs: Passed to the Parser of every chunk. They must be
+                  picklable.
+
+    Returns:
+        Generator of (batches, quarantine) per chunk, in capture order, where
+        batches is a list of DataBatch objects and quarantine the Quarantine
+        of the chunk.
+    """
+    workers = workers or os.cpu_count() or 1
+    with PcapReader(file_name) as reader:
+        chunk_size = max(min(chunk_size, reader.size // (workers * 4)), 1 << 16)
+        chunks = reader.split(chunk_size)
+    if workers == 1:
+        configs = chunk_configs(file_name, chunks, None, ports, hosts)
+        for task in _tasks(file_name, chunks, configs, seed, ports, hosts, size, kwargs):
+            yield decode_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        configs = []
+        for found in executor.map(chunk_configs, repeat(file_name), repeat(chunks),
+                                  range(len(chunks)), repeat(ports), repeat(hosts)):
+            configs.extend(found)
+        # At most two chunks per worker are decoded ahead of the consumer
+        futures = deque()
+        try:
+            for task in _tasks(file_name, chunks, configs, seed, ports, hosts, size, kwargs):
+                futures.append(executor.submit(decode_chunk, *task))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _tasks(file_name, chunks, configs, seed, ports, hosts, size, kwargs):
+    # Arguments of decode_chunk() for every chunk
+    seeds = _seeds(configs, chunks, seed)
+    for i, (start, stop) in enumerate(chunks):
+        end = chunks[i + 1][1] if i + 1 < len(chunks) else stop
+        yield (file_name, start, stop, end, seeds[i], ports, hosts, size, kwargs)
+
+
+def chunk_configs(file_name, chunks, index=None, ports=None, hosts=None):
+    """Returns the configuration messages starting in chunk index of the
+    pcap file (all chunks if None), as (file offset, raw_pkt) sorted by
+    offset.
+
+    Messages are looked up with one regular expression scan. One held in a
+    single packet is verified in place; one split across packets is
+    reassembled from the following segments of its flow, in capture order.
+    Only messages with a valid CHK are returned.
+
+    Args:
+        file_name (str): The pcap file.
+        chunks (list): (start, stop) chunks of the file, see
+                       PcapReader.split().
+        index (int): The chunk to search.
+        ports (list): See PcapReader.
+        hosts (list): See PcapReader.
+    """
+    starts = [start for start, _ in chunks]
+    found = []
+    with PcapReader(file_name, ports, hosts) as reader:
+        view = reader.buffer
+        end = len(view)
+        start, stop = (starts[0], chunks[-1][1]) if index is None else chunks[index]
+        for match in _CFG_SYNC.finditer(view, start, stop + 1):
+            offset = match.start()
+            plausible = _plausible_config(view, offset)
+            if plausible or _cfg3_continuation(view, offset):
+                framesize = _HEADER.unpack_from(view, offset)[1]
+                raw_pkt = view[offset:offset + framesize]
+                if offset + framesize <= end and crc_ok(raw_pkt):
+                    found.append((offset, raw_pkt.tobytes()))
+                elif plausible:
+                    chunk_start = starts[bisect.bisect_right(starts, offset) - 1]
+                    raw_pkt = _reassemble(reader, reader.record_at(offset, chunk_start),
+                                          match.group(), framesize)
+                    if raw_pkt is not None:
+                        found.append((offset, raw_pkt))
+    return found
+
+
+def _plausible_config(view, offset):
+    # The header of a CFG-1, CFG-2 or first CFG-3 frame may start at offset:
+    # the reserved byte of TIME_BASE is 0, NUM_PMU is below 256 and not 0,
+    # and the station name starts with two printable characters. CFG-3
+    # continuation frames are only found in one packet.
+    cfg3 = view[offset + 1] == 0x51
+    time_base = offset + (16 if cfg3 else 14)
+    if time_base + 10 > len(view):
+        return False
+    if cfg3 and _CONT_IDX.unpack_from(view, offset + 14)[0] > 1:
+        return False
+    stn = time_base + (7 if cfg3 else 6)  # After the length of STN in CFG-3
+    return (_HEADER.unpack_from(view, offset)[1] >= 54 and view[time_base] == 0
+            and view[time_base + 4] == 0 and view[time_base + 5] != 0
+            and 0x20 <= view[stn] < 0x7F and 0x20 <= view[stn + 1] < 0x7F)
+
+
+def _cfg3_continuation(view, offset):
+    # A CFG-3 continuation frame (CONT_IDX 2 to 4095, or 0xFFFF) may start
+    # at offset
+    if view[offset + 1] != 0x51 or offset + 16 > len(view):
+        return False
+    cont_idx = _CONT_IDX.unpack_from(view, offset + 14)[0]
+    return (_HEADER.unpack_from(view, offset)[1] >= 18
+            and (1 < cont_idx < 0x1000 or cont_idx == 0xFFFF))
+
+
+def _reassemble(reader, record, sync, framesize):
+    # The configuration message starting in the payload of the segment at
+    # record, framed from the segments of its flow that follow it
+    if record is None:
+        return None
+    framer = Framer()
+    key = None
+    fed = 0
+    for segment in reader.segments(record):
+        if key is None:
+            key = segment.key
+        elif segment.key != key:
+            continue
+        framer.feed(segment.payload)
+        fed += len(segment.payload)
+        for raw_pkt in framer.frames():
+            if not crc_ok(raw_pkt):
+                framer.resync()
+            elif raw_pkt[:2] == sync:
+                return bytes(raw_pkt)
+        if fed > framesize + 0xFFFF:
+            return None
+    return None
+
+
+def _seeds(configs, chunks, seed=b''):
+    # The configuration messages found before each chunk: the last one of
+    # every data stream, frame type and CFG-3 frame, in file order
+    latest = {}
+    seeds = []
+    i = 0
+    for start, _ in chunks:
+        while i < len(configs) and configs[i][0] < start:
+            offset, raw_pkt = configs[i]
+            _, _, idcode = _HEADER.unpack_from(raw_pkt)
+            cont_idx = _CONT_IDX.unpack_from(raw_pkt, 14)[0] if raw_pkt[1] == 0x51 else 0
+            latest[idcode, raw_pkt[1], cont_idx] = (offset, raw_pkt)
+            i += 1
+        seeds.append(seed + b''.join(raw_pkt for _, raw_pkt in sorted(latest.values())))
+    return seeds
+
+
+def decode_chunk(file_name, start, stop, end, seed, ports=None, hosts=None,
+                 size=1000, kwargs=None):
+    """Decodes the data messages of the packet records between the file
+    offsets start and stop. A message cut at stop is completed from the
+    records up to end.
+
+    Returns:
+        tuple: (batches, quarantine), see iter_chunks().
+    """
+    parser = Parser(seed or None, **(kwargs or {}))
+    chunk = _ChunkDecoder(parser, size)
+    flows = FlowTable()
+    with PcapReader(file_name, ports, hosts) as reader:
+        for segment in reader.segments(start, stop):
+            chunk.decode(flows.add(segment))
+        for flow in flows.flush():  # Data behind gaps not filled in the chunk
+            chunk.decode(flow)
+        cut = set(flow.key for flow in flows if flow.framer.missing())
+        if cut:
+            for segment in reader.segments(stop, end):
+                if segment.key in cut and chunk.decode(flows.add(segment), 1):
+                    cut.discard(segment.key)
+                    if not cut:
+                        break
+    chunk.flush()
+    chunk.batches.sort(key=lambda batch: (batch.soc[0], batch.fracsec[0]))
+    return chunk.batches, parser.quarantine
+
+
+class _ChunkDecoder(object):
+    # Frames the flows of a chunk and collects the data messages per data
+    # stream until size of them are batched
+
+    def __init__(self, parser, size):
+        self.parser = parser
+        self.size = size
+        self.batches = []
+        self._pending = {}  # idcode: (MiniCfg, bytearray of messages)
+        self._synced = {}  # key: Flow.gaps of the flows past their first message
+
+    def decode(self, flow, count=None):
+        # Returns the number of messages taken from the framer
+        config = self.parser.config
+        pending_get = self._pending.get
+        framer = flow.framer
+        synced = self._synced.get(flow.key) == flow.gaps
+        taken = 0
+        for raw_pkt in framer.frames():
+            if not synced:
+                # The end of a message of the previous chunk or cut by a gap
+                if not crc_ok(raw_pkt):
+                    framer.resync()
+                    continue
+                synced = True
+                self._synced[flow.key] = flow.gaps
+            taken += 1
+            idcode = (raw_pkt[4] << 8) | raw_pkt[5]
+            if raw_pkt[1] & 0x70:
+                self.flush(idcode)  # Data messages before a new configuration
+                try:
+                    self.parser.parse_buffer(raw_pkt)
+                except Exception:
+                    pass  # Quarantined
+            else:
+                pending = pending_get(idcode)
+                mini_cfg = config(idcode)
+                if mini_cfg is None or len(raw_pkt) != mini_cfg.decoder.framesize:
+                    self.parser.drop(idcode, raw_pkt)
+                else:
+                    if pending is None or pending[0] is not mini_cfg:
+                        self.flush(idcode)
+                        pending = self._pending[idcode] = (mini_cfg, bytearray())
+                    pending[1].extend(raw_pkt)
+                    if len(pending[1]) >= self.size * len(raw_pkt):
+                        self.flush(idcode)
+            if taken == count:
+                break
+        return taken
+
+    def flush(self, idcode=None):
+        # Decodes the data messages collected for idcode, or for all
+        for idcode in list(self._pending) if idcode is None else [idcode]:
+            pending = self._pending.pop(idcode, None)
+            if pending is None:
+                continue
+            mini_cfg, raw_bytes = pending
+            batch = parse_batch(bytes(raw_bytes), mini_cfg, self.parser.crc)
+            if len(batch):
+                self.batches.append(batch)
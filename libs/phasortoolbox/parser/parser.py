@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 from kaitaistruct import __version__ as ks_version, KaitaiStruct, KaitaiStream, BytesIO
 from .common import PhasorMessage
+from .frame import PhasorFrame, LazyPhasorFrame, SYNC_WORDS
 from .minicfg import MiniCfgs
-from .pcap import Pcap
+from .crc import CrcChecker
+from .framer import Framer
+from .quarantine import Quarantine, CRC, SYNC, LENGTH, UNKNOWN_CFG, MALFORMED
 import logging
 LOG=logging.getLogger('phasortoolbox.parser')
 import struct
@@ -30,69 +33,461 @@ class Parser(object):
         my_msgs = my_parser.parse(msg)  # Parse the previously created mseeage\
                                         and returns a list of parsed messages
         print(my_msgs[0].data.cmd.name) # Print the contant of the command
+
+    # Data messages are decoded by the DataDecoder compiled from the stored
+    # configuration message. Use fast=False to decode them with the
+    # KaitaiStruct classes instead, e.g. for debugging.
+        my_parser = Parser(fast=False)
+
+    # A stream arriving in chunks is fed incrementally. Partial messages are
+    # kept until the rest arrives and frames() yields each complete message.
+        my_parser = Parser()
+        for chunk in chunks:
+            my_parser.feed(chunk)
+            for frame in my_parser.frames():
+                print(frame.time)
+
+    # Messages with a wrong CHK are dropped before they are decoded. The
+    # checker counts verified and rejected messages.
+        my_parser = Parser(crc=CrcChecker('sample', sample_rate=0.1))
+        print(my_parser.crc.checked, my_parser.crc.rejected)
+
+    # A configuration change announced in STAT is followed without losing
+    # data: the new decoder is swapped in when the change takes effect and
+    # messages received before the new configuration are held meanwhile.
+    # Request the new configuration when notified:
+        my_parser.on_configuration_change = lambda idcode: request_cfg2(idcode)
+
+    # On lossy links, parse() and parse_buffer() can skip bad messages
+    # instead of raising. Bad messages are quarantined and counted per IDCODE
+    # in either mode.
+        my_parser = Parser(tolerant=True)
+        msgs = my_parser.parse(raw_bytes)
+        print(my_parser.quarantine.counters)
+
+    # Configuration messages are saved to a ConfigCache and preloaded by the
+    # next parser, which decodes data messages without waiting for them.
+        from phasortoolbox.parser import ConfigCache
+        my_parser = Parser(cache=ConfigCache('cfg.bin'))
+
+    Args:
+        raw_cfg_pkt (bytes): Configuration message(s) to parse on creation.
+        fast (bool): Decode data messages with the compiled DataDecoder.
+                     Defaults to True.
+        crc (str or CrcChecker): CRC verification policy: 'all', 'sample',
+                                 'off' or a CrcChecker. Defaults to 'all'.
+        cache (ConfigCache): Preloads and saves configuration messages.
+                             Defaults to None.
+        tolerant (bool): parse() and parse_buffer() skip messages that fail
+                         to decode, and invalid headers, up to the next
+                         valid message instead of raising. Defaults to False.
+        quarantine (int or Quarantine): Number of bad messages kept in
+                                        quarantine, or a Quarantine. Defaults
+                                        to 1000.
     """
 
-    def __init__(self, raw_cfg_pkt=None):
-        self._mini_cfgs = MiniCfgs()
+    def __init__(self, raw_cfg_pkt=None, fast=True, crc='all', cache=None,
+                 tolerant=False, quarantine=1000):
+        self._mini_cfgs = MiniCfgs(cache)
+        self.fast = fast
+        self.crc = crc if isinstance(crc, CrcChecker) else CrcChecker(crc)
+        self.tolerant = tolerant
+        self.quarantine = quarantine if isinstance(quarantine, Quarantine) else Quarantine(quarantine)
+        self._framer = Framer(bound=self.max_framesize)
+        self.corrupted = 0  # Messages dropped by frames()
+        if cache is not None:
+            for raw_pkt in cache.raw_pkts():
+                self.parse_buffer(raw_pkt)
         if raw_cfg_pkt:
             self.parse(raw_cfg_pkt)
 
+    @property
+    def on_configuration_change(self):
+        """Called with the IDCODE when a data stream announces a configuration
+        change and when the change takes effect before the new configuration
+        message arrived. See MiniCfgs.
+        """
+        return self._mini_cfgs.on_change
+
+    @on_configuration_change.setter
+    def on_configuration_change(self, on_change):
+        self._mini_cfgs.on_change = on_change
+
+    def has_cfg(self, idcode):
+        """Returns True if a configuration message of data stream idcode has
+        been parsed or preloaded.
+        """
+        return self._mini_cfgs.mini_cfg[idcode] is not None
+
+    def change_pending(self, idcode):
+        """Returns True while a configuration change of data stream idcode
+        is announced or in effect and its new configuration has not been
+        installed yet.
+        """
+        return idcode in self._mini_cfgs.changes
+
+    def config(self, idcode):
+        """Returns the configuration data messages of data stream idcode are
+        decoded with (a minicfg.MiniCfg), or None.
+        """
+        return self._mini_cfgs.mini_cfg[idcode]
+
+    def max_framesize(self, idcode):
+        """Returns the largest FRAMESIZE known for data stream idcode, of
+        its data messages and configuration message, or None if it has no
+        configuration. See Framer.bound.
+        """
+        mini_cfg = self._mini_cfgs.mini_cfg[idcode]
+        if mini_cfg is None:
+            return None
+        if mini_cfg.raw_pkt is None:
+            return mini_cfg.decoder.framesize
+        return max(mini_cfg.decoder.framesize, len(mini_cfg.raw_pkt))
+
+    def drop(self, idcode, raw_pkt):
+        """Quarantines a data message of data stream idcode that does not
+        match its configuration: as UNKNOWN_CFG if it has none, else as
+        LENGTH.
+        """
+        reason = UNKNOWN_CFG if self._mini_cfgs.mini_cfg[idcode] is None else LENGTH
+        self.quarantine.add(bytes(raw_pkt), reason, idcode)
+
+    def set_projection(self, idcode, projection):
+        """Decode only some channels of a data stream.
+
+        Args:
+            idcode (int): IDCODE of the data stream.
+            projection (decoder.Projection): Channels to decode. None to decode
+                                             all channels again.
+        """
+        self._mini_cfgs.set_projection(idcode, projection)
+
     def parse(self, raw_bytes):
         """Parse synchrphasor message stream
 
-
+        Messages with a wrong CHK and data messages that cannot be decoded are
+        quarantined and left out, except data messages received after a
+        configuration change took effect, which are held and returned once
+        the new configuration arrives. Any other message that fails to decode
+        raises, unless the parser is tolerant.
         """
         stream = []
+        view = memoryview(raw_bytes)
+        data = raw_bytes if isinstance(raw_bytes, (bytes, bytearray)) else None
         _io = KaitaiStream(BytesIO(raw_bytes))
-        while not _io.is_eof():
+        offset, end = 0, len(view)
+        while offset < end:
+            reason = self._check_header(view, offset) if self.tolerant else None
+            if reason is None and not self._crc_ok(view, offset):
+                reason = CRC
+            if reason is not None:
+                offset = self._reject(view, data, offset, reason)
+                continue
+            _io.seek(offset)
+            try:
+                message = PhasorMessage(_io, _mini_cfgs=self._mini_cfgs, _fast=self.fast)
+            except Exception:
+                if not self.tolerant:
+                    self._reject(view, data, offset, MALFORMED)
+                    LOG.debug("Parsing error.")
+                    raise
+                LOG.debug("Parsing error, resynchronising.", exc_info=True)
+                offset = self._reject(view, data, offset, MALFORMED)
+                continue
+            if self._mini_cfgs.released:
+                stream.extend(self._mini_cfgs.pop_released())
+            if type(message.data) != type(b''):
+                stream.append(message)
+            elif message.sync.frame_type.value == 0:
+                if message.idcode in self._mini_cfgs.changes:
+                    self._mini_cfgs.hold(message)
+                else:
+                    self.drop(message.idcode, view[offset:_io.pos()])
+            offset = _io.pos()
+        return stream
+
+    def parse_buffer(self, buf, offset=0, length=None, lazy=False):
+        """Parse synchrphasor messages in place.
+
+        Unlike parse(), the messages are decoded directly from buf and
+        returned as PhasorFrame objects whose raw_pkt is a memoryview slice
+        of buf. Data messages are always decoded with the compiled
+        DataDecoder. Bad messages are handled as by parse().
+
+        Args:
+            buf (bytes, bytearray or memoryview): Buffer holding the messages.
+            offset (int): Position of the first message in buf.
+            length (int): Number of bytes to parse. Defaults to the rest of
+                          buf.
+            lazy (bool): Return LazyPhasorFrame objects, which decode the
+                         body of data messages on first access.
+        """
+        _frame = LazyPhasorFrame if lazy else PhasorFrame
+        view = memoryview(buf)
+        data = buf if isinstance(buf, (bytes, bytearray)) else None
+        end = len(view) if length is None else offset + length
+        if end < len(view):
+            view = view[:end]
+        stream = []
+        while offset < end:
+            reason = self._check_header(view, offset) if self.tolerant else None
+            if reason is None and not self._crc_ok(view, offset):
+                reason = CRC
+            if reason is not None:
+                offset = self._reject(view, data, offset, reason)
+                continue
             try:
-                message = PhasorMessage(_io, _mini_cfgs=self._mini_cfgs)
-                if type(message.data) != type(b''):
-                    stream.append(message)
-            except Exception as e:
-                LOG.debug("Parsing error.")
-                print(len(stream))
-                raise
+                message = _frame(view, offset, self._mini_cfgs)
+            except Exception:
+                if not self.tolerant:
+                    self._reject(view, data, offset, MALFORMED)
+                    raise
+                LOG.debug("Parsing error, resynchronising.", exc_info=True)
+                offset = self._reject(view, data, offset, MALFORMED)
+                continue
+            offset += message.framesize
+            if self._mini_cfgs.released:
+                stream.extend(self._mini_cfgs.pop_released())
+            if message.decodable:
+                stream.append(message)
+            elif message.sync.frame_type.value == 0 and message.idcode not in self._mini_cfgs.changes:
+                self.drop(message.idcode, message.raw_pkt)
         return stream
 
+    def feed(self, raw_bytes):
+        """Append a chunk of a synchrophasor message stream. Complete
+        messages are returned by frames().
+        """
+        self._framer.feed(raw_bytes)
+
+    def frames(self, lazy=False, framer=None):
+        """Yield the messages completed by the chunks fed so far as
+        PhasorFrame objects.
+
+        A message with a wrong CHK or that fails to decode is quarantined and
+        counted in corrupted, and the stream is resynchronised on the next
+        SYNC byte after its start. Bytes skipped to resynchronise are counted
+        in skipped. Data messages without a configuration are quarantined.
+
+        Args:
+            lazy (bool): Yield LazyPhasorFrame objects, which decode the body
+                         of data messages on first access.
+            framer (Framer): Take the messages from this framer instead of
+                             the one fed by feed(), e.g. one per TCP
+                             connection. The configurations are shared.
+        """
+        _frame = LazyPhasorFrame if lazy else PhasorFrame
+        framer = self._framer if framer is None else framer
+        for raw_pkt in framer.frames():
+            if not self.crc.check(raw_pkt):
+                self.corrupted += 1
+                self.quarantine.add(bytes(raw_pkt), CRC, _IDCODE.unpack_from(raw_pkt, 4)[0])
+                framer.resync()
+                continue
+            try:
+                message = _frame(memoryview(raw_pkt), 0, self._mini_cfgs)
+            except Exception:
+                LOG.debug("Parsing error, resynchronising.", exc_info=True)
+                self.corrupted += 1
+                self.quarantine.add(bytes(raw_pkt), MALFORMED, _IDCODE.unpack_from(raw_pkt, 4)[0])
+                framer.resync()
+                continue
+            if self._mini_cfgs.released:
+                for released in self._mini_cfgs.pop_released():
+                    yield released
+            if message.decodable:
+                yield message
+            elif message.sync.frame_type.value == 0 and message.idcode not in self._mini_cfgs.changes:
+                self.drop(message.idcode, raw_pkt)
+
+    @property
+    def skipped(self):
+        """Number of bytes skipped by frames() to resynchronise."""
+        return self._framer.skipped
+
+    def parse_batch(self, raw_bytes, idcode=None):
+        """Parse concatenated data messages of one data stream into NumPy
+        arrays.
+
+        The configuration message of the data stream must have been parsed
+        before. See batch.DataBatch for the returned columns.
+
+        Args:
+            raw_bytes (bytes-like): N concatenated data messages.
+            idcode (int): IDCODE of the data stream. Defaults to the IDCODE of
+                          the first message.
+        """
+        from .batch import parse_batch  # NumPy is only required here
+        if idcode is None:
+            idcode = struct.unpack_from('>H', raw_bytes, 4)[0]
+        mini_cfg = self._mini_cfgs.mini_cfg[idcode]
+        if mini_cfg is None:
+            raise ValueError('No configuration message for IDCODE {}.'.format(idcode))
+        return parse_batch(raw_bytes, mini_cfg, self.crc)
+
+    def _check_header(self, view, offset):
+        # Returns SYNC if no message can start at offset
+        if len(view) - offset < 16 or view[offset] != 0xAA or view[offset + 1] not in SYNC_WORDS:
+            return SYNC
+        framesize = _FRAMESIZE.unpack_from(view, offset + 2)[0]
+        if framesize < 16 or offset + framesize > len(view):
+            return SYNC
+        return None
+
+    def _reject(self, view, data, offset, reason):
+        # Quarantines the bad message at offset and returns where to go on
+        end = _next_message(view, data, offset)
+        idcode = None
+        if reason != SYNC and len(view) - offset >= 6:
+            idcode = _IDCODE.unpack_from(view, offset + 4)[0]
+        self.quarantine.add(view[offset:end].tobytes(), reason, idcode)
+        return end
+
+    def _crc_ok(self, view, offset):
+        # Messages with an invalid header are left to the decoder to report.
+        if len(view) - offset < 4:
+            return True
+        framesize = struct.unpack_from('>H', view, offset + 2)[0]
+        if framesize < 16 or offset + framesize > len(view):
+            return True
+        return self.crc.check(view[offset:offset + framesize])
+
+
+_FRAMESIZE = struct.Struct('>H')
+_IDCODE = struct.Struct('>H')
+
+
+def _next_message(view, data, offset):
+    # Where FRAMESIZE of the bad message at offset points if a SYNC word or
+    # the end is there, else the next SYNC word, else the end. data is view as
+    # bytes or bytearray, for find(), or None.
+    end = len(view)
+    if end - offset >= 4:
+        following = offset + _FRAMESIZE.unpack_from(view, offset + 2)[0]
+        if offset + 16 <= following <= end and (
+                following == end or
+                (following + 1 < end and view[following] == 0xAA and view[following + 1] in SYNC_WORDS)):
+            return following
+    base, start = 0, offset + 1
+    if data is None:
+        data = view[start:].tobytes()
+        base, start = start, 0
+    while True:
+        i = data.find(b'\xaa', start)
+        if i < 0 or base + i + 1 >= end:
+            return end
+        if view[base + i + 1] in SYNC_WORDS:
+            return base + i
+        start = i + 1
+
 
 class PcapParser(object):
     """ A Parser that parses synchrphasor messages captured in pcap file
+
+    The capture is read with a PcapReader: packet records are walked in the
+    mapped file and their payloads fed to the streaming parser, so memory
+    use does not grow with the file size when the messages are iterated.
+    Payloads are reassembled per flow (5-tuple), in TCP sequence order and
+    without retransmissions, so several PMUs or PDC links in one capture do
+    not interleave. The flows of the last capture are kept in flows.
+    Segments outside the ports and hosts are skipped before their payload is
+    read.
+
+    Example:
+        my_pcap_parser = PcapParser(ports=(4712, 4713))
+        for msg in my_pcap_parser.iter_pcap('substation.pcap'):
+            ...
+        for msgs in my_pcap_parser.iter_batches('substation.pcap', 1000):
+            ...
+        # Data messages as NumPy batches, decoded on every core
+        for batch in my_pcap_parser.parallel_batches('substation.pcap'):
+            ...
+
+    Args:
+        ports (list): Parse only the flows from or to these ports. Defaults
+                      to None, all ports.
+        hosts (list): Parse only the flows from or to these IP addresses.
+                      Defaults to None, all hosts.
+        **kwargs: Passed to Parser().
     """
-    def __init__(self):
-        self._parser = Parser()
+    def __init__(self, ports=None, hosts=None, **kwargs):
+        self._parser = Parser(**kwargs)
+        self._kwargs = kwargs
+        self.ports = ports
+        self.hosts = hosts
+        self.flows = None  # flows.FlowTable
+
+    @property
+    def parser(self):
+        """The Parser holding the configurations and error counters."""
+        return self._parser
 
     def from_pcap(self, file_name):
-        self._pcap = Pcap.from_file(file_name)
+        """Returns a list of every message in the pcap file as PhasorMessage
+        objects. iter_pcap() is faster and does not keep the messages.
+        """
+        stream = []
+        for framer in self._framers(file_name):
+            for raw_pkt in framer.frames():
+                stream.extend(self._parser.parse(bytes(raw_pkt)))
+        return stream
 
+    def iter_pcap(self, file_name, lazy=False):
+        """Yields the messages in the pcap file as PhasorFrame objects.
 
-        _r_stream = b''  # Get all bytes from pcap
-        for pkt in self._pcap.packets:
-            try:
-                _raw_data = pkt.body.body.body.body
-                _r_stream += _raw_data
-            except Exception as e:
-                LOG.debug("Pcap message parsing error.")
-                pass
-
-
-        _p_stream = b''  # Extract synchrophasor bytes
-        l = 1  # Expect to get at least one byte
-        while len(_r_stream) >= l:
-            if l == 1:  # Looking for header
-                i = 0
-                for b in _r_stream:
-                    if b == 170:
-                        l = 4 # Looking for length info
-                        break
-                    i += 1
-                _r_stream = _r_stream[i:]  # Remove unrecognized bytes
-            if l == 4 and len(_r_stream)>=4:
-                l = struct.unpack('>H',_r_stream[2:4])[0]  # Get synchrophasor msg length
-            if l > 4 and l <= len(_r_stream):
-                _p_stream += _r_stream[:l]
-                _r_stream = _r_stream[l:]
-                l = 1
-
-        return self._parser.parse(_p_stream)
+        Args:
+            file_name (str): The pcap file.
+            lazy (bool): Yield LazyPhasorFrame objects, see Parser.frames().
+        """
+        for framer in self._framers(file_name):
+            for message in self._parser.frames(lazy, framer):
+                yield message
+
+    def _framers(self, file_name):
+        # Yields the framer of a flow each time its reassembled bytes grow
+        from .pcapreader import PcapReader
+        from .flows import FlowTable
+        self.flows = FlowTable(bound=self._parser.max_framesize)
+        with PcapReader(file_name, self.ports, self.hosts) as reader:
+            for segment in reader.segments():
+                yield self.flows.add(segment).framer
+        for flow in self.flows.flush():
+            yield flow.framer
+
+    def parallel_batches(self, file_name, workers=None, size=1000, chunk_size=32 << 20):
+        """Yields the data messages in the pcap file as batch.DataBatch
+        objects, decoded by worker processes. See parallel.py.
+
+        The packet records are split into chunks decoded by a
+        ProcessPoolExecutor, each with a Parser seeded with the
+        configurations found before the chunk in a first pass over the
+        file. Batches hold the messages of one data stream and come back in
+        capture order. Other messages are not returned; the bad messages of
+        every chunk are added to the quarantine of parser.
+
+        Args:
+            file_name (str): The pcap file.
+            workers (int): Worker processes. Defaults to os.cpu_count().
+            size (int): Maximum number of messages per batch.
+            chunk_size (int): Bytes of packet records per chunk.
+        """
+        from .parallel import iter_chunks
+        kwargs = dict(self._kwargs)
+        cache = kwargs.pop('cache', None)
+        seed = b''.join(cache.raw_pkts()) if cache is not None else b''
+        for batches, quarantine in iter_chunks(
+                file_name, workers, size, chunk_size, self.ports, self.hosts, seed, **kwargs):
+            self._parser.quarantine.merge(quarantine)
+            for batch in batches:
+                yield batch
 
+    def iter_batches(self, file_name, size=1000, lazy=False):
+        """Yields the messages in the pcap file in lists of at most size."""
+        batch = []
+        for message in self.iter_pcap(file_name, lazy):
+            batch.append(message)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
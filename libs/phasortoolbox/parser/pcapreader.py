@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""Streaming reader of pcap files.
+
+A PcapReader maps the capture with mmap and walks the packet records with
+struct, so a multi-GB capture is read lazily with constant memory instead of
+being decoded into KaitaiStruct objects as a whole. Packet data are
+memoryview slices of the mapping.
+
+The Ethernet (with VLAN tags), Linux SLL/SLL2 and raw IP link layers, IPv4,
+IPv6, TCP and UDP headers are read at fixed offsets, and the port/host
+filter is applied before the payload is sliced. Other link-layer types fall
+back to the KaitaiStruct classes of the pcap package.
+"""
+import mmap
+import socket
+import struct
+
+# Magic number: (byte order, fraction of second units per second)
+_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1000000),
+    b'\xa1\xb2\xc3\xd4': ('>', 1000000),
+    b'\x4d\x3c\xb2\xa1': ('<', 1000000000),
+    b'\xa1\xb2\x3c\x4d': ('>', 1000000000),
+}
+_HEADER_SIZE = 24
+_RECORD_SIZE = 16
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_PPI = 192
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+C37118_PORTS = (4712, 4713)  # Default TCP and UDP ports of IEEE C37.118
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+
+class PcapReader(object):
+    """Iterates over the packets of a pcap file.
+
+    Example:
+        with PcapReader('capture.pcap') as reader:
+            for payload in reader.payloads():
+                my_parser.feed(payload)
+                for msg in my_parser.frames():
+                    ...
+
+        # Only the C37.118 traffic of one PMU
+        with PcapReader('capture.pcap', ports=C37118_PORTS, hosts=['10.0.0.1']) as reader:
+            ...
+
+    Note:
+        The memoryviews returned by records() are slices of the mapped file.
+        Copy the data that must outlive the reader.
+
+    Args:
+        file_name (str): The pcap file. pcapng is not supported.
+        ports (list): Keep only the segments from or to these ports.
+                      Defaults to None, all ports.
+        hosts (list): Keep only the segments from or to these IPv4 or IPv6
+                      addresses (str or packed bytes). Defaults to None, all
+                      hosts.
+
+    Attributes:
+        linktype (int): Link-layer header type of the capture.
+        snaplen (int): Maximum captured length of a packet.
+        nanosecond (bool): Time stamps have nanosecond resolution.
+        size (int): File size in bytes.
+    """
+
+    def __init__(self, file_name, ports=None, hosts=None):
+        self.file_name = file_name
+        self.ports = frozenset(ports) if ports is not None else None
+        self.hosts = frozenset(_packed(host) for host in hosts) if hosts is not None else None
+        with open(file_name, 'rb') as f:
+            self.size = f.seek(0, 2)
+            if self.size < _HEADER_SIZE:
+                raise ValueError('{} is not a pcap file.'.format(file_name))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        try:
+            byte_order, self._units = _MAGIC[bytes(self._view[:4])]
+        except KeyError:
+            self.close()
+            raise ValueError('{} is not a pcap file.'.format(file_name))
+        self.nanosecond = self._units == 1000000000
+        self._record = struct.Struct(byte_order + 'IIII')
+        _, _, _, _, self.snaplen, self.linktype = struct.unpack_from(
+            byte_order + 'HHiIII', self._view, 4)
+
+    @property
+    def buffer(self):
+        """The mapped file as a memoryview."""
+        return self._view
+
+    def split(self, chunk_size):
+        """Splits the packet records into chunks of about chunk_size bytes.
+
+        The first record at or after every chunk_size bytes is found by
+        checking that the record headers from a candidate offset chain up
+        consistently, so the file is not walked.
+
+        Returns:
+            list: (start, stop) file offsets of the chunks, for records() and
+                  segments().
+        """
+        end = len(self._view)
+        chunks = []
+        start = _HEADER_SIZE
+        while start < end:
+            ts_start = self._record.unpack_from(self._view, start)[0]
+            stop = self._next_record(start + max(chunk_size, 1), ts_start)
+            chunks.append((start, stop))
+            start = stop
+        return chunks
+
+    def record_at(self, offset, start=None):
+        """Returns the file offset of the record holding the byte at offset,
+        walking the records from the one at start (the first record of the
+        file by default). None if offset is before start or past the last
+        record.
+        """
+        unpack_from = self._record.unpack_from
+        record = _HEADER_SIZE if start is None else start
+        end = len(self._view)
+        while record <= offset and record + _RECORD_SIZE <= end:
+            following = record + _RECORD_SIZE + unpack_from(self._view, record)[2]
+            if offset < following:
+                return record
+            record = following
+        return None
+
+    def _next_record(self, offset, ts_start, chain=8):
+        # The first offset from offset on where chain record headers (or the
+        # ones up to the end of the file) are consistent: valid lengths and
+        # fractions of second, time stamps not before ts_start (the second of
+        # an earlier record) and that do not go back by more than a second or
+        # forward by more than an hour from one record to the next
+        unpack_from = self._record.unpack_from
+        end = len(self._view)
+        snaplen = self.snaplen or 0xFFFFFFFF
+        for candidate in range(offset, end - _RECORD_SIZE + 1):
+            record = candidate
+            ts_prev = None
+            for _ in range(chain):
+                if record == end:
+                    return candidate
+                if record + _RECORD_SIZE > end:
+                    break
+                ts_sec, ts_frac, incl_len, orig_len = unpack_from(self._view, record)
+                if (ts_frac >= self._units or incl_len > snaplen or incl_len > orig_len
+                        or ts_sec < ts_start
+                        or ts_prev is not None and not -1 <= ts_sec - ts_prev <= 3600):
+                    break
+                ts_prev = ts_sec
+                record += _RECORD_SIZE + incl_len
+                if record > end:
+                    break
+            else:
+                return candidate
+        return end
+
+    def records(self, start=None, stop=None):
+        """Yields (time_ns, data) of every packet, where time_ns is the
+        capture time in integer nanoseconds and data the captured bytes as a
+        memoryview. A truncated last record is ignored.
+
+        Args:
+            start (int): File offset of the first record, see split().
+                         Defaults to the first record of the file.
+            stop (int): Records starting at or after this file offset are
+                        left out. Defaults to the end of the file.
+        """
+        view = self._view
+        unpack_from = self._record.unpack_from
+        scale = 1000000000 // self._units
+        offset = _HEADER_SIZE if start is None else start
+        end = len(view)
+        if stop is None:
+            stop = end
+        while offset < stop and offset + _RECORD_SIZE <= end:
+            ts_sec, ts_frac, incl_len, _ = unpack_from(view, offset)
+            offset += _RECORD_SIZE
+            if offset + incl_len > end:
+                break
+            yield ts_sec * 1000000000 + ts_frac * scale, view[offset:offset + incl_len]
+            offset += incl_len
+
+    def segments(self, start=None, stop=None):
+        """Yields a Segment for every TCP segment and UDP datagram, including
+        TCP segments without payload (SYN, FIN, ACK), that passes the
+        port/host filter. Other packets, IP fragments and headers that fail
+        to decode are skipped. start and stop are passed to records().
+        """
+        decode = _fixed_decoder(self.linktype, self.ports, self.hosts)
+        if decode is None:
+            decode = _segment_decoder(self.linktype, self.ports, self.hosts)
+        for time_ns, data in self.records(start, stop):
+            try:
+                segment = decode(time_ns, data)
+            except Exception:
+                continue
+            if segment is not None:
+                yield segment
+
+    def payloads(self):
+        """Yields the TCP or UDP payload of every packet as a memoryview,
+        whatever the flow.
+        """
+        for segment in self.segments():
+            if segment.payload:
+                yield segment.payload
+
+    def close(self):
+        """Unmaps the file. If slices of it are still in use, it is unmapped
+        when the last one is released instead.
+        """
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return "<PcapReader |file_name={!r}, size={}, linktype={}>".format(
+            self.file_name, self.size, self.linktype)
+
+
+class Segment(object):
+    """A TCP segment or UDP datagram.
+
+    Attributes:
+        time_ns (int): Capture time in integer nanoseconds.
+        src (bytes): Source IPv4 or IPv6 address.
+        sport (int): Source port.
+        dst (bytes): Destination IPv4 or IPv6 address.
+        dport (int): Destination port.
+        proto (int): PROTO_TCP or PROTO_UDP.
+        seq (int): TCP sequence number, None for UDP.
+        flags (int): TCP flags (FIN 0x01, SYN 0x02, RST 0x04, ...), 0 for UDP.
+        payload (memoryview): The payload.
+    """
+    __slots__ = ('time_ns', 'src', 'sport', 'dst', 'dport', 'proto', 'seq',
+                 'flags', 'payload')
+
+    def __init__(self, time_ns, src, sport, dst, dport, proto, seq, flags, payload):
+        self.time_ns = time_ns
+        self.src = src
+        self.sport = sport
+        self.dst = dst
+        self.dport = dport
+        self.proto = proto
+        self.seq = seq
+        self.flags = flags
+        self.payload = payload
+
+    @property
+    def key(self):
+        """The 5-tuple of the flow (one direction of a connection)."""
+        return (self.src, self.sport, self.dst, self.dport, self.proto)
+
+    def __repr__(self):
+        return "<Segment |key={!r}, seq={!r}, flags={!r}, size={}>".format(
+            self.key, self.seq, self.flags, len(self.payload))
+
+
+def _packed(host):
+    if isinstance(host, bytes):
+        return host
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    return socket.inet_pton(family, host)
+
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86DD
+_ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+_IPV6_EXTENSIONS = (0, 43, 60)  # Hop-by-hop, routing and destination options
+_U16 = struct.Struct('>H')
+_TCP = struct.Struct('>HHI')
+
+
+def _fixed_decoder(linktype, ports, hosts):
+    # Returns a function that returns the Segment of a packet, or None, for
+    # the link-layer types with fixed header offsets. None for other types.
+    if linktype == LINKTYPE_ETHERNET:
+        def link(data):
+            ether_type = (data[12] << 8) | data[13]
+            offset = 14
+            while ether_type in _ETHERTYPE_VLAN:
+                ether_type = (data[offset + 2] << 8) | data[offset + 3]
+                offset += 4
+            return ether_type, offset
+    elif linktype == LINKTYPE_LINUX_SLL:
+        def link(data):
+            return (data[14] << 8) | data[15], 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        def link(data):
+            return (data[0] << 8) | data[1], 20
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        def link(data):
+            return _ETHERTYPE_IPV6 if data[0] >> 4 == 6 else _ETHERTYPE_IPV4, 0
+    else:
+        return None
+    u16 = _U16.unpack_from
+    tcp = _TCP.unpack_from
+
+    def decode(time_ns, data):
+        ether_type, offset = link(data)
+        if ether_type == _ETHERTYPE_IPV4:
+            if u16(data, offset + 6)[0] & 0x3FFF:  # Fragment
+                return None
+            proto = data[offset + 9]
+            end = min(offset + u16(data, offset + 2)[0], len(data))  # Without padding
+            src_at = offset + 12
+            addr_size = 4
+            offset += (data[offset] & 0x0F) * 4
+        elif ether_type == _ETHERTYPE_IPV6:
+            proto = data[offset + 6]
+            end = min(offset + 40 + u16(data, offset + 4)[0], len(data))
+            src_at = offset + 8
+            addr_size = 16
+            offset += 40
+            while proto in _IPV6_EXTENSIONS:
+                proto = data[offset]
+                offset += (data[offset + 1] + 1) * 8
+        else:
+            return None
+        if proto == PROTO_TCP:
+            sport, dport, seq = tcp(data, offset)
+            flags = data[offset + 13] & 0x3F
+            header_size = (data[offset + 12] >> 4) * 4
+        elif proto == PROTO_UDP:
+            sport, dport = tcp(data, offset)[:2]
+            seq = None
+            flags = 0
+            header_size = 8
+        else:
+            return None
+        if ports is not None and sport not in ports and dport not in ports:
+            return None
+        src = data[src_at:src_at + addr_size].tobytes()
+        dst = data[src_at + addr_size:src_at + 2 * addr_size].tobytes()
+        if hosts is not None and src not in hosts and dst not in hosts:
+            return None
+        return Segment(time_ns, src, sport, dst, dport, proto, seq, flags,
+                       data[offset + header_size:end])
+    return decode
+
+
+def _segment_decoder(linktype, ports=None, hosts=None):
+    # Returns a function that returns the Segment of a packet, or None, using
+    # the KaitaiStruct classes
+    from kaitaistruct import KaitaiStream, BytesIO
+    from .pcap.ipv4_packet import Ipv4Packet
+    from .pcap.ipv6_packet import Ipv6Packet
+    from .pcap.tcp_segment import TcpSegment
+    from .pcap.udp_datagram import UdpDatagram
+    if linktype == LINKTYPE_ETHERNET:
+        from .pcap.ethernet_frame import EthernetFrame as link
+    elif linktype == LINKTYPE_LINUX_SLL:
+        from .pcap.linux_sll import LinuxSll as link
+    elif linktype == LINKTYPE_PPI:
+        from .pcap.packet_ppi import PacketPpi as link
+    else:
+        raise ValueError('Unsupported link-layer header type {}.'.format(linktype))
+
+    def decode(time_ns, data):
+        layer = link(KaitaiStream(BytesIO(data.tobytes())))
+        src = dst = None
+        while not isinstance(layer, (TcpSegment, UdpDatagram)):
+            if isinstance(layer, Ipv4Packet):
+                src, dst = layer.src_ip_addr, layer.dst_ip_addr
+            elif isinstance(layer, Ipv6Packet):
+                src, dst = layer.src_ipv6_addr, layer.dst_ipv6_addr
+            body = getattr(layer, 'body', None)
+            if body is None:
+                body = getattr(layer, 'next_header', None)  # Ipv6Packet
+            if body is None or isinstance(body, bytes):
+                return None
+            layer = body
+        if ports is not None and layer.src_port not in ports and layer.dst_port not in ports:
+            return None
+        if hosts is not None and src not in hosts and dst not in hosts:
+            return None
+        if isinstance(layer, TcpSegment):
+            return Segment(time_ns, src, layer.src_port, dst, layer.dst_port,
+                           PROTO_TCP, layer.seq_num, layer.b13 & 0x3F, memoryview(layer.body))
+        return Segment(time_ns, src, layer.src_port, dst, layer.dst_port,
+                       PROTO_UDP, None, 0, memoryview(layer.body))
+    return decode
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Vectorized phasor conversions for batches.
+
+The functions take NumPy arrays of any shape, typically (N, phnmr) columns of
+a StationBatch, and work element-wise. Angles are in radians unless stated
+otherwise.
+"""
+import numpy as np
+
+
+def rect_to_polar(real, imaginary):
+    """Returns (magnitude, angle) of rectangular phasors."""
+    return np.hypot(real, imaginary), np.arctan2(imaginary, real)
+
+
+def polar_to_rect(magnitude, angle):
+    """Returns (real, imaginary) of polar phasors."""
+    return magnitude * np.cos(angle), magnitude * np.sin(angle)
+
+
+def to_complex(a, b, polar=False):
+    """Returns complex phasors from (real, imaginary), or from (magnitude,
+    angle) if polar.
+    """
+    if polar:
+        a, b = polar_to_rect(a, b)
+    z = np.empty(np.broadcast(a, b).shape, dtype=np.complex128)
+    z.real = a
+    z.imag = b
+    return z
+
+
+def degrees(angle):
+    """Converts angles from radians to degrees."""
+    return np.degrees(angle)
+
+
+def radians(angle):
+    """Converts angles from degrees to radians."""
+    return np.radians(angle)
+
+
+def wrap_angle(angle):
+    """Wraps angles in radians to [-pi, pi)."""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def scale_phasors(a, b, polar, factors, angle_offsets=None):
+    """Converts raw phasor components to engineering units.
+
+    Magnitudes (or both rectangular components) are multiplied by the
+    conversion factors of PHUNIT (CFG-2) or PHSCALE (CFG-3), and phasors are
+    rotated by the PHSCALE angle offsets.
+
+    Args:
+        a (numpy.ndarray): (N, phnmr) raw real parts or magnitudes.
+        b (numpy.ndarray): (N, phnmr) raw imaginary parts or angles in
+                           radians.
+        polar (bool): a and b are magnitudes and angles.
+        factors (list): phnmr conversion factors.
+        angle_offsets (list): phnmr angle offsets in radians. Defaults to
+                              None, no rotation.
+
+    Returns:
+        tuple: The scaled (a, b), in the same coordinate system.
+    """
+    factors = np.asarray(factors, dtype=np.float64)
+    a = a * factors
+    if polar:
+        b = np.asarray(b, dtype=np.float64)
+        if angle_offsets is not None and np.any(angle_offsets):
+            b = b + np.asarray(angle_offsets, dtype=np.float64)
+        return a, b
+    b = b * factors
+    if angle_offsets is not None and np.any(angle_offsets):
+        offsets = np.asarray(angle_offsets, dtype=np.float64)
+        cos, sin = np.cos(offsets), np.sin(offsets)
+        a, b = a * cos - b * sin, a * sin + b * cos
+    return a, b
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Bad messages dropped by the parser.
+
+Messages that cannot be decoded (wrong CHK, invalid SYNC or FRAMESIZE,
+decoding errors, data messages without a matching configuration) are kept in
+a bounded Quarantine with the reason and IDCODE, and counted per IDCODE. The
+counters are plain integer increments on the error path only, so they are
+always on.
+"""
+from collections import deque
+
+CRC = 'crc'  # CHK does not match
+SYNC = 'sync'  # Invalid SYNC word or FRAMESIZE
+LENGTH = 'length'  # FRAMESIZE does not match the configuration
+UNKNOWN_CFG = 'unknown_cfg'  # No configuration for the IDCODE
+MALFORMED = 'malformed'  # The message failed to decode
+REASONS = (CRC, SYNC, LENGTH, UNKNOWN_CFG, MALFORMED)
+
+
+class Quarantine(object):
+    """The last maxlen bad messages and per-IDCODE counters of all of them.
+
+    Example:
+        my_parser = Parser(tolerant=True)
+        msgs = my_parser.parse(raw_bytes)
+        for bad in my_parser.quarantine.frames:
+            print(bad.idcode, bad.reason, len(bad.raw))
+        my_parser.quarantine.counters[7].crc  # CHK errors of IDCODE 7
+
+    Args:
+        maxlen (int): Number of bad messages kept. The oldest one is dropped
+                      when a new one arrives. Defaults to 1000.
+
+    Attributes:
+        frames (collections.deque): QuarantinedFrame objects, oldest first.
+        counters (dict): StreamCounters by IDCODE. Bytes that do not start
+                         with a valid header are counted under None.
+    """
+
+    def __init__(self, maxlen=1000):
+        self.frames = deque(maxlen=maxlen)
+        self.counters = {}
+
+    def add(self, raw, reason, idcode=None):
+        """Quarantines the bad message raw (bytes) and counts it."""
+        self.frames.append(QuarantinedFrame(raw, reason, idcode))
+        counters = self.counters.get(idcode)
+        if counters is None:
+            counters = self.counters[idcode] = StreamCounters()
+        setattr(counters, reason, getattr(counters, reason) + 1)
+
+    def total(self, reason=None):
+        """Returns the number of bad messages of every IDCODE, for one reason
+        or all of them.
+        """
+        return sum(counters.total(reason) for counters in self.counters.values())
+
+    def merge(self, other):
+        """Adds the bad messages and counters of another Quarantine, e.g. one
+        of a worker process.
+        """
+        self.frames.extend(other.frames)
+        for idcode, counters in other.counters.items():
+            mine = self.counters.get(idcode)
+            if mine is None:
+                mine = self.counters[idcode] = StreamCounters()
+            for reason in REASONS:
+                setattr(mine, reason, getattr(mine, reason) + getattr(counters, reason))
+
+    def clear(self):
+        """Forgets the quarantined messages. The counters are kept."""
+        self.frames.clear()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __repr__(self):
+        return "<Quarantine |frames={}, counters={!r}>".format(
+            len(self.frames), self.counters)
+
+
+class QuarantinedFrame(object):
+    """A bad message.
+
+    Attributes:
+        raw (bytes): The message, or the bytes skipped to resynchronise.
+        reason (str): One of REASONS.
+        idcode (int): IDCODE read from the header, None if there is none.
+    """
+    __slots__ = ('raw', 'reason', 'idcode')
+
+    def __init__(self, raw, reason, idcode):
+        self.raw = raw
+        self.reason = reason
+        self.idcode = idcode
+
+    def __repr__(self):
+        return "<QuarantinedFrame |idcode={!r}, reason={!r}, size={}>".format(
+            self.idcode, self.reason, len(self.raw))
+
+
+class StreamCounters(object):
+    """Bad messages of one IDCODE, by reason."""
+    __slots__ = REASONS
+
+    def __init__(self):
+        for reason in REASONS:
+            setattr(self, reason, 0)
+
+    def total(self, reason=None):
+        if reason is not None:
+            return getattr(self, reason)
+        return sum(getattr(self, reason) for reason in REASONS)
+
+    def __repr__(self):
+        return "<StreamCounters |" + ", ".join(
+            "{}={}".format(reason, getattr(self, reason)) for reason in REASONS) + ">"
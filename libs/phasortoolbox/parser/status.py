@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Compact STAT and digital status words.
+
+StatWord and DigitalWord keep the raw 16-bit value and compute the enum and
+flag views on access from lookup tables: the STAT tables are built once per
+process from the enums below, the digital labels once per configuration
+(MiniCfg.Station.digital_labels).
+
+The STAT enums are also exposed as Data.PmuData.Stat.<Name>Enum.
+"""
+import operator
+from enum import Enum
+
+
+class PmuTimeQualityEnum(Enum):
+    not_used = 0
+    estimated_maximum_time_error_less_than_100_nanosecond = 1
+    estimated_maximum_time_error_less_than_1_microsecond = 2
+    estimated_maximum_time_error_less_than_10_microsecond = 3
+    estimated_maximum_time_error_less_than_100_microsecond = 4
+    estimated_maximum_time_error_less_than_1_ms = 5
+    estimated_maximum_time_error_less_than_10_ms = 6
+    estimated_maximum_time_error_larger_than_10_ms_or_time_error_unknown = 7
+
+class TriggerReasonEnum(Enum):
+    manual = 0
+    magnitude_low = 1
+    magnitude_high = 2
+    phase_angle_diff = 3
+    frequency_high_or_low = 4
+    df_or_dt_high = 5
+    reserved = 6
+    digital = 7
+    user_def_8 = 8
+    user_def_9 = 9
+    user_def_10 = 10
+    user_def_11 = 11
+    user_def_12 = 12
+    user_def_13 = 13
+    user_def_14 = 14
+    user_def_15 = 15
+
+class PmuTriggerDetectedEnum(Enum):
+    no_trigger = 0
+    trigger_detected = 1
+
+class ConfigurationChangeEnum(Enum):
+    change_effected = 0
+    will_change_in_one_min = 1
+
+class DataModifiedEnum(Enum):
+    not_modified = 0
+    data_modified_by_post_processing = 1
+
+class PmuSyncEnum(Enum):
+    in_sync_with_a_utc_traceable_time_source = 0
+    not_in_sync_with_a_utc_traceable_time_source = 1
+
+class DataSortingEnum(Enum):
+    by_time_stamp = 0
+    by_arrival = 1
+
+class DataErrorEnum(Enum):
+    good_measurement_data_no_errors = 0
+    pmu_error_no_information_about_data_do_not_use = 1
+    pmu_in_test_mode_or_absent_data_tags_have_been_insereted_do_not_use = 2
+    pmu_error_do_not_use = 3
+
+class UnlockedTimeEnum(Enum):
+    sync_locked_or_unlocked_less_than_10_s_best_quality = 0
+    unlocked_time_less_than_100_s_larger_than_10_s = 1
+    unlocked_time_less_than_1000_s_larger_than_100_s = 2
+    unlocked_time_larger_than_1000_s = 3
+
+
+# (name, shift, mask, enum) of every STAT field, most significant bits first.
+_STAT_FIELDS = (
+    ('data_error', 14, 0x3, DataErrorEnum),
+    ('pmu_sync', 13, 0x1, PmuSyncEnum),
+    ('data_sorting', 12, 0x1, DataSortingEnum),
+    ('pmu_trigger_detected', 11, 0x1, PmuTriggerDetectedEnum),
+    ('configuration_change', 10, 0x1, ConfigurationChangeEnum),
+    ('data_modified', 9, 0x1, DataModifiedEnum),
+    ('pmu_time_quality', 6, 0x7, PmuTimeQualityEnum),
+    ('unlocked_time', 4, 0x3, UnlockedTimeEnum),
+    ('trigger_reason', 0, 0xF, TriggerReasonEnum),
+)
+_STAT_TABLES = dict(
+    (name, (shift, mask, tuple(enum(v) for v in range(mask + 1))))
+    for name, shift, mask, enum in _STAT_FIELDS)
+
+
+def _stat_field(name):
+    shift, mask, table = _STAT_TABLES[name]
+
+    def fget(self):
+        return table[(self >> shift) & mask]
+    return property(fget)
+
+
+class StatWord(int):
+    """STAT word of one station in a data frame.
+
+    It is the raw 16-bit value (an int) with the STAT fields as enum
+    properties, e.g. stat.configuration_change.name.
+    """
+    __slots__ = ()
+
+    data_error = _stat_field('data_error')
+    pmu_sync = _stat_field('pmu_sync')
+    data_sorting = _stat_field('data_sorting')
+    pmu_trigger_detected = _stat_field('pmu_trigger_detected')
+    configuration_change = _stat_field('configuration_change')
+    data_modified = _stat_field('data_modified')
+    pmu_time_quality = _stat_field('pmu_time_quality')
+    unlocked_time = _stat_field('unlocked_time')
+    trigger_reason = _stat_field('trigger_reason')
+
+    def __repr__(self):
+        return "<StatWord |value=0x{:04X}>".format(int(self))
+
+    def show(self, parent_path):
+        for name in sorted(_STAT_TABLES):
+            getattr(self, name).show(parent_path + '.' + name)
+
+
+class DigitalWord(object):
+    """One 16-bit digital status word.
+
+    Indexing returns a Flag view of one bit. Flag j is bit 15 - j, matching the
+    order of the channel names in the configuration message.
+
+    Args:
+        value (int): The raw digital status word.
+        labels (tuple): 16 (name, normal_status, current_valid_inputs) tuples
+                        shared by all frames of one configuration.
+    """
+    __slots__ = ('value', '_labels')
+
+    def __init__(self, value, labels):
+        self.value = value
+        self._labels = labels
+
+    def __len__(self):
+        return 16
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return [self[i] for i in range(16)[j]]
+        if j < 0:
+            j += 16
+        if not 0 <= j < 16:
+            raise IndexError('digital word index out of range')
+        name, normal_status, current_valid_inputs = self._labels[j]
+        return Flag(name, normal_status, current_valid_inputs,
+                    '1' if self.value >> (15 - j) & 1 else '0')
+
+    def __int__(self):
+        return self.value
+
+    __index__ = __int__
+
+    def __eq__(self, other):
+        if isinstance(other, DigitalWord):
+            return self.value == other.value
+        try:
+            return self.value == operator.index(other)
+        except TypeError:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return "<DigitalWord |value=0x{:04X}>".format(self.value)
+
+    def show(self, parent_path):
+        for j in range(16):
+            self[j].show('{}[{}]'.format(parent_path, j))
+
+
+class Flag(object):
+    """View of one bit of a DigitalWord."""
+    __slots__ = ('name', 'normal_status', 'current_valid_inputs', 'value')
+
+    def __init__(self, name, normal_status, current_valid_inputs, value):
+        self.name = name
+        self.normal_status = normal_status
+        self.current_valid_inputs = current_valid_inputs
+        self.value = value
+
+    def __repr__(self):
+        return "<Flag |name={!r}, value={!r}>".format(self.name, self.value)
+
+    def show(self, parent_path):
+        for item in ('current_valid_inputs', 'name', 'normal_status', 'value'):
+            print(parent_path + '.' + item + ' == ' + repr(getattr(self, item)))
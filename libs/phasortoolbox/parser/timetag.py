@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Exact time tags of synchrophasor messages.
+
+The time tag is SOC + FRACSEC / TIME_BASE seconds. As a float it cannot hold
+nanoseconds near the current epoch, so time_ns() computes it with integer
+arithmetic, rounded to the nearest nanosecond. The same expression works on
+NumPy int64 arrays, which is how batches are converted.
+"""
+NS_PER_S = 1000000000
+
+
+def time_ns(soc, fraction, time_base):
+    """Returns the time tag in integer nanoseconds since the epoch.
+
+    Args:
+        soc (int or numpy.ndarray): SOC.
+        fraction (int or numpy.ndarray): FRACSEC without the time flags.
+        time_base (int): TIME_BASE of the configuration.
+    """
+    return soc * NS_PER_S + (fraction * NS_PER_S + time_base // 2) // time_base
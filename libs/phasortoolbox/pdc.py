@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 
-import gc
 import time
 import bisect
 import asyncio
 from collections import defaultdict
-from concurrent.futures import Executor, ThreadPoolExecutor
 from phasortoolbox import Synchrophasor
+from phasortoolbox.gcpolicy import GCPolicy
+from phasortoolbox.offload import ParsePool
+from phasortoolbox.queues import BLOCK, coro_consume
 import logging
 
 LOG=logging.getLogger('phasortoolbox.pdc')
@@ -20,17 +21,37 @@ my_pdc = PDC()
 
 This class aligns in coming synchrophasor messages using time tags.
 
+With process_pool=True (or a ParsePool, to share one with the clients), the
+callback runs in a worker process with the data messages decoded there. It
+must be picklable, e.g. a function defined at module level, and its return
+values are passed to on_result() in the event loop, in order. The sets
+aligned in one iteration of the event loop are sent in one task. While the
+pool is full, the TCP connections of the clients are not read, and sets
+aligned from UDP streams are dropped and counted in ParsePool.dropped.
+
+With a callback_queue (queues.BoundedQueue), the callback is called, and
+awaited if it is a coroutine function, by a task of its own, so a slow
+callback does not delay the alignment. A full 'block' queue stops reading
+the TCP connections of the clients; with UDP clients, sets are dropped.
+
 
     """
-    def __init__(self, callback=None, clients=[], time_out=0.1, history=1, return_on_time_out=False, process_pool=False):
+    def __init__(self, callback=None, clients=[], time_out=0.1, history=1, return_on_time_out=False, process_pool=False, gc_policy=None, on_result=None, callback_queue=None):
         if callback is not None:
             self.callback = callback
+        if on_result is not None:
+            self.on_result = on_result
         self.clients = clients
         self.receive_counter = 0
         self.time_out = time_out
         self.history = history
         self.return_on_time_out = return_on_time_out
         self.process_pool = process_pool
+        self._pool = None
+        self._batch = []  # Aligned sets not sent to the pool yet
+        self.callback_queue = callback_queue
+        self._tasks = []
+        self.gc_policy = gc_policy if gc_policy is not None else GCPolicy()  # Applied once per aligned set, instead of by the clients
 
     def callback(self, buf_sync):
         """
@@ -38,8 +59,15 @@ This class aligns in coming synchrophasor messages using time tags.
         """
         pass
 
-    def run(self, c=0, loop=None, executor=None):
-        self.set_loop(loop, executor)
+    def on_result(self, result):
+        """
+        Called with the return value of callback() when it runs in a worker
+        process (process_pool)
+        """
+        pass
+
+    def run(self, c=0, loop=None):
+        self.set_loop(loop)
         self.loop.create_task(self.coro_run(c))
         try:
             self.loop.run_forever()
@@ -60,8 +88,13 @@ This class aligns in coming synchrophasor messages using time tags.
             
         self._buf = _Buffer(idcode_list, self._synchrophasors_created, self.time_out, self.history, self.return_on_time_out)
         self._buf_task = asyncio.ensure_future(self._buf.coro_check_timeout())
+        self.gc_policy.start()
+        if self.process_pool:
+            self._pool = self.process_pool if isinstance(self.process_pool, ParsePool) else ParsePool()
+        if self.callback_queue is not None:
+            self._tasks.append(asyncio.ensure_future(coro_consume(self.callback_queue, self.callback)))
         for client in self.clients:
-            client._add_pdc(id(self), self._buf.add_msg, self.loop, self.executor)
+            client._add_pdc(id(self), self._buf.add_msg, self.loop, self._pool is not None)
             asyncio.ensure_future(client.coro_run())
 
     async def coro_close(self):
@@ -70,22 +103,42 @@ This class aligns in coming synchrophasor messages using time tags.
         for client in self.clients:
             await client.coro_close()
             client._remove_pdc(id(self))
+        if self.callback_queue is not None:
+            await self.callback_queue.coro_join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._pool is not None:
+            self._offload()
+            await self._pool.coro_drain()
+            if self._pool is not self.process_pool:
+                self._pool.close()
+            self._pool = None
+        self.gc_policy.stop()
 
     def checkreceive_counter(self):
         LOG.warning(str(self.receive_counter)+' synchrophasors created.')
+        if self.callback_queue is not None:
+            LOG.warning('callback_queue: {!r}.'.format(self.callback_queue))
         for client in self.clients:
             client.checkreceive_counter()
 
     def _synchrophasors_created(self, synchrophasors):
         self.receive_counter += 1
-        if self.process_pool:
-            future = self.executor.submit(self.callback, synchrophasors)
-            if future.exception():
-                raise future.exception()
+        if self._pool is not None:
+            if not self._batch:
+                self.loop.call_soon(self._offload)
+            self._batch.append(synchrophasors)
+        elif self.callback_queue is not None:
+            queue = self.callback_queue
+            if queue.put(synchrophasors, all(client.mode == 'TCP' for client in self.clients)):
+                if queue.full and queue.policy == BLOCK:
+                    if any([client._pause_reading(queue) for client in self.clients]):
+                        queue.paused += 1
         else:
             self.callback(synchrophasors)
 
-        gc.collect()
+        self.gc_policy.tick()
         if self.c == 0:
             return
         elif self.c > 1:
@@ -94,9 +147,21 @@ This class aligns in coming synchrophasor messages using time tags.
         elif self.c == 1:
             self.loop.stop()
 
-    def set_loop(self, loop=None, executor=None):
+    def _offload(self):
+        batch, self._batch = self._batch, []
+        pool = self._pool
+        if pool is None or not batch:
+            return
+        if pool.full:
+            pool.dropped += len(batch)
+            return
+        pool.align(self.callback, batch, self.on_result, self.loop)
+        if pool.full:
+            for client in self.clients:
+                client._pause_reading(pool)
+
+    def set_loop(self, loop=None):
         self.loop = loop if loop is not None else asyncio.new_event_loop()
-        self.executor = executor if executor is not None else ThreadPoolExecutor()
 
 
 
@@ -118,8 +183,13 @@ class _Buffer(object):
         self._ready_to_send = []
         self._ready_to_send_s = set()
         self._last_sent_time_tag = None
+        self.late_counter = 0
 
     def add_msg(self, msg):
+        # Only the header is needed here; lazy messages are not decoded.
+        if self._last_sent_time_tag is not None and msg.time <= self._last_sent_time_tag:
+            self.late_counter += 1  # Arrived after its time tag was sent
+            return
         if msg.time not in self._arr_times:
             bisect.insort(self._sorted_time_tags, msg.time)
         self._data[msg.time][msg.idcode] = msg
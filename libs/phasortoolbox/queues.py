@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Bounded queues between the stages of a Client or PDC.
+
+Without queues, received bytes are parsed and every callback is called
+inside data_received(), so a slow consumer stalls the socket read and data
+piles up in kernel buffers unseen. A BoundedQueue decouples two stages: the
+producer puts items without waiting and a task of the consumer awaits them.
+When the queue holds maxsize items, its policy decides what happens:
+
+    'block'        The item is accepted and the producer stops reading its
+                   TCP connection until the queue is down to half, so the
+                   sender is slowed down by TCP flow control. The messages
+                   of a read already received are still queued, so the queue
+                   can exceed maxsize by one read (at most 256 KiB). Producers
+                   that cannot pause (datagrams) drop the item instead.
+    'drop_oldest'  The oldest item is dropped: consumers get the most recent
+                   data.
+    'drop_newest'  The new item is dropped.
+    'coalesce'     An item replaces the queued one with the same key (by
+                   default the IDCODE of a message), which moves to the
+                   back. A new key drops the oldest item when the queue is
+                   full. Consumers get the latest value of every data stream.
+
+Items for which protect(item) is true are never dropped: the oldest
+unprotected item is dropped instead, or the queue grows past maxsize. A
+Client protects the reads holding configuration messages this way, since
+the data messages after them cannot be decoded without them.
+
+The depth and every drop are counted, so overload shows up in the counters
+instead of as latency.
+"""
+import asyncio
+from collections import deque, OrderedDict
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+COALESCE = 'coalesce'
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+def _idcode(item):
+    return getattr(item, 'idcode', None)
+
+
+class BoundedQueue(object):
+    """A FIFO queue with a bound and an overflow policy, for one consumer
+    task.
+
+    Example:
+        async def publish(msg):  # A coroutine callback is awaited
+            await redis_client.xadd(STREAM_KEY, to_fields(msg))
+
+        queue = BoundedQueue(1000, 'drop_oldest')
+        pmu_client = Client(idcode=1, remote_ip='10.0.0.1', remote_port=4712,
+                            callback=publish, callback_queue=queue)
+        ...
+        print(queue.depth, queue.max_depth, queue.dropped)
+
+    Args:
+        maxsize (int): Number of items above which the policy applies.
+                       Defaults to 1000.
+        policy (str): One of POLICIES. Defaults to 'block'.
+        key (function): Returns the key of an item for 'coalesce'. Defaults
+                        to its idcode attribute, None for items without one.
+        protect (function): Returns True for items that must not be dropped.
+                            Defaults to None, every item can be dropped.
+
+    Attributes:
+        received (int): Items put.
+        delivered (int): Items taken by the consumer.
+        dropped (int): Items dropped by the policy.
+        coalesced (int): Items replaced by a newer one with the same key.
+        max_depth (int): Largest number of items queued at once.
+        paused (int): Times a producer stopped reading because of this queue.
+    """
+
+    def __init__(self, maxsize=1000, policy=BLOCK, key=None, protect=None):
+        if policy not in POLICIES:
+            raise ValueError('Unknown queue policy {!r}. Options are: {}.'.format(policy, ', '.join(POLICIES)))
+        self.maxsize = max(int(maxsize), 1)
+        self.policy = policy
+        self.key = key if key is not None else _idcode
+        self.protect = protect
+        self._items = OrderedDict() if policy == COALESCE else deque()
+        self._getter = None  # Future of the consumer waiting for an item
+        self._unfinished = 0  # Items put and not marked done
+        self._joiners = []
+        self._ready = []  # Called once when the queue is down to half
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.paused = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def depth(self):
+        """Number of items queued."""
+        return len(self._items)
+
+    @property
+    def full(self):
+        """True while maxsize items or more are queued."""
+        return len(self._items) >= self.maxsize
+
+    def put(self, item, wait=True):
+        """Queues item without waiting, as the policy allows. Returns True if
+        it was queued.
+
+        Args:
+            wait (bool): The producer pauses when the queue is full (see
+                         when_ready()). If False, a 'block' queue drops the
+                         item when full.
+        """
+        self.received += 1
+        items = self._items
+        if self.policy == COALESCE:
+            key = self.key(item)
+            if key in items:
+                items[key] = item
+                items.move_to_end(key)
+                self.coalesced += 1
+                return True
+            if len(items) >= self.maxsize:
+                self._drop_oldest()
+            items[key] = item
+        else:
+            if len(items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._drop_oldest()
+                elif ((self.policy == DROP_NEWEST or not wait)
+                      and (self.protect is None or not self.protect(item))):
+                    self.dropped += 1
+                    return False
+            items.append(item)
+        self._unfinished += 1
+        if len(items) > self.max_depth:
+            self.max_depth = len(items)
+        if self._getter is not None and not self._getter.done():
+            self._getter.set_result(None)
+        return True
+
+    async def get(self):
+        """Waits for an item and removes it from the queue. Call task_done()
+        once it has been handled.
+        """
+        while not self._items:
+            self._getter = asyncio.get_event_loop().create_future()
+            try:
+                await self._getter
+            finally:
+                self._getter = None
+        if self.policy == COALESCE:
+            item = self._items.popitem(last=False)[1]
+        else:
+            item = self._items.popleft()
+        self.delivered += 1
+        if self._ready and len(self._items) <= self.maxsize // 2:
+            ready, self._ready = self._ready, []
+            for callback in ready:
+                callback()
+        return item
+
+    def task_done(self):
+        """Marks an item taken by get() as handled."""
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._wake_joiners()
+
+    def when_ready(self, callback):
+        """Calls callback() once, when the queue is down to half of maxsize.
+        """
+        self._ready.append(callback)
+
+    async def coro_join(self):
+        """Waits until every item queued has been handled."""
+        if self._unfinished:
+            joiner = asyncio.get_event_loop().create_future()
+            self._joiners.append(joiner)
+            await joiner
+
+    def _drop_oldest(self):
+        # Drops the oldest queued item that is not protected, if any, for the
+        # one being put: it will never be marked done
+        items = self._items
+        protect = self.protect
+        if self.policy == COALESCE:
+            for key in items:
+                if protect is None or not protect(items[key]):
+                    del items[key]
+                    break
+            else:
+                return
+        elif protect is None or not protect(items[0]):
+            items.popleft()
+        else:
+            for i, item in enumerate(items):
+                if not protect(item):
+                    del items[i]
+                    break
+            else:
+                return
+        self.dropped += 1
+        self._unfinished -= 1
+
+    def _wake_joiners(self):
+        joiners, self._joiners = self._joiners, []
+        for joiner in joiners:
+            if not joiner.done():
+                joiner.set_result(None)
+
+    def __repr__(self):
+        return "<BoundedQueue |policy={!r}, maxsize={}, depth={}, max_depth={}, received={}, delivered={}, dropped={}, coalesced={}, paused={}>".format(
+            self.policy, self.maxsize, self.depth, self.max_depth, self.received,
+            self.delivered, self.dropped, self.coalesced, self.paused)
+
+
+async def coro_consume(queue, handler):
+    """Calls handler(item) for every item of queue, in order, awaiting it if
+    it returns an awaitable. Runs until cancelled. An exception raised by
+    handler is passed to the loop's exception handler and the next item is
+    handled.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        item = await queue.get()
+        try:
+            result = handler(item)
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            loop.call_exception_handler({
+                'message': 'Exception in queue consumer {!r}'.format(handler),
+                'exception': exc})
+        finally:
+            queue.task_done()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Supervised reconnection of a Client's TCP connection.
+
+When the connection to the PMU or PDC is lost (or silent for longer than
+data_timeout), the Client connects again after a delay that grows
+exponentially with every failed attempt, up to a maximum, with random
+jitter so that many clients cut by the same link flap do not retry in step.
+The configuration parsed before the loss is kept, so with the 'auto'
+handshake the client only sends "data on" and decodes the first data
+message received.
+
+Every loss is recorded as an Outage once data flows again, with the time
+data was off: from the last data message before the loss to the first one
+after it.
+"""
+import random
+import time
+from collections import deque
+
+
+class Reconnect(object):
+    """Backoff policy and outage records of a Client.
+
+    Example:
+        reconnect = Reconnect(initial=0.5, maximum=30, data_timeout=5)
+        pmu_client = Client(idcode=1, remote_ip='10.0.0.1', remote_port=4712,
+                            reconnect=reconnect, handshake='auto')
+        ...
+        for outage in reconnect.outages:
+            print(outage.attempts, outage.down, outage.data_off)
+
+    Args:
+        initial (float): Delay before the second attempt, in seconds. The
+                         first attempt is immediate. Defaults to 0.5.
+        maximum (float): Largest delay between attempts. Defaults to 30.
+        factor (float): Growth of the delay per failed attempt. Defaults
+                        to 2.
+        jitter (float): Fraction of the delay drawn at random: the delay is
+                        between (1 - jitter) and 1 times its nominal value.
+                        Defaults to 0.5.
+        attempts (int): Attempts per outage before giving up, None for no
+                        limit. The first connection is included.
+        connect_timeout (float): Seconds an attempt waits for the connection
+                                 to be made, e.g. when a SYN is never
+                                 answered, before the next one. Defaults
+                                 to 5.
+        data_timeout (float): Seconds without data after which a connection
+                              is dropped and made again, e.g. after a link
+                              flap that did not reset it. Defaults to None,
+                              disabled.
+        maxlen (int): Number of outages kept.
+
+    Attributes:
+        outages (collections.deque): Outage records, oldest first.
+        reconnects (int): Connections made again after a loss.
+    """
+
+    def __init__(self, initial=0.5, maximum=30.0, factor=2.0, jitter=0.5,
+                 attempts=None, connect_timeout=5.0, data_timeout=None, maxlen=100):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = attempts
+        self.connect_timeout = connect_timeout
+        self.data_timeout = data_timeout
+        self.outages = deque(maxlen=maxlen)
+        self.reconnects = 0
+
+    def delay(self, attempt):
+        """Seconds to wait before attempt (0 for the first one)."""
+        if attempt <= 0:
+            return 0.0
+        nominal = min(self.maximum, self.initial * self.factor ** (attempt - 1))
+        return nominal * (1.0 - self.jitter * random.random())
+
+    def gave_up(self, attempt):
+        """True if attempt exceeds the attempts allowed."""
+        return self.attempts is not None and attempt >= self.attempts
+
+    def __repr__(self):
+        return "<Reconnect |reconnects={}, outages={}>".format(self.reconnects, len(self.outages))
+
+
+class Outage(object):
+    """One loss of the connection, until data flowed again.
+
+    Attributes:
+        time (float): Unix time of the loss.
+        error (str): Why the connection was lost, None for a clean close.
+        attempts (int): Connection attempts made.
+        handshake (str): Commands sent on the new connection, 'full' (data
+                         off, send configuration 2, data on) or 'fast' (data
+                         on only, the configuration being known).
+        down (float): Seconds from the loss to the new connection.
+        data_off (float): Seconds from the last data message before the loss
+                          to the first one after it.
+    """
+    __slots__ = ('time', 'error', 'attempts', 'handshake', 'down', 'data_off',
+                 '_lost', '_last_data')
+
+    def __init__(self, error=None, last_data=None):
+        self.time = time.time()
+        self.error = error
+        self.attempts = 0
+        self.handshake = None
+        self.down = None
+        self.data_off = None
+        self._lost = time.perf_counter()
+        self._last_data = last_data if last_data is not None else self._lost
+
+    def connected(self, handshake):
+        self.handshake = handshake
+        self.down = time.perf_counter() - self._lost
+
+    def resumed(self, perf_counter):
+        self.data_off = perf_counter - self._last_data
+
+    def __repr__(self):
+        return "<Outage |error={!r}, attempts={}, handshake={!r}, down={}, data_off={}>".format(
+            self.error, self.attempts, self.handshake,
+            None if self.down is None else round(self.down, 6),
+            None if self.data_off is None else round(self.data_off, 6))
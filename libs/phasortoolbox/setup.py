@@ -12,5 +12,6 @@ setup(
     url="https://github.com/sonusz/PhasorToolBox",
     python_requires='>=3.5',
     install_requires=requirements,
+    extras_require={'batch': ['numpy']},
     packages=find_packages(),
     )
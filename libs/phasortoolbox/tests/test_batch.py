@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Batch decoding of data messages against the per-message decoder."""
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.parser.decoder import Projection
+from phasortoolbox.benchmarks.synthetic import FORMATS, StationSpec, cfg2, data
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+IDCODE = 7
+SOC = 1500000001
+
+
+def mixed_specs():
+    return [StationSpec('S{}'.format(i), i + 1, fmt=fmt, float_freq=bool(i & 1),
+                        float_analog=bool(i & 2)) for i, fmt in enumerate(FORMATS)]
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class ParseBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.specs = mixed_specs()
+        rnd = random.Random(0)
+        self.raw_data = [data(IDCODE, self.specs, SOC + i // 60, i % 60 * 1000, rnd) for i in range(100)]
+        self.parser = Parser(cfg2(IDCODE, self.specs))
+
+    def test_columns(self):
+        batch = self.parser.parse_batch(b''.join(self.raw_data))
+        msgs = self.parser.parse(b''.join(self.raw_data))
+        self.assertEqual(len(batch), len(msgs))
+        self.assertEqual(batch.idcode, IDCODE)
+        np.testing.assert_array_equal(batch.soc, [msg.soc for msg in msgs])
+        np.testing.assert_allclose(batch.time, [msg.time for msg in msgs], rtol=0, atol=1e-6)
+        for k, station in enumerate(batch.stations):
+            pmu_data = [msg.data.pmu_data[k] for msg in msgs]
+            np.testing.assert_array_equal(station.stat, [pmu.stat for pmu in pmu_data])
+            np.testing.assert_allclose(station.phasors, [
+                [complex(ph.real, ph.imaginary) for ph in pmu.phasors] for pmu in pmu_data],
+                rtol=1e-6)  # Single precision polar phasors are converted in single precision
+            np.testing.assert_allclose(station.freq, [pmu.freq for pmu in pmu_data], rtol=1e-12)
+            np.testing.assert_allclose(station.dfreq, [pmu.dfreq for pmu in pmu_data], rtol=1e-12)
+            np.testing.assert_allclose(station.analog, [
+                [an.value for an in pmu.analog] for pmu in pmu_data], rtol=1e-12)
+            np.testing.assert_array_equal(station.digital, [list(map(int, pmu.digital)) for pmu in pmu_data])
+
+    def test_projection(self):
+        self.parser.set_projection(IDCODE, Projection(phasors=['PH2'], stat=False, freq=False))
+        batch = self.parser.parse_batch(b''.join(self.raw_data))
+        for station in batch.stations:
+            self.assertEqual(station.phasors.shape, (len(self.raw_data), 1))
+            self.assertEqual([name.strip() for name in station.phasor_names], ['PH2'])
+            self.assertIsNone(station.stat)
+            self.assertIsNone(station.freq)
+            self.assertEqual(station.dfreq.shape, (len(self.raw_data),))
+
+    def test_empty(self):
+        self.assertEqual(len(self.parser.parse_batch(b'', IDCODE)), 0)
+
+    def test_partial_frame(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse_batch(b''.join(self.raw_data)[:-1])
+
+    def test_other_idcode(self):
+        self.parser.parse(cfg2(IDCODE + 1, self.specs))
+        other = data(IDCODE + 1, self.specs, SOC, 0)
+        with self.assertRaises(ValueError):
+            self.parser.parse_batch(self.raw_data[0] + other)
+
+    def test_unknown_idcode(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse_batch(data(IDCODE + 2, self.specs, SOC, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
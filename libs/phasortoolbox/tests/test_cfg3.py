@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Data streams described by CFG-3 messages, whole or in continuation frames."""
+import cmath
+import math
+import random
+import struct
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.benchmarks.synthetic import FORMATS, StationSpec, cfg2, data, message
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+IDCODE = 7
+SOC = 1500000001
+ANGLE_OFFSET = 0.25  # Radians, PHSCALE of every phasor
+ANALOG_OFFSET = 3.5  # ANSCALE of every analog value
+
+
+def name(text):
+    return struct.pack('>B', len(text)) + text.encode()
+
+
+def cfg3_body(specs, time_base=1000000, data_rate=60):
+    # The body of a CFG-3 message after CONT_IDX, with the scale factors
+    # of cfg2() and the offsets above
+    body = [struct.pack('>IH', time_base, len(specs))]
+    for spec in specs:
+        body.append(name(spec.name))
+        body.append(struct.pack('>H16sHHHH', spec.idcode, b'\x00' * 16, spec.format_word,
+                                spec.phasors, spec.analog, spec.digital))
+        body.extend(name('PH{}'.format(i)) for i in range(spec.phasors))
+        body.extend(name('AN{}'.format(i)) for i in range(spec.analog))
+        body.extend(name('D{}'.format(i)) for i in range(16 * spec.digital))
+        body.extend(struct.pack('>HBBff', 0x8000, i % 2 << 3, 0, 1.0, ANGLE_OFFSET)
+                    for i in range(spec.phasors))
+        body.extend(struct.pack('>ff', 100.0, ANALOG_OFFSET) for _ in range(spec.analog))
+        body.extend(struct.pack('>HH', 0, 0xFFFF) for _ in range(spec.digital))
+        body.append(struct.pack('>fffcIIHH', 0.0, 0.0, 0.0, b'M', 0, 0, 0, spec.cfgcnt))
+    body.append(struct.pack('>h', data_rate))
+    return b''.join(body)
+
+
+def cfg3(specs, frames=1):
+    # One CFG-3 message, or frames continuation frames (CONT_IDX 1, 2, ...
+    # and 0xFFFF for the last one)
+    body = cfg3_body(specs)
+    if frames == 1:
+        return [message(0xAA51, IDCODE, SOC, 0, b'\x00\x00' + body)]
+    size = -(-len(body) // frames)
+    cont_idx = list(range(1, frames)) + [0xFFFF]
+    return [message(0xAA51, IDCODE, SOC, 0, struct.pack('>H', i) + body[k * size:(k + 1) * size])
+            for k, i in enumerate(cont_idx)]
+
+
+def specs():
+    return [StationSpec('S{}'.format(i), i + 1, fmt=fmt, digital=1) for i, fmt in enumerate(FORMATS)]
+
+
+def raw_data(frames=20):
+    rnd = random.Random(0)
+    return [data(IDCODE, specs(), SOC, i * 1000, rnd) for i in range(frames)]
+
+
+def data_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'data']
+
+
+def cfg3_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'cfg3']
+
+
+class ContinuationTest(unittest.TestCase):
+
+    def test_entry_points(self):
+        # Only the last frame is returned, with the whole CFG-3 message
+        fragments = cfg3(specs(), frames=3)
+        raw_bytes = b''.join(fragments + raw_data())
+        results = {
+            'parse': lambda parser: parser.parse(raw_bytes),
+            'parse_buffer': lambda parser: parser.parse_buffer(raw_bytes),
+            'frames': lambda parser: [msg for raw_pkt in fragments + raw_data()
+                                      for msg in (parser.feed(raw_pkt) or parser.frames())],
+        }
+        for entry_point, parse in results.items():
+            with self.subTest(entry_point=entry_point):
+                parser = Parser()
+                msgs = parse(parser)
+                self.assertEqual(len(cfg3_msgs(msgs)), 1)
+                self.assertEqual(msgs[0].sync.frame_type.name, 'cfg3')
+                self.assertEqual([station.stn.name for station in msgs[0].data.station],
+                                 ['S0', 'S1', 'S2', 'S3'])
+                self.assertEqual(len(data_msgs(msgs)), 20)
+                self.assertEqual(parser.quarantine.total(), 0)
+
+    def test_reassembled_like_one_message(self):
+        whole = data_msgs(Parser().parse(b''.join(cfg3(specs()) + raw_data())))
+        fragmented = data_msgs(Parser().parse(b''.join(cfg3(specs(), frames=4) + raw_data())))
+        self.assertEqual(len(fragmented), len(whole))
+        for msg, ref in zip(fragmented, whole):
+            self.assertEqual(
+                [(ph.real, ph.imaginary) for pmu in msg.data.pmu_data for ph in pmu.phasors],
+                [(ph.real, ph.imaginary) for pmu in ref.data.pmu_data for ph in pmu.phasors])
+
+    def test_missing_first_frame_drops_message(self):
+        fragments = cfg3(specs(), frames=3)
+        for parse in ('parse', 'parse_buffer'):
+            with self.subTest(parse=parse):
+                parser = Parser()
+                msgs = getattr(parser, parse)(b''.join(fragments[1:] + raw_data()))
+                self.assertEqual(msgs, [])
+                self.assertFalse(parser.has_cfg(IDCODE))
+                self.assertEqual(parser._mini_cfgs.fragments_dropped, 2)
+
+
+class ScaleOffsetTest(unittest.TestCase):
+
+    def assertClose(self, first, second):
+        self.assertTrue(cmath.isclose(first, second, rel_tol=1e-6, abs_tol=1e-6),
+                        '{!r} != {!r}'.format(first, second))
+
+    def check(self, msgs):
+        # Against the same values described by a CFG-2 message, which has
+        # no offsets
+        ref = data_msgs(Parser().parse(cfg2(IDCODE, specs()) + b''.join(raw_data())))
+        rotation = cmath.rect(1, ANGLE_OFFSET)
+        self.assertEqual(len(msgs), len(ref))
+        for msg, ref_msg in zip(msgs, ref):
+            for pmu, ref_pmu in zip(msg.data.pmu_data, ref_msg.data.pmu_data):
+                for ph, ref_ph in zip(pmu.phasors, ref_pmu.phasors):
+                    self.assertClose(complex(ph.real, ph.imaginary),
+                                     complex(ref_ph.real, ref_ph.imaginary) * rotation)
+                    self.assertClose(ph.magnitude, ref_ph.magnitude)
+                for an, ref_an in zip(pmu.analog, ref_pmu.analog):
+                    self.assertClose(an.value, ref_an.value + ANALOG_OFFSET)
+
+    def test_fast(self):
+        self.check(data_msgs(Parser().parse(b''.join(cfg3(specs()) + raw_data()))))
+
+    def test_kaitai(self):
+        self.check(data_msgs(Parser(fast=False).parse(b''.join(cfg3(specs()) + raw_data()))))
+
+    def test_polar_angle(self):
+        specs = [StationSpec('A', 1, fmt='int-polar')]
+        rnd = random.Random(0)
+        raw_pkt = data(IDCODE, specs, SOC, 0, rnd)
+        ref = Parser(cfg2(IDCODE, specs)).parse(raw_pkt)[0]
+        msg = Parser(cfg3(specs)[0]).parse(raw_pkt)[0]
+        for ph, ref_ph in zip(msg.data.pmu_data[0].phasors, ref.data.pmu_data[0].phasors):
+            self.assertTrue(math.isclose(ph.angle, ref_ph.angle + ANGLE_OFFSET, abs_tol=1e-9))
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_batch(self):
+        batch = Parser(cfg3(specs())[0]).parse_batch(b''.join(raw_data()))
+        msgs = data_msgs(Parser(cfg3(specs())[0]).parse(b''.join(raw_data())))
+        for k, station in enumerate(batch.stations):
+            np.testing.assert_allclose(station.phasors, [
+                [complex(ph.real, ph.imaginary) for ph in msg.data.pmu_data[k].phasors]
+                for msg in msgs], rtol=1e-6)
+            np.testing.assert_allclose(station.analog, [
+                [an.value for an in msg.data.pmu_data[k].analog] for msg in msgs], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Configuration messages cached in a file or Redis and preloaded."""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.parser import ConfigCache
+from phasortoolbox.benchmarks.synthetic import cfg2, data, stations
+
+IDCODE = 7
+SOC = 1500000001
+ANNOUNCED = 0x0400  # STAT bit 10, configuration change
+
+
+class FakeRedis(object):
+    # The hash commands of redis.Redis used by ConfigCache
+
+    def __init__(self, decode_responses=False):
+        self.hashes = {}
+        self.connection_pool = type('Pool', (), {})()
+        self.connection_pool.connection_kwargs = {'decode_responses': decode_responses}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = bytes(value)
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field.encode(), None)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class ConfigCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cfg.bin')
+        self.specs = stations(2)
+        rnd = random.Random(0)
+        self.cfg = cfg2(IDCODE, self.specs)
+        self.raw_data = [data(IDCODE, self.specs, SOC, i * 1000, rnd) for i in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def data_count(self, msgs):
+        return sum(1 for msg in msgs if msg.sync.frame_type.name == 'data')
+
+    def test_preload_from_file(self):
+        Parser(cache=ConfigCache(self.path)).parse(self.cfg)
+        parser = Parser(cache=ConfigCache(self.path))
+        self.assertTrue(parser.has_cfg(IDCODE))
+        self.assertEqual(self.data_count(parser.parse(b''.join(self.raw_data))), 5)
+
+    def test_preload_from_redis(self):
+        redis = FakeRedis()
+        Parser(cache=ConfigCache(redis=redis)).parse_buffer(self.cfg)
+        parser = Parser(cache=ConfigCache(redis=redis))
+        self.assertEqual(self.data_count(parser.parse_buffer(b''.join(self.raw_data))), 5)
+
+    def test_invalidated_on_announced_change(self):
+        redis = FakeRedis()
+        cache = ConfigCache(self.path, redis)
+        parser = Parser(cache=cache)
+        parser.parse(self.cfg + self.raw_data[0])
+        self.assertIn(IDCODE, cache)
+        parser.parse(data(IDCODE, self.specs, SOC, 5000, stat=ANNOUNCED))
+        self.assertNotIn(IDCODE, cache)
+        self.assertFalse(Parser(cache=ConfigCache(self.path)).has_cfg(IDCODE))
+        self.assertFalse(Parser(cache=ConfigCache(redis=redis)).has_cfg(IDCODE))
+
+    def test_decoding_redis_client_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ConfigCache(redis=FakeRedis(decode_responses=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
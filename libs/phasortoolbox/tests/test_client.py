@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Receive path of the Client, without a connection."""
+import time
+import unittest
+
+from phasortoolbox import Client
+from phasortoolbox.client import _stream_buffer
+from phasortoolbox.parser.common import PhasorMessage
+from phasortoolbox.parser.frame import LazyPhasorFrame
+from phasortoolbox.tests.test_framer import corrupt_stream
+
+
+class ClientTest(unittest.TestCase):
+
+    def receive(self, chunks, **kwargs):
+        # Feeds chunks as reads, framed and parsed as by the protocols
+        received = []
+        client = Client(7, callback=received.append, **kwargs)
+        client.c = 0
+        client._garbage_collection = False
+        buf = _stream_buffer(client._data_received, client._parser.max_framesize)
+        with self.assertLogs('phasortoolbox.client', 'WARNING'):  # The CFG-2 message
+            for chunk in chunks:
+                buf.add_bytes(chunk, time.perf_counter(), time.time(), ('127.0.0.1', 4712))
+        client.loop.close()
+        return received, buf
+
+    def test_phasor_messages(self):
+        chunks, good = corrupt_stream(every=1000)
+        # Reads that hold several messages and split others
+        raw_bytes = b''.join(chunks)
+        received, _ = self.receive([raw_bytes[i:i + 1000] for i in range(0, len(raw_bytes), 1000)])
+        self.assertEqual(len(received), good)
+        self.assertTrue(all(isinstance(msg, PhasorMessage) for msg in received))
+        self.assertEqual(received[1].fracsec.fraction_of_second, 0.016666)
+        self.assertEqual(received[1].fracsec.time_quality.value, 0)
+
+    def test_lazy(self):
+        chunks, good = corrupt_stream(every=1000)
+        received, _ = self.receive(chunks, lazy=True)
+        self.assertEqual(len(received), good)
+        self.assertTrue(all(isinstance(msg, LazyPhasorFrame) for msg in received))
+        self.assertEqual(received[1].fraction_of_second, 0.016666)
+
+    def test_reads_after_corrupt_framesize(self):
+        chunks, good = corrupt_stream()
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                received, buf = self.receive(chunks, lazy=lazy)
+                self.assertEqual(len(received), good)
+                self.assertEqual(len(buf._framer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
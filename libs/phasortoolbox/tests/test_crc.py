@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""CHK verification policies and their counters."""
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.parser.crc import CrcChecker, crc_ccitt, crc_ok
+from phasortoolbox.benchmarks.synthetic import StationSpec, cfg2, data
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+IDCODE = 7
+SOC = 1500000001
+FRAMES = 20
+CORRUPT = (3, 10)  # Data messages with a wrong CHK
+
+
+def stream():
+    specs = [StationSpec('A', 1), StationSpec('B', 2, fmt='float-rectangular')]
+    rnd = random.Random(0)
+    raw_data = []
+    for i in range(FRAMES):
+        raw_pkt = bytearray(data(IDCODE, specs, SOC, i * 1000, rnd))
+        if i in CORRUPT:
+            raw_pkt[-1] ^= 0xFF
+        raw_data.append(bytes(raw_pkt))
+    return cfg2(IDCODE, specs), raw_data
+
+
+def data_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'data']
+
+
+class CrcTest(unittest.TestCase):
+
+    def test_crc_ccitt(self):
+        self.assertEqual(crc_ccitt(b'123456789'), 0x29B1)
+        cfg, raw_data = stream()
+        self.assertTrue(crc_ok(cfg))
+        self.assertTrue(crc_ok(memoryview(raw_data[0])))
+        self.assertFalse(crc_ok(raw_data[CORRUPT[0]]))
+
+    def test_all(self):
+        cfg, raw_data = stream()
+        for parse in ('parse', 'parse_buffer'):
+            with self.subTest(parse=parse):
+                parser = Parser()
+                msgs = getattr(parser, parse)(cfg + b''.join(raw_data))
+                self.assertEqual(len(data_msgs(msgs)), FRAMES - len(CORRUPT))
+                self.assertEqual(parser.crc.checked, FRAMES + 1)
+                self.assertEqual(parser.crc.rejected, len(CORRUPT))
+
+    def test_sample(self):
+        # The configuration message and every fifth data message: 4, 9, 14, 19
+        cfg, raw_data = stream()
+        parser = Parser(crc=CrcChecker('sample', sample_rate=0.2))
+        msgs = parser.parse(cfg + b''.join(raw_data))
+        self.assertEqual(parser.crc.checked, 1 + FRAMES // 5)
+        self.assertEqual(parser.crc.rejected, 0)
+        self.assertEqual(len(data_msgs(msgs)), FRAMES)
+
+    def test_sample_rejects_sampled(self):
+        cfg, raw_data = stream()
+        parser = Parser(cfg, crc=CrcChecker('sample', sample_rate=0.5))
+        msgs = parser.parse(b''.join(raw_data))
+        self.assertEqual(parser.crc.checked, 1 + FRAMES // 2)
+        self.assertEqual(parser.crc.rejected, 1)  # Message 3, message 10 is not verified
+        self.assertEqual(len(data_msgs(msgs)), FRAMES - 1)
+
+    def test_off(self):
+        cfg, raw_data = stream()
+        parser = Parser(crc='off')
+        msgs = parser.parse(cfg + b''.join(raw_data))
+        self.assertEqual(len(data_msgs(msgs)), FRAMES)
+        self.assertEqual((parser.crc.checked, parser.crc.rejected), (0, 0))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            CrcChecker('some')
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_batch(self):
+        cfg, raw_data = stream()
+        # Counts include the configuration message, except with 'off'
+        for policy, checked, rejected in (('all', 1 + FRAMES, 2), ('sample', 1 + FRAMES // 2, 1), ('off', 0, 0)):
+            with self.subTest(policy=policy):
+                parser = Parser(cfg, crc=CrcChecker(policy, sample_rate=0.5))
+                batch = parser.parse_batch(b''.join(raw_data))
+                self.assertEqual(len(batch), FRAMES - rejected)
+                self.assertEqual(parser.crc.checked, checked)
+                self.assertEqual(parser.crc.rejected, rejected)
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_batch_continues_sample(self):
+        # check() and check_batch() verify the same messages
+        _, raw_data = stream()
+        single, batch = CrcChecker('sample', sample_rate=0.25), CrcChecker('sample', sample_rate=0.25)
+        ok = [single.check(raw_pkt) for raw_pkt in raw_data]
+        for i in range(3):
+            batch.check(raw_data[i])
+        rows = np.frombuffer(b''.join(raw_data[3:]), dtype=np.uint8).reshape(FRAMES - 3, -1)
+        self.assertEqual(ok[3:], list(batch.check_batch(rows)))
+        self.assertEqual((single.checked, single.rejected), (batch.checked, batch.rejected))
+
+
+if __name__ == '__main__':
+    unittest.main()
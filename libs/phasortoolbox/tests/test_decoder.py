@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""The compiled DataDecoder against the KaitaiStruct reference."""
+import math
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.parser.decoder import Projection
+from phasortoolbox.benchmarks.synthetic import FORMATS, StationSpec, cfg2, data
+
+IDCODE = 7
+SOC = 1500000001
+
+
+def stream(specs, frames=20):
+    rnd = random.Random(0)
+    return cfg2(IDCODE, specs) + b''.join(
+        data(IDCODE, specs, SOC, i * 1000, rnd) for i in range(frames))
+
+
+def data_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'data']
+
+
+class DataDecoderTest(unittest.TestCase):
+
+    def assertClose(self, first, second):
+        self.assertTrue(math.isclose(first, second, rel_tol=1e-9, abs_tol=1e-9),
+                        '{!r} != {!r}'.format(first, second))
+
+    def check(self, specs):
+        raw_bytes = stream(specs)
+        fast = data_msgs(Parser().parse(raw_bytes))
+        kaitai = data_msgs(Parser(fast=False).parse(raw_bytes))
+        self.assertEqual(len(fast), 20)
+        self.assertEqual(len(kaitai), 20)
+        for fast_msg, kaitai_msg in zip(fast, kaitai):
+            for fast_pmu, kaitai_pmu in zip(fast_msg.data.pmu_data, kaitai_msg.data.pmu_data):
+                self.assertClose(fast_pmu.freq, kaitai_pmu.freq)
+                self.assertClose(fast_pmu.dfreq, kaitai_pmu.dfreq)
+                self.assertEqual(len(fast_pmu.phasors), len(kaitai_pmu.phasors))
+                for fast_ph, kaitai_ph in zip(fast_pmu.phasors, kaitai_pmu.phasors):
+                    self.assertEqual(fast_ph.name, kaitai_ph.name)
+                    for item in ('real', 'imaginary', 'magnitude', 'angle'):
+                        self.assertClose(getattr(fast_ph, item), getattr(kaitai_ph, item))
+                self.assertEqual(len(fast_pmu.analog), len(kaitai_pmu.analog))
+                for fast_an, kaitai_an in zip(fast_pmu.analog, kaitai_pmu.analog):
+                    self.assertEqual(fast_an.name, kaitai_an.name)
+                    self.assertClose(fast_an.value, kaitai_an.value)
+                self.assertEqual(fast_pmu.digital, [
+                    int(''.join(flag.value for flag in word), 2) for word in kaitai_pmu.digital])
+
+    def test_phasor_formats(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                self.check([StationSpec('A', 1, fmt=fmt), StationSpec('B', 2, fmt=fmt)])
+
+    def test_freq_and_analog_widths(self):
+        for float_freq in (False, True):
+            for float_analog in (False, True):
+                with self.subTest(float_freq=float_freq, float_analog=float_analog):
+                    self.check([StationSpec(
+                        'A', 1, fmt=fmt, float_freq=float_freq, float_analog=float_analog)
+                        for fmt in FORMATS])
+
+    def test_frame_size_mismatch_is_not_decoded(self):
+        specs = [StationSpec('A', 1)]
+        parser = Parser()
+        parser.parse(cfg2(IDCODE, specs))
+        msgs = parser.parse(data(IDCODE, [StationSpec('A', 1, phasors=7)], SOC, 0))
+        self.assertEqual(data_msgs(msgs), [])
+
+
+class ProjectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.specs = [StationSpec('A', 1, fmt=fmt, digital=2) for fmt in FORMATS]
+        self.raw_bytes = stream(self.specs)
+        self.full = data_msgs(Parser().parse(self.raw_bytes))
+
+    def test_channels(self):
+        parser = Parser()
+        parser.set_projection(IDCODE, Projection(
+            phasors=['PH1', 4], analog=['AN0'], digital=[1], stat=False, dfreq=False))
+        msgs = data_msgs(parser.parse(self.raw_bytes))
+        self.assertEqual(len(msgs), len(self.full))
+        for msg, full in zip(msgs, self.full):
+            for pmu, full_pmu in zip(msg.data.pmu_data, full.data.pmu_data):
+                self.assertEqual([ph.name.strip() for ph in pmu.phasors], ['PH1', 'PH4'])
+                self.assertEqual([(ph.real, ph.imaginary) for ph in pmu.phasors],
+                                 [(ph.real, ph.imaginary) for ph in full_pmu.phasors[1::3]])
+                self.assertEqual([an.value for an in pmu.analog], [full_pmu.analog[0].value])
+                self.assertEqual(pmu.digital, full_pmu.digital[1:])
+                self.assertEqual(pmu.freq, full_pmu.freq)
+                self.assertIsNone(pmu.stat)
+                self.assertIsNone(pmu.dfreq)
+
+    def test_kept_on_new_configuration_and_removed(self):
+        parser = Parser()
+        parser.set_projection(IDCODE, Projection(phasors=[0], analog=[], digital=[]))
+        msgs = data_msgs(parser.parse(self.raw_bytes + self.raw_bytes))
+        self.assertEqual({len(msg.data.pmu_data[0].phasors) for msg in msgs}, {1})
+        parser.set_projection(IDCODE, None)
+        msgs = data_msgs(parser.parse(self.raw_bytes))
+        self.assertEqual({len(msg.data.pmu_data[0].phasors) for msg in msgs}, {6})
+        self.assertEqual(msgs[0].data.pmu_data[0].digital, self.full[0].data.pmu_data[0].digital)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Reassembly of captured TCP and UDP payloads per flow."""
+import unittest
+
+from phasortoolbox.benchmarks.synthetic import SyntheticStream, stations
+from phasortoolbox.parser.flows import FlowTable
+from phasortoolbox.parser.pcapreader import PROTO_TCP, PROTO_UDP, TCP_SYN, Segment
+
+SRC = (b'\x0a\x00\x00\x01', 4712)
+DST = (b'\x0a\x00\x00\x02', 50000)
+ISN = (1 << 32) - 1000  # The sequence numbers wrap around in the stream
+
+
+def segment(seq, payload, flags=0, proto=PROTO_TCP, src=SRC):
+    return Segment(0, src[0], src[1], DST[0], DST[1], proto, seq, flags, memoryview(payload))
+
+
+def tcp_segments(raw_bytes, size=300):
+    return [segment((ISN + 1 + i) % (1 << 32), raw_bytes[i:i + size])
+            for i in range(0, len(raw_bytes), size)]
+
+
+class FlowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = SyntheticStream(stations(2), frames=50)
+        self.msgs = [self.stream.cfg] + self.stream.data
+
+    def receive(self, segments, max_pending=1 << 20, flush=True):
+        table = FlowTable(max_pending)
+        received = []
+        for seg in segments:
+            flow = table.add(seg)
+            received.extend(bytes(raw_pkt) for raw_pkt in flow.framer.frames())
+        for flow in (table.flush() if flush else ()):
+            received.extend(bytes(raw_pkt) for raw_pkt in flow.framer.frames())
+        return table, received
+
+    def test_in_order(self):
+        table, received = self.receive([segment(ISN, b'', TCP_SYN)] + tcp_segments(self.stream.raw_bytes))
+        self.assertEqual(received, self.msgs)
+        flow, = table
+        self.assertEqual((flow.bytes, flow.duplicates, flow.gaps), (len(self.stream.raw_bytes), 0, 0))
+
+    def test_retransmissions(self):
+        segments = tcp_segments(self.stream.raw_bytes)
+        retransmitted = []
+        for i, seg in enumerate(segments):
+            retransmitted.append(seg)
+            if i % 3 == 1:
+                retransmitted.append(seg)  # The same segment again
+            if i % 5 == 4:
+                # The end of the previous segment and the start of this one
+                overlap = bytes(segments[i - 1].payload[-100:]) + bytes(seg.payload[:100])
+                retransmitted.append(segment((seg.seq - 100) % (1 << 32), overlap))
+        table, received = self.receive(retransmitted)
+        self.assertEqual(received, self.msgs)
+        flow, = table
+        self.assertEqual(flow.bytes, len(self.stream.raw_bytes))
+        self.assertEqual(flow.duplicates, len(retransmitted) - len(segments))
+
+    def test_out_of_order(self):
+        segments = tcp_segments(self.stream.raw_bytes)
+        for i in range(1, len(segments) - 1, 4):
+            segments[i], segments[i + 1] = segments[i + 1], segments[i]
+        table, received = self.receive(segments)
+        self.assertEqual(received, self.msgs)
+        self.assertEqual(list(table)[0].gaps, 0)
+
+    def test_gap_is_skipped(self):
+        # Bytes 3000-3299 are missing from the capture: the messages they
+        # belong to are lost, the next ones are received
+        segments = tcp_segments(self.stream.raw_bytes)
+        lost = segments.pop(10)
+        start = (lost.seq - ISN - 1) % (1 << 32)
+        end = start + len(lost.payload)
+        offsets, i = [], 0
+        for msg in self.msgs:
+            offsets.append((i, i + len(msg)))
+            i += len(msg)
+        expected = [msg for msg, (a, b) in zip(self.msgs, offsets) if b <= start or a >= end]
+        for max_pending, flush in ((1000, False), (1 << 20, True)):
+            with self.subTest(max_pending=max_pending):
+                table, received = self.receive(segments, max_pending, flush)
+                self.assertEqual(received, expected)
+                self.assertEqual(list(table)[0].gaps, 1)
+
+    def test_new_connection(self):
+        half = len(self.stream.raw_bytes) // 2
+        segments = [segment(ISN, b'', TCP_SYN)] + tcp_segments(self.stream.raw_bytes)
+        # The connection is reset in the middle of a message and opened again
+        segments = [seg for seg in segments if (seg.seq - ISN - 1) % (1 << 32) < half]
+        segments += [segment(7, b'', TCP_SYN), segment(8, self.stream.raw_bytes)]
+        table, received = self.receive(segments)
+        self.assertEqual(received[-len(self.msgs):], self.msgs)
+
+    def test_flows_do_not_interleave(self):
+        other = (b'\x0a\x00\x00\x03', 4712)
+        first = tcp_segments(self.stream.raw_bytes)
+        second = [segment(seg.seq, bytes(seg.payload), src=other) for seg in first]
+        table, received = self.receive([seg for pair in zip(first, second) for seg in pair])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(sorted(received), sorted(self.msgs * 2))
+
+    def test_udp(self):
+        datagrams = [segment(None, msg, proto=PROTO_UDP) for msg in self.msgs]
+        table, received = self.receive(datagrams)
+        self.assertEqual(received, self.msgs)
+        self.assertEqual(list(table)[0].segments, len(self.msgs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Framing of streams with corrupt messages."""
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.parser.framer import Framer
+from phasortoolbox.benchmarks.synthetic import cfg2, data, stations
+
+IDCODE = 7
+SOC = 1500000001
+
+
+def corrupt_stream(frames=100, every=10):
+    # The CFG-2 and one data message per chunk, every tenth with the high
+    # byte of FRAMESIZE corrupted so that it announces about 58 kB
+    specs = stations(2)
+    rnd = random.Random(0)
+    chunks = [cfg2(IDCODE, specs)]
+    for i in range(frames):
+        raw_pkt = bytearray(data(IDCODE, specs, SOC + i // 60, i % 60 * 16666, rnd))
+        if i % every == every // 2:
+            raw_pkt[2] = 0xE4
+        chunks.append(bytes(raw_pkt))
+    return chunks, frames - frames // every
+
+
+def data_count(msgs):
+    return sum(1 for msg in msgs if msg.sync.frame_type.name == 'data')
+
+
+class CorruptFramesizeTest(unittest.TestCase):
+
+    def test_frames(self):
+        chunks, good = corrupt_stream()
+        parser = Parser()
+        received = 0
+        for chunk in chunks:
+            parser.feed(chunk)
+            received += data_count(parser.frames())
+        self.assertEqual(received, good)
+
+    def test_frames_unbounded(self):
+        chunks, good = corrupt_stream()
+        framer = Framer()
+        received = 0
+        for chunk in chunks:
+            framer.feed(chunk)
+            received += sum(1 for raw_pkt in framer.frames() if not raw_pkt[1] & 0x70)
+        self.assertEqual(received, good)
+        self.assertEqual(len(framer), 0)
+
+    def test_incomplete_message_is_kept(self):
+        chunks, _ = corrupt_stream(every=1000)
+        framer = Framer()
+        framer.feed(chunks[0])
+        framer.feed(chunks[1][:50])
+        self.assertEqual(len(list(framer.frames())), 1)
+        self.assertEqual(framer.skipped, 0)
+        self.assertEqual(len(framer), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Garbage collection policies of the receive path."""
+import gc
+import unittest
+
+from phasortoolbox import GCPolicy
+
+
+class GCPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.enabled = gc.isenabled()
+        self.thresholds = gc.get_threshold()
+
+    def tearDown(self):
+        gc.set_threshold(*self.thresholds)
+        if self.enabled:
+            gc.enable()
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            GCPolicy('sometimes')
+
+    def test_full(self):
+        policy = GCPolicy()
+        policy.start()
+        try:
+            self.assertTrue(gc.isenabled())
+            for _ in range(3):
+                policy.tick()
+        finally:
+            policy.stop()
+        self.assertEqual(policy.collections[2], 3)
+        self.assertEqual(len(policy.pauses), policy.collections[0] + policy.collections[1] + 3)
+        self.assertGreater(policy.pause_total, 0)
+        self.assertGreaterEqual(policy.pause_total, policy.pause_max)
+
+    def test_interval(self):
+        for mode, generation in (('periodic', 2), ('gen0', 0)):
+            with self.subTest(mode=mode):
+                policy = GCPolicy(mode, interval=10)
+                policy.start()
+                try:
+                    self.assertFalse(gc.isenabled())
+                    for _ in range(35):
+                        policy.tick()
+                finally:
+                    policy.stop()
+                self.assertEqual(policy.collections[generation], 3)
+                self.assertEqual(sum(policy.collections), 3)
+                self.assertEqual([g for g, _ in policy.pauses], [generation] * 3)
+
+    def test_off(self):
+        policy = GCPolicy('off')
+        policy.start()
+        try:
+            self.assertFalse(gc.isenabled())
+            for _ in range(100):
+                policy.tick()
+        finally:
+            policy.stop()
+        self.assertEqual(policy.collections, [0, 0, 0])
+
+    def test_freeze(self):
+        policy = GCPolicy('freeze')
+        policy.start()
+        try:
+            self.assertTrue(gc.isenabled())
+            self.assertEqual(gc.get_threshold(), (10000, 50, 100))
+            if hasattr(gc, 'get_freeze_count'):
+                self.assertGreater(gc.get_freeze_count(), 0)
+            collections = list(policy.collections)
+            policy.tick()
+            self.assertEqual(policy.collections, collections)
+        finally:
+            policy.stop()
+        self.assertEqual(collections[2], 1)  # The one of start()
+        if hasattr(gc, 'get_freeze_count'):
+            self.assertEqual(gc.get_freeze_count(), 0)
+
+    def test_stop_restores_settings(self):
+        gc.set_threshold(700, 10, 10)
+        for mode in ('full', 'periodic', 'gen0', 'freeze', 'off'):
+            with self.subTest(mode=mode):
+                policy = GCPolicy(mode, thresholds=(5000, 20, 20))
+                policy.start()
+                policy.start()  # Started once
+                self.assertEqual(gc.get_threshold(), (5000, 20, 20))
+                self.assertEqual(gc.callbacks.count(policy._on_gc), 1)
+                policy.stop()
+                policy.stop()
+                self.assertTrue(gc.isenabled())
+                self.assertEqual(gc.get_threshold(), (700, 10, 10))
+                self.assertNotIn(policy._on_gc, gc.callbacks)
+
+    def test_not_timed_when_stopped(self):
+        policy = GCPolicy('periodic', interval=1)
+        policy.tick()
+        self.assertEqual(policy.collections, [0, 0, 0])
+        policy.start()
+        policy.tick()
+        policy.stop()
+        self.assertEqual(policy.collections[2], 1)
+        policy.reset()
+        self.assertEqual(policy.collections, [0, 0, 0])
+        self.assertEqual(policy.pause_total, 0)
+        self.assertEqual(len(policy.pauses), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
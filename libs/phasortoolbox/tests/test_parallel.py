@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Parallel decoding of pcap captures against iter_pcap()."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from phasortoolbox import PcapParser
+from phasortoolbox.benchmarks.synthetic import SyntheticStream, stations
+from phasortoolbox.parser.parallel import iter_chunks
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class IterChunksTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.dir, 'stream.pcap')
+        # About 1 MB in segments of 1000 bytes, so messages are split
+        # across segments and across chunks of 64 KiB
+        stream = SyntheticStream(stations(4, 'mixed'), frames=4000)
+        stream.write_pcap(cls.path, segment_size=1000)
+        msgs = [msg for msg in PcapParser().iter_pcap(cls.path) if msg.sync.frame_type.name == 'data']
+        cls.time_ns = [msg.time_ns for msg in msgs]
+        cls.phasors = [[complex(ph.real, ph.imaginary) for pmu in msg.data.pmu_data for ph in pmu.phasors]
+                       for msg in msgs]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+
+    def check(self, workers):
+        chunks = list(iter_chunks(self.path, workers, size=500, chunk_size=1 << 16))
+        self.assertGreater(len(chunks), 10)
+        batches = [batch for batch, _ in chunks for batch in batch]
+        self.assertEqual(sum(quarantine.total() for _, quarantine in chunks), 0)
+        self.assertEqual(np.concatenate([batch.time_ns for batch in batches]).tolist(), self.time_ns)
+        phasors = np.concatenate([np.hstack([station.phasors for station in batch.stations])
+                                  for batch in batches])
+        np.testing.assert_allclose(phasors, self.phasors, rtol=1e-6)
+
+    def test_one_worker(self):
+        self.check(1)
+
+    def test_two_workers(self):
+        self.check(2)
+
+    def test_parallel_batches(self):
+        batches = list(PcapParser().parallel_batches(self.path, workers=2, chunk_size=1 << 16))
+        self.assertEqual(sum(len(batch) for batch in batches), len(self.time_ns))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Configuration changes followed by every parsing entry point."""
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.benchmarks.synthetic import cfg2, data, stations
+
+IDCODE = 7
+SOC = 1500000001
+ANNOUNCED = 0x0400  # STAT bit 10, configuration change
+
+
+def change_stream():
+    # 4 data messages, 2 announcing a change, 4 in the new layout before the
+    # new CFG-2 (the gap), the new CFG-2 and 2 more data messages
+    old = stations(2)
+    new = stations(2, phasors=8, cfgcnt=2)
+    rnd = random.Random(0)
+    msgs = [cfg2(IDCODE, old)]
+    msgs += [data(IDCODE, old, SOC, i * 1000, rnd) for i in range(4)]
+    msgs += [data(IDCODE, old, SOC, i * 1000, rnd, ANNOUNCED) for i in range(4, 6)]
+    msgs += [data(IDCODE, new, SOC, i * 1000, rnd) for i in range(6, 10)]
+    msgs.append(cfg2(IDCODE, new))
+    msgs += [data(IDCODE, new, SOC, i * 1000, rnd) for i in range(10, 12)]
+    return msgs
+
+
+def data_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'data']
+
+
+class ConfigurationChangeTest(unittest.TestCase):
+
+    def check(self, parser, msgs):
+        msgs = data_msgs(msgs)
+        self.assertEqual([round(msg.time - SOC, 6) for msg in msgs], [i / 1000 for i in range(12)])
+        self.assertEqual([len(msg.data.pmu_data[0].phasors) for msg in msgs], [6] * 6 + [8] * 6)
+        self.assertEqual(parser.quarantine.total(), 0)
+
+    def test_parse(self):
+        parser = Parser()
+        self.check(parser, parser.parse(b''.join(change_stream())))
+
+    def test_parse_kaitai(self):
+        parser = Parser(fast=False)
+        self.check(parser, parser.parse(b''.join(change_stream())))
+
+    def test_parse_buffer(self):
+        parser = Parser()
+        self.check(parser, parser.parse_buffer(b''.join(change_stream())))
+
+    def test_frames(self):
+        parser = Parser()
+        msgs = []
+        for raw_pkt in change_stream():
+            parser.feed(raw_pkt)
+            msgs.extend(parser.frames())
+        self.check(parser, msgs)
+
+
+if __name__ == '__main__':
+    unittest.main()
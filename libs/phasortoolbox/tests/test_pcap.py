@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Messages read from pcap captures."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from phasortoolbox import PcapParser
+from phasortoolbox.benchmarks.synthetic import SyntheticStream, stations
+from phasortoolbox.parser.common import PhasorMessage
+from phasortoolbox.parser.frame import PhasorFrame
+
+
+class PcapParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'stream.pcap')
+        self.stream = SyntheticStream(stations(4, 'mixed'), frames=200)
+        # Segments that split messages, as a TCP capture does
+        self.stream.write_pcap(self.path, segment_size=700)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_from_pcap(self):
+        msgs = PcapParser().from_pcap(self.path)
+        self.assertEqual(len(msgs), 201)
+        self.assertTrue(all(isinstance(msg, PhasorMessage) for msg in msgs))
+        self.assertEqual(msgs[0].sync.frame_type.name, 'cfg2')
+        self.assertEqual(msgs[1].fracsec.fraction_of_second, 0)
+
+    def test_iter_pcap(self):
+        msgs = PcapParser().from_pcap(self.path)
+        frames = list(PcapParser().iter_pcap(self.path))
+        self.assertTrue(all(isinstance(frame, PhasorFrame) for frame in frames))
+        self.assertEqual([frame.time for frame in frames[1:]], [msg.time for msg in msgs[1:]])
+        self.assertEqual([bytes(frame.raw_pkt) for frame in frames],
+                         [self.stream.cfg] + self.stream.data)
+
+    def test_ports_and_hosts(self):
+        self.assertEqual(len(list(PcapParser(ports=[4712]).iter_pcap(self.path))), 201)
+        self.assertEqual(len(list(PcapParser(hosts=['10.0.0.2']).iter_pcap(self.path))), 201)
+        self.assertEqual(list(PcapParser(ports=[4713]).iter_pcap(self.path)), [])
+        self.assertEqual(list(PcapParser(hosts=['10.0.0.3']).iter_pcap(self.path)), [])
+
+    def test_iter_batches(self):
+        batches = list(PcapParser().iter_batches(self.path, 64))
+        self.assertEqual([len(batch) for batch in batches], [64, 64, 64, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
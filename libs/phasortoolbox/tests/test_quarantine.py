@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tolerant parsing and the bounded quarantine of bad messages."""
+import random
+import unittest
+
+from phasortoolbox import Parser
+from phasortoolbox.benchmarks.synthetic import cfg2, data, message, stations
+from phasortoolbox.parser.quarantine import CRC, MALFORMED, SYNC, UNKNOWN_CFG
+
+IDCODE = 7
+SOC = 1500000001
+
+
+def raw_data(frames=20, idcode=IDCODE, **kwargs):
+    rnd = random.Random(0)
+    return [data(idcode, stations(2, **kwargs), SOC, i * 1000, rnd) for i in range(frames)]
+
+
+def bad_chk(raw_pkt):
+    return raw_pkt[:-1] + bytes([raw_pkt[-1] ^ 0xFF])
+
+
+def data_msgs(msgs):
+    return [msg for msg in msgs if msg.sync.frame_type.name == 'data']
+
+
+class QuarantineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cfg = cfg2(IDCODE, stations(2))
+
+    def test_bound(self):
+        msgs = raw_data()
+        parser = Parser(self.cfg, quarantine=5)
+        parser.parse(b''.join(bad_chk(raw_pkt) for raw_pkt in msgs))
+        self.assertEqual(len(parser.quarantine), 5)
+        self.assertEqual([bad.raw for bad in parser.quarantine.frames],
+                         [bad_chk(raw_pkt) for raw_pkt in msgs[-5:]])
+        self.assertEqual(parser.quarantine.counters[IDCODE].crc, 20)
+        self.assertEqual(parser.quarantine.total(), 20)
+        parser.quarantine.clear()
+        self.assertEqual(len(parser.quarantine), 0)
+        self.assertEqual(parser.quarantine.total(CRC), 20)
+
+    def test_reasons(self):
+        msgs = raw_data()
+        raw_bytes = b''.join([
+            self.cfg, msgs[0],
+            bad_chk(msgs[1]),
+            raw_data(1, idcode=IDCODE + 1)[0],  # No configuration
+            msgs[2]])
+        for parse in ('parse', 'parse_buffer'):
+            with self.subTest(parse=parse):
+                parser = Parser()
+                self.assertEqual(len(data_msgs(getattr(parser, parse)(raw_bytes))), 2)
+                counters = parser.quarantine.counters
+                self.assertEqual(counters[IDCODE].crc, 1)
+                self.assertEqual(counters[IDCODE + 1].unknown_cfg, 1)
+                self.assertEqual([bad.reason for bad in parser.quarantine.frames], [CRC, UNKNOWN_CFG])
+
+    def test_tolerant_resynchronises(self):
+        msgs = raw_data()
+        garbage = b'\x01\x02\xAA\x03' * 5
+        raw_bytes = self.cfg + msgs[0] + garbage + b''.join(msgs[1:])
+        for parse in ('parse', 'parse_buffer'):
+            with self.subTest(parse=parse):
+                parser = Parser(tolerant=True)
+                self.assertEqual(len(data_msgs(getattr(parser, parse)(raw_bytes))), 20)
+                self.assertEqual(parser.quarantine.counters[None].sync, 1)
+                self.assertEqual(parser.quarantine.frames[0].raw, garbage)
+
+    def test_malformed(self):
+        # A header command message whose body is too short for a command
+        bad = message(0xAA41, IDCODE, SOC, 0, b'')
+        raw_bytes = self.cfg + bad + raw_data()[0]
+        with self.assertRaises(Exception):
+            Parser().parse(raw_bytes)
+        parser = Parser(tolerant=True)
+        self.assertEqual(len(data_msgs(parser.parse(raw_bytes))), 1)
+        self.assertEqual(parser.quarantine.total(MALFORMED), 1)
+        self.assertEqual(parser.quarantine.total(SYNC), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Bounded queues and their overflow policies."""
+import asyncio
+import time
+import unittest
+from collections import namedtuple
+
+from phasortoolbox import Client
+from phasortoolbox.client import _stream_buffer
+from phasortoolbox.queues import BoundedQueue, coro_consume
+from phasortoolbox.tests.test_framer import corrupt_stream
+
+Msg = namedtuple('Msg', 'idcode value')
+
+
+def drain(queue, loop):
+    items = []
+    while queue.depth:
+        items.append(loop.run_until_complete(queue.get()))
+        queue.task_done()
+    return items
+
+
+class BoundedQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedQueue(10, 'drop_random')
+
+    def test_block(self):
+        queue = BoundedQueue(4)
+        ready = []
+        self.assertTrue(all(queue.put(i) for i in range(6)))  # Accepted above maxsize
+        self.assertTrue(queue.full)
+        self.assertFalse(queue.put(6, wait=False))  # A datagram is dropped
+        queue.when_ready(lambda: ready.append(queue.depth))
+        self.assertEqual(drain(queue, self.loop), list(range(6)))
+        self.assertEqual(ready, [2])
+        self.assertEqual((queue.received, queue.delivered, queue.dropped, queue.max_depth), (7, 6, 1, 6))
+
+    def test_drop_oldest(self):
+        queue = BoundedQueue(4, 'drop_oldest')
+        for i in range(10):
+            queue.put(i)
+        self.assertEqual(drain(queue, self.loop), [6, 7, 8, 9])
+        self.assertEqual(queue.dropped, 6)
+
+    def test_drop_newest(self):
+        queue = BoundedQueue(4, 'drop_newest')
+        self.assertEqual([queue.put(i) for i in range(6)], [True] * 4 + [False] * 2)
+        self.assertEqual(drain(queue, self.loop), [0, 1, 2, 3])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_coalesce(self):
+        queue = BoundedQueue(2, 'coalesce')
+        for msg in (Msg(1, 'a'), Msg(2, 'a'), Msg(1, 'b'), Msg(3, 'a')):
+            queue.put(msg)
+        self.assertEqual(drain(queue, self.loop), [Msg(1, 'b'), Msg(3, 'a')])
+        self.assertEqual((queue.coalesced, queue.dropped), (1, 1))
+
+    def test_protect(self):
+        protect = lambda item: item % 10 == 0
+        for policy, expected in (('drop_oldest', [0, 10, 20, 29]),
+                                 ('drop_newest', [0, 1, 2, 3, 10, 20]),
+                                 ('block', [0, 1, 2, 3, 10, 20])):
+            with self.subTest(policy=policy):
+                queue = BoundedQueue(4, policy, protect=protect)
+                for i in range(30):
+                    queue.put(i, wait=False)
+                self.assertEqual(drain(queue, self.loop), expected)
+                self.assertEqual(queue.dropped, 30 - len(expected))
+                self.assertEqual(queue._unfinished, 0)
+
+    def test_join_after_drops(self):
+        queue = BoundedQueue(4, 'drop_oldest')
+        handled = []
+        for i in range(10):
+            queue.put(i)
+        task = self.loop.create_task(coro_consume(queue, handled.append))
+        self.loop.run_until_complete(asyncio.wait_for(queue.coro_join(), 1))
+        task.cancel()
+        self.loop.run_until_complete(asyncio.wait([task]))
+        self.assertEqual(handled, [6, 7, 8, 9])
+
+
+class ReceiveQueueTest(unittest.TestCase):
+
+    def test_coalesce_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Client(7, receive_queue=BoundedQueue(10, 'coalesce'))
+
+    def test_cfg_is_not_dropped(self):
+        # The CFG-2 message is in the first read, dropped first without
+        # protection
+        chunks, good = corrupt_stream(every=1000)
+        for policy in ('drop_oldest', 'drop_newest'):
+            with self.subTest(policy=policy):
+                queue = BoundedQueue(10, policy)
+                received = []
+                client = Client(7, callback=received.append, receive_queue=queue)
+                client.c = 0
+                client._garbage_collection = False
+                buf = _stream_buffer(client._received, client._parser.max_framesize)
+                for chunk in chunks:
+                    buf.add_bytes(chunk, time.perf_counter(), time.time(), ('127.0.0.1', 4712))
+                with self.assertLogs('phasortoolbox.client', 'WARNING'):  # The CFG-2 message
+                    for item in drain(queue, client.loop):
+                        client._parse_queued(item)
+                client.loop.close()
+                self.assertEqual(queue.dropped, good + 1 - 10)
+                self.assertEqual(len(received), 9)
+                self.assertEqual(client._parser.quarantine.total(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Reconnection backoff and the handshake of a new connection."""
+import asyncio
+import random
+import socket
+import unittest
+
+from phasortoolbox import Client
+from phasortoolbox.parser import ConfigCache
+from phasortoolbox.reconnect import Outage, Reconnect
+from phasortoolbox.benchmarks.synthetic import cfg2, data, stations
+
+IDCODE = 7
+SOC = 1500000001
+ANNOUNCED = 0x0400  # STAT bit 10, configuration change
+FULL = ('off', 'cfg2', 'on')
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_delays(self):
+        reconnect = Reconnect(initial=0.5, maximum=5, factor=2, jitter=0)
+        self.assertEqual([reconnect.delay(attempt) for attempt in range(7)],
+                         [0.0, 0.5, 1.0, 2.0, 4.0, 5.0, 5.0])
+
+    def test_jitter(self):
+        random.seed(0)
+        reconnect = Reconnect(initial=1, maximum=8, jitter=0.5)
+        for attempt in range(1, 10):
+            nominal = min(8, 2 ** (attempt - 1))
+            delays = [reconnect.delay(attempt) for _ in range(100)]
+            self.assertTrue(all(nominal * 0.5 <= delay <= nominal for delay in delays))
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_gave_up(self):
+        self.assertFalse(Reconnect().gave_up(1000))
+        reconnect = Reconnect(attempts=3)
+        self.assertEqual([reconnect.gave_up(attempt) for attempt in range(1, 5)],
+                         [False, False, True, True])
+
+    def test_gives_up_connecting(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()  # Nothing listens on port
+        outage = Outage()
+        client = Client(IDCODE, '127.0.0.1', port,
+                        reconnect=Reconnect(initial=0.01, attempts=3, connect_timeout=1))
+        with self.assertLogs('phasortoolbox.client', 'WARNING') as logs:
+            with self.assertRaises(OSError):
+                client.loop.run_until_complete(client._coro_connect(outage))
+        client.loop.close()
+        self.assertEqual(outage.attempts, 3)
+        self.assertEqual(sum('failed' in line for line in logs.output), 2)
+
+
+class HandshakeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.specs = stations(2)
+        self.cfg = cfg2(IDCODE, self.specs)
+
+    def commands(self, client):
+        commands = client._commands()
+        client.loop.close()
+        return commands
+
+    def test_unknown_handshake(self):
+        with self.assertRaises(ValueError):
+            Client(IDCODE, handshake='none')
+
+    def test_full(self):
+        client = Client(IDCODE, handshake='full')
+        client._parser.parse(self.cfg)
+        self.assertEqual(self.commands(client), FULL)
+
+    def test_auto_without_cfg(self):
+        self.assertEqual(self.commands(Client(IDCODE, handshake='auto')), FULL)
+
+    def test_auto_with_cfg(self):
+        client = Client(IDCODE, handshake='auto')
+        client._parser.parse(self.cfg + data(IDCODE, self.specs, SOC, 0))
+        with self.assertLogs('phasortoolbox.client', 'INFO'):
+            self.assertEqual(self.commands(client), ('on',))
+
+    def test_auto_with_cached_cfg(self):
+        cache = ConfigCache()
+        cache.store(IDCODE, 1, self.cfg)
+        with self.assertLogs('phasortoolbox.client', 'INFO'):
+            self.assertEqual(self.commands(Client(IDCODE, cache=cache, handshake='auto')), ('on',))
+
+    def test_auto_with_change_pending(self):
+        client = Client(IDCODE, handshake='auto')
+        client._parser.parse(self.cfg + data(IDCODE, self.specs, SOC, 0, stat=ANNOUNCED))
+        self.assertTrue(client._parser.change_pending(IDCODE))
+        self.assertEqual(self.commands(client), FULL)
+
+
+if __name__ == '__main__':
+    unittest.main()
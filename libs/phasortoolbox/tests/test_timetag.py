@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Exact integer-nanosecond time tags."""
+import random
+import unittest
+from fractions import Fraction
+
+from phasortoolbox import Parser
+from phasortoolbox.benchmarks.synthetic import cfg2, data, stations
+from phasortoolbox.parser.timetag import time_ns
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+IDCODE = 7
+SOC = 4000000000  # Close to the end of the u32 SOC range
+TIME_BASES = (1000000, 16777215, 3, 7)
+
+
+def exact_ns(soc, fraction, time_base):
+    # Rounded to the nearest nanosecond, halves up
+    ns = (soc + Fraction(fraction, time_base)) * 1000000000
+    return int(ns + Fraction(1, 2)) if ns.denominator > 1 else int(ns)
+
+
+def fractions(time_base, count=200):
+    rnd = random.Random(time_base)
+    return [0, time_base - 1] + [rnd.randrange(time_base) for _ in range(count)]
+
+
+class TimeNsTest(unittest.TestCase):
+
+    def test_scalar(self):
+        for time_base in TIME_BASES:
+            with self.subTest(time_base=time_base):
+                for fraction in fractions(time_base):
+                    self.assertEqual(time_ns(SOC, fraction, time_base), exact_ns(SOC, fraction, time_base))
+
+    def test_float_is_not_exact(self):
+        # The reason for time_ns: the float time tag loses nanoseconds
+        self.assertNotEqual(int((SOC + 333333333 / 1000000000) * 1000000000), exact_ns(SOC, 333333333, 1000000000))
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_int64_arrays(self):
+        for time_base in TIME_BASES:
+            with self.subTest(time_base=time_base):
+                fraction = fractions(time_base)
+                soc = [SOC + i for i in range(len(fraction))]
+                ns = time_ns(np.array(soc, dtype=np.int64), np.array(fraction, dtype=np.int64), time_base)
+                self.assertEqual(ns.dtype, np.int64)
+                self.assertEqual(ns.tolist(), [exact_ns(s, f, time_base) for s, f in zip(soc, fraction)])
+
+    def test_messages(self):
+        specs = stations(1)
+        for time_base in TIME_BASES:
+            with self.subTest(time_base=time_base):
+                fraction = fractions(time_base, 20)
+                flags = 0x1F << 24  # Leap second pending, time quality 15
+                cfg = cfg2(IDCODE, specs, time_base)
+                raw_data = b''.join(data(IDCODE, specs, SOC, flags | f) for f in fraction)
+                expected = [exact_ns(SOC, f, time_base) for f in fraction]
+                for parse in ('parse', 'parse_buffer'):
+                    msgs = getattr(Parser(), parse)(cfg + raw_data)[1:]
+                    self.assertEqual([msg.time_ns for msg in msgs], expected)
+                if np is not None:
+                    batch = Parser(cfg).parse_batch(raw_data)
+                    self.assertEqual(batch.time_ns.tolist(), expected)
+                    self.assertTrue(batch.leap_second_pending.all())
+                    self.assertEqual(set(batch.time_quality.tolist()), {15})
+
+
+if __name__ == '__main__':
+    unittest.main()
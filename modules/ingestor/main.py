@@ -78,6 +78,8 @@ async def run_ingestor():
                     phasor_frame = {
                         "ts": timestamp.timestamp(), # Timestamp Unix (float, ex: 1678886400.123)
                         "ts_iso": timestamp.isoformat(), # Timestamp legível (ex: "2023-03-15T12:00:00.123+00:00")
+                        "ts_ns": msg.time_ns, # Timestamp Unix exato em ns (int, ex: 1678886400123000000)
+                        "time_quality": msg.fracsec >> 24, # Flags de segundo bissexto e qualidade do tempo
                         "pmu_id": internal_pmu_id,
                         "stat_word": msg.stat.stat_word,
                         "freq": msg.frequency,
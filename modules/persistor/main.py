@@ -16,7 +16,6 @@ import os
 import time
 import logging
 import signal
-from datetime import datetime
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import execute_values
@@ -58,6 +57,10 @@ TABLE_COLUMNS = [
 ]
 # Cria o template da query SQL dinamicamente baseado nas colunas
 SQL_INSERT_QUERY = f"INSERT INTO phasor_data ({', '.join(TABLE_COLUMNS)}) VALUES %s"
+# 'time' chega como inteiro em microssegundos desde a época e é convertido
+# pelo próprio PostgreSQL, sem criar um datetime por linha no Python
+SQL_ROW_TEMPLATE = "(to_timestamp(0) + %s * INTERVAL '1 microsecond', " + \
+    ", ".join(["%s"] * (len(TABLE_COLUMNS) - 1)) + ")"
 
 
 def format_row_from_redis(msg_data: dict) -> tuple:
@@ -68,11 +71,14 @@ def format_row_from_redis(msg_data: dict) -> tuple:
     Usar .get(key) retorna None se a chave não existir, o que
     é convertido para NULL pelo psycopg2, evitando quebras.
     """
-    # 1. Converte o timestamp (float) para um objeto datetime
-    #    que o TimescaleDB entende.
+    # 1. Converte o timestamp em ns (int) para microssegundos, a precisão
+    #    do TIMESTAMPTZ. Mensagens antigas trazem 'ts' em segundos (float).
     try:
-        msg_data['time'] = datetime.fromtimestamp(float(msg_data['ts']))
-    except (TypeError, ValueError):
+        if 'ts_ns' in msg_data:
+            msg_data['time'] = int(msg_data['ts_ns']) // 1000
+        else:
+            msg_data['time'] = int(round(float(msg_data['ts']) * 1e6))
+    except (KeyError, TypeError, ValueError):
         msg_data['time'] = None  # Ignora se o timestamp estiver corrompido
 
     # 2. Mapeia as chaves do dicionário para a tupla
@@ -98,7 +104,8 @@ def flush_buffer_to_db():
 
         with db_conn.cursor() as cursor:
             # execute_values é a função chave para performance de escrita
-            execute_values(cursor, SQL_INSERT_QUERY, data_buffer, page_size=BATCH_SIZE)
+            execute_values(cursor, SQL_INSERT_QUERY, data_buffer,
+                           template=SQL_ROW_TEMPLATE, page_size=BATCH_SIZE)
 
         db_conn.commit()  # Confirma a transação
 